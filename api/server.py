@@ -3,20 +3,35 @@ FastAPI server for OMRChecker
 Provides REST API endpoints for the Next.js frontend
 """
 
+import hashlib
+import json
 import os
 import shutil
+import tempfile
+from collections import OrderedDict
 from pathlib import Path
+from time import perf_counter
 from typing import List, Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-import json
-import tempfile
+
 import cv2
 import numpy as np
+import pandas as pd
+from fastapi import Body, FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response
 
+from src.annotations import AnnotationRenderer
+from src.archive import find_archived_entry, find_archived_file, read_archived_file
+from src.constants import ANNOTATIONS_FILENAME, SHEET_STATUSES_FILENAME
+from src.core import SheetContext
+from src.defaults import CONFIG_DEFAULTS
 from src.entry import process_dir
 from src.logger import logger
+from src.metrics import METRICS
+from src.template import Template
+from src.utils.image import ImageUtils
+from src.utils.parsing import open_config_with_defaults
+from src.utils.template_detection import detect_template, draw_detected_blocks
 
 app = FastAPI(title="OMRChecker API", version="1.0.0")
 
@@ -36,6 +51,35 @@ app.add_middleware(
 UPLOAD_DIR = Path("api/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Parsed templates and preprocessed sample images of layout previews, keyed by preview id
+LAYOUT_PREVIEW_CACHE_SIZE = 16
+LAYOUT_PREVIEW_CACHE = OrderedDict()
+LAYOUT_PREVIEW_FORMATS = {
+    "png": (".png", "image/png", [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+    "webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, 80]),
+}
+
+# Standard thumbnail widths for output images
+THUMBNAIL_SIZES = {"small": 160, "medium": 480, "large": 1024}
+THUMBNAIL_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", [cv2.IMWRITE_JPEG_QUALITY, 80]),
+    "webp": (".webp", "image/webp", [cv2.IMWRITE_WEBP_QUALITY, 75]),
+}
+THUMBNAIL_CACHE_CONTROL = "public, max-age=86400"
+
+# Parsed per-sheet results of recent jobs, keyed by job id
+RESULTS_CACHE_SIZE = 8
+RESULTS_CACHE = OrderedDict()
+RESULTS_STATUSES = {
+    "ok": "Results/Results_*.csv",
+    "multi_marked": "Manual/MultiMarkedFiles.csv",
+    "error": "Manual/ErrorFiles.csv",
+}
+RESULTS_MAX_LIMIT = 1000
+
+# Draws the marked images of jobs read with deferred_rendering when they are first requested
+ANNOTATION_RENDERER = AnnotationRenderer()
+
 
 @app.get("/")
 async def root():
@@ -43,6 +87,15 @@ async def root():
     return {"status": "ok", "message": "OMRChecker API is running"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Metrics of the sheets processed by this server, in the Prometheus text format"""
+    return Response(
+        content=METRICS.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @app.post("/api/process")
 async def process_omr_sheets(
     images: List[UploadFile] = File(...),
@@ -113,6 +166,9 @@ async def process_omr_sheets(
             "output_dir": str(output_dir),
             "setLayout": False,
             "debug": True,
+            "runId": temp_dir.name,
+            # Tells the multi-marked sheets kept in the results CSV apart for /api/results
+            "sheetStatuses": True,
         }
         
         # Run the OMR processing
@@ -126,16 +182,25 @@ async def process_omr_sheets(
             "files_processed": len(images),
         }
         
-        # Try to read results CSV if available
-        csv_files = list(output_dir.rglob("*.csv"))
+        # Try to read results CSV if available (not the other CSVs, e.g. the explanation log)
+        csv_files = sorted(output_dir.rglob(RESULTS_STATUSES["ok"]))
         if csv_files:
             results["csv_file"] = str(csv_files[0].relative_to(output_dir))
+        results["results_url"] = f"/api/results/{temp_dir.name}"
         
         # List output images
         output_images = []
-        for ext in ['*.png', '*.jpg', '*.jpeg']:
+        for ext in ["*.png", "*.jpg", "*.jpeg", "*.webp"]:
             output_images.extend(output_dir.rglob(ext))
         
+        # Marked images recorded with deferred_rendering are drawn when first requested
+        for annotations_path in output_dir.rglob(ANNOTATIONS_FILENAME):
+            for _, image_path, *_ in ANNOTATION_RENDERER.get_sheets(
+                annotations_path.parent
+            ).values():
+                if not image_path.exists():
+                    output_images.append(image_path)
+
         results["output_images"] = [
             str(img.relative_to(output_dir)) for img in output_images
         ]
@@ -153,6 +218,158 @@ async def process_omr_sheets(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def load_job_results(output_dir):
+    """
+    Collects the per-sheet rows of every output directory of a job into one frame.
+    The frame is re-read only when one of the underlying CSV or sheet status files changes.
+    """
+    csv_files = sorted(
+        (status, csv_path)
+        for status, pattern in RESULTS_STATUSES.items()
+        for csv_path in output_dir.rglob(pattern)
+    )
+    status_files = sorted(output_dir.rglob(SHEET_STATUSES_FILENAME))
+    signature = [
+        (str(path), path.stat().st_mtime_ns)
+        for path in [csv_path for _, csv_path in csv_files] + status_files
+    ]
+    cached = RESULTS_CACHE.get(output_dir)
+    if cached is not None and cached[0] == signature:
+        RESULTS_CACHE.move_to_end(output_dir)
+        return cached[1]
+
+    # Jobs run by the API record the status of each sheet, as multi-marked sheets
+    # stay in the results CSV unless filter_out_multimarked_files is set
+    sheet_statuses = {}
+    for status_path in status_files:
+        with open(status_path) as f:
+            for line in f:
+                record = json.loads(line)
+                sheet_statuses[record["input_path"]] = record["status"]
+
+    frames = []
+    for status, csv_path in csv_files:
+        frame = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        # Output directories mirror the input directories
+        depth = len(Path(RESULTS_STATUSES[status]).parts)
+        frame.insert(
+            0, "directory", str(csv_path.parents[depth - 1].relative_to(output_dir))
+        )
+        frame.insert(
+            0,
+            "status",
+            [
+                sheet_statuses.get(input_path, status)
+                for input_path in frame["input_path"]
+            ],
+        )
+        frames.append(frame)
+    results = (
+        pd.concat(frames, ignore_index=True)
+        if frames
+        else pd.DataFrame(
+            columns=[
+                "status",
+                "directory",
+                "file_id",
+                "input_path",
+                "output_path",
+                "score",
+            ]
+        )
+    )
+    results.fillna("", inplace=True)
+    results["score"] = pd.to_numeric(results["score"], errors="coerce")
+
+    RESULTS_CACHE[output_dir] = (signature, results)
+    while len(RESULTS_CACHE) > RESULTS_CACHE_SIZE:
+        RESULTS_CACHE.popitem(last=False)
+    return results
+
+
+@app.get("/api/results/{job_id}")
+async def get_results(
+    job_id: str,
+    status: Optional[str] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    columns: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 100,
+):
+    """
+    Query the per-sheet results of a processed job
+
+    Args:
+        job_id: The job ID from processing
+        status: Optional comma separated statuses to keep (ok, multi_marked, error)
+        min_score: Optional lower bound on the score (inclusive)
+        max_score: Optional upper bound on the score (inclusive)
+        columns: Optional comma separated columns to return, all by default
+        offset: Number of matching records to skip
+        limit: Maximum number of records to return
+
+    Returns:
+        The matching records for the requested page along with the total count
+    """
+    output_dir = UPLOAD_DIR / job_id / "outputs"
+    if not output_dir.is_dir():
+        raise HTTPException(status_code=404, detail="Job not found")
+    if offset < 0 or not 0 < limit <= RESULTS_MAX_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid page: offset must be >= 0 and limit within 1..{RESULTS_MAX_LIMIT}",
+        )
+
+    try:
+        results = load_job_results(output_dir)
+
+        mask = pd.Series(True, index=results.index)
+        if status:
+            statuses = status.split(",")
+            invalid_statuses = sorted(set(statuses).difference(RESULTS_STATUSES))
+            if invalid_statuses:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid status: {invalid_statuses}. Only {', '.join(RESULTS_STATUSES)} allowed.",
+                )
+            mask &= results["status"].isin(statuses)
+        if min_score is not None:
+            mask &= results["score"] >= min_score
+        if max_score is not None:
+            mask &= results["score"] <= max_score
+
+        selected_columns = list(results.columns)
+        if columns:
+            selected_columns = columns.split(",")
+            missing_columns = [c for c in selected_columns if c not in results.columns]
+            if missing_columns:
+                raise HTTPException(
+                    status_code=400, detail=f"Unknown column(s): {missing_columns}"
+                )
+
+        matched = results.loc[mask, selected_columns]
+        page = matched.iloc[offset : offset + limit]
+        records = page.astype(object).where(page.notna(), None).to_dict("records")
+
+        return JSONResponse(
+            content={
+                "job_id": job_id,
+                "total": len(matched),
+                "offset": offset,
+                "limit": limit,
+                "columns": selected_columns,
+                "records": records,
+            }
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error querying results: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/download/{job_id}/{file_path:path}")
 async def download_file(job_id: str, file_path: str):
     """
@@ -169,13 +386,23 @@ async def download_file(job_id: str, file_path: str):
         base_path = UPLOAD_DIR / job_id / "outputs"
         full_path = base_path / file_path
         
-        if not full_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-        
         # Security check: ensure the file is within the allowed directory
         if not str(full_path.resolve()).startswith(str(base_path.resolve())):
             raise HTTPException(status_code=403, detail="Access denied")
         
+        if not full_path.exists() and not ANNOTATION_RENDERER.render_image(full_path):
+            # Jobs read with an archive format keep their output files in the archive shards
+            archived_file = find_archived_file(full_path)
+            if archived_file is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            return Response(
+                content=archived_file,
+                media_type="application/octet-stream",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{full_path.name}"'
+                },
+            )
+
         return FileResponse(
             path=full_path,
             filename=full_path.name,
@@ -187,6 +414,101 @@ async def download_file(job_id: str, file_path: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/thumbnail/{job_id}/{file_path:path}")
+async def get_thumbnail(
+    request: Request,
+    job_id: str,
+    file_path: str,
+    size: str = "small",
+    format: str = "jpeg",
+):
+    """
+    Serve a downscaled preview of an output image, generated once per job
+
+    Args:
+        job_id: The job ID from processing
+        file_path: Relative path to the image within the output directory
+        size: One of small, medium or large
+        format: Image encoding of the thumbnail, either jpeg or webp
+
+    Returns:
+        The thumbnail image with cache headers
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid size: {size}. Only {', '.join(THUMBNAIL_SIZES)} allowed.",
+        )
+    if format not in THUMBNAIL_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format: {format}. Only {', '.join(THUMBNAIL_FORMATS)} allowed.",
+        )
+
+    base_path = UPLOAD_DIR / job_id / "outputs"
+    full_path = base_path / file_path
+
+    # Security check: ensure the file is within the allowed directory
+    if not str(full_path.resolve()).startswith(str(base_path.resolve())):
+        raise HTTPException(status_code=403, detail="Access denied")
+    if full_path.is_file() or ANNOTATION_RENDERER.render_image(full_path):
+        source_stat = full_path.stat()
+        version = f"{source_stat.st_mtime_ns:x}-{source_stat.st_size:x}"
+
+        def read_image():
+            return cv2.imread(str(full_path))
+
+    else:
+        # Jobs read with an archive format keep their output images in the archive shards
+        archived = find_archived_entry(full_path)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        archive_dir, entry = archived
+        version = f"{entry['shard']}-{entry['offset']:x}-{entry['size']:x}"
+
+        def read_image():
+            return cv2.imdecode(
+                np.frombuffer(read_archived_file(archive_dir, entry), np.uint8),
+                cv2.IMREAD_COLOR,
+            )
+
+    try:
+        etag = f'"{version}-{size}-{format}"'
+        headers = {"Cache-Control": THUMBNAIL_CACHE_CONTROL, "ETag": etag}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        extension, media_type, params = THUMBNAIL_FORMATS[format]
+        # Keyed on the whole file path and its version, so that a.jpg and a.png
+        # do not share a thumbnail and a rewritten image gets a new one
+        thumbnail_key = hashlib.sha1(f"{file_path}:{version}".encode()).hexdigest()
+        thumbnail_path = (
+            UPLOAD_DIR / job_id / "thumbnails" / size / f"{thumbnail_key}{extension}"
+        )
+        if not thumbnail_path.exists():
+            img = read_image()
+            if img is None:
+                raise HTTPException(status_code=415, detail="Not an image file")
+            width = THUMBNAIL_SIZES[size]
+            if width < img.shape[1]:
+                img = cv2.resize(
+                    img,
+                    (width, int(img.shape[0] * width / img.shape[1])),
+                    interpolation=cv2.INTER_AREA,
+                )
+            thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
+            _, encoded = cv2.imencode(extension, img, params)
+            encoded.tofile(str(thumbnail_path))
+
+        return FileResponse(path=thumbnail_path, media_type=media_type, headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating thumbnail: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/samples")
 async def list_samples():
     """
@@ -226,6 +548,8 @@ async def cleanup_job(job_id: str):
     """
     try:
         job_dir = UPLOAD_DIR / job_id
+        LAYOUT_PREVIEW_CACHE.pop(job_id, None)
+        ANNOTATION_RENDERER.forget(job_dir)
         if job_dir.exists():
             shutil.rmtree(job_dir)
             return {"status": "success", "message": f"Job {job_id} cleaned up"}
@@ -247,7 +571,8 @@ async def auto_detect_template(image: UploadFile = File(...)):
         image: Sample OMR sheet image
     
     Returns:
-        Detected template structure with bubble positions
+        A template that validates against the template schema, along with
+        the detection summary and the marked layout image
     """
     temp_dir = Path(tempfile.mkdtemp(dir=UPLOAD_DIR))
     
@@ -263,168 +588,29 @@ async def auto_detect_template(image: UploadFile = File(...)):
         if img is None:
             raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        height, width = gray.shape
-        
-        # Apply adaptive thresholding
-        thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2
+        # Detect bubbles on a downscaled copy and cluster them into field blocks
+        template, blocks, detected_info = detect_template(img)
+        logger.info(
+            f"Auto-detected {detected_info['field_blocks']} field block(s) in {detected_info['detection_time_ms']} ms"
         )
-        
-        # Find contours (potential bubbles)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Filter contours to find circular bubbles
-        bubbles = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if 100 < area < 2000:  # Filter by area
-                # Get bounding rectangle
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / float(h)
-                
-                # Check if roughly circular (aspect ratio close to 1)
-                if 0.7 < aspect_ratio < 1.3:
-                    # Calculate circularity
-                    perimeter = cv2.arcLength(contour, True)
-                    if perimeter > 0:
-                        circularity = 4 * np.pi * area / (perimeter * perimeter)
-                        if circularity > 0.6:  # Reasonably circular
-                            bubbles.append({
-                                'x': int(x),
-                                'y': int(y),
-                                'width': int(w),
-                                'height': int(h),
-                                'center_x': int(x + w/2),
-                                'center_y': int(y + h/2)
-                            })
-        
-        # Sort bubbles by position (top to bottom, left to right)
-        bubbles.sort(key=lambda b: (b['y'], b['x']))
-        
-        # Group bubbles into rows (questions)
-        rows = []
-        current_row = []
-        y_threshold = 30  # pixels tolerance for same row
-        
-        for bubble in bubbles:
-            if not current_row:
-                current_row.append(bubble)
-            else:
-                # Check if bubble is in same row as current_row
-                avg_y = sum(b['center_y'] for b in current_row) / len(current_row)
-                if abs(bubble['center_y'] - avg_y) < y_threshold:
-                    current_row.append(bubble)
-                else:
-                    # Sort current row by x position
-                    current_row.sort(key=lambda b: b['x'])
-                    rows.append(current_row)
-                    current_row = [bubble]
-        
-        # Add last row
-        if current_row:
-            current_row.sort(key=lambda b: b['x'])
-            rows.append(current_row)
-        
-        # Filter rows to have consistent number of bubbles (most common count)
-        from collections import Counter
-        row_lengths = Counter([len(row) for row in rows])
-        most_common_length = row_lengths.most_common(1)[0][0] if row_lengths else 0
-        
-        # Keep only rows with the most common length
-        valid_rows = [row for row in rows if len(row) == most_common_length]
-        
-        # Calculate average bubble dimensions
-        if bubbles:
-            avg_width = int(np.mean([b['width'] for b in bubbles]))
-            avg_height = int(np.mean([b['height'] for b in bubbles]))
-        else:
-            avg_width = avg_height = 32
-        
-        # Calculate spacing
-        if valid_rows and len(valid_rows[0]) > 1:
-            # Horizontal spacing between bubbles
-            h_spacing = int(np.mean([
-                valid_rows[0][i+1]['x'] - valid_rows[0][i]['x']
-                for i in range(len(valid_rows[0])-1)
-            ]))
-        else:
-            h_spacing = 40
-        
-        if len(valid_rows) > 1:
-            # Vertical spacing between rows
-            v_spacing = int(np.mean([
-                valid_rows[i+1][0]['y'] - valid_rows[i][0]['y']
-                for i in range(len(valid_rows)-1)
-            ]))
-        else:
-            v_spacing = 60
-        
-        # Generate template
-        num_questions = len(valid_rows)
-        num_options = most_common_length if most_common_length > 0 else 4
-        
-        # Get the top-left position of first bubble
-        if valid_rows and valid_rows[0]:
-            origin_x = valid_rows[0][0]['x']
-            origin_y = valid_rows[0][0]['y']
-        else:
-            origin_x = origin_y = 100
-        
-        # Create field labels (Q1, Q2, etc.)
-        fields = []
-        for i in range(num_questions):
-            fields.append({
-                "fieldLabel": f"Q{i+1}",
-                "fieldType": f"QTYPE_MCQ_{num_options}",
-                "bubbleValues": [chr(65+j) for j in range(num_options)],  # A, B, C, D...
-                "origin": [0, i * v_spacing],
-                "bubblesGap": h_spacing,
-                "labelsGap": v_spacing
-            })
-        
-        template = {
-            "pageDimensions": [width, height],
-            "bubbleDimensions": [avg_width, avg_height],
-            "fieldBlocks": [{
-                "name": "Questions",
-                "origin": [origin_x, origin_y],
-                "dimensions": [num_options * h_spacing, num_questions * v_spacing],
-                "bubbleDimensions": [avg_width, avg_height],
-                "fields": fields
-            }],
-            "detected_info": {
-                "total_bubbles": len(bubbles),
-                "valid_questions": num_questions,
-                "options_per_question": num_options,
-                "bubble_spacing_horizontal": h_spacing,
-                "bubble_spacing_vertical": v_spacing
-            }
-        }
-        
+
         # Save detected image with markings
-        marked_img = img.copy()
-        for row in valid_rows:
-            for bubble in row:
-                cv2.rectangle(
-                    marked_img,
-                    (bubble['x'], bubble['y']),
-                    (bubble['x'] + bubble['width'], bubble['y'] + bubble['height']),
-                    (0, 255, 0),
-                    2
-                )
-        
+        marked_img = draw_detected_blocks(img, blocks)
+
         marked_path = temp_dir / "detected_layout.jpg"
         cv2.imwrite(str(marked_path), marked_img)
         
         return JSONResponse(content={
             "status": "success",
             "template": template,
+            "detected_info": detected_info,
             "job_id": temp_dir.name,
             "marked_image": "detected_layout.jpg"
         })
     
+    except HTTPException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
     except Exception as e:
         logger.error(f"Error in auto-detection: {str(e)}")
         if temp_dir.exists():
@@ -432,6 +618,219 @@ async def auto_detect_template(image: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def get_preprocessors_key(template_json, tuning_config):
+    """Identifies the inputs that decide the preprocessed image of a sample"""
+    return json.dumps(
+        [
+            template_json.get("preProcessors", []),
+            tuning_config.dimensions.toDict(),
+        ],
+        sort_keys=True,
+    )
+
+
+def get_layout_preview_cache(preview_id):
+    """Returns the cached state of a layout preview, making it the most recently used"""
+    cached = LAYOUT_PREVIEW_CACHE.get(preview_id)
+    if cached is None:
+        cached = LAYOUT_PREVIEW_CACHE[preview_id] = {}
+        while len(LAYOUT_PREVIEW_CACHE) > LAYOUT_PREVIEW_CACHE_SIZE:
+            LAYOUT_PREVIEW_CACHE.popitem(last=False)
+    LAYOUT_PREVIEW_CACHE.move_to_end(preview_id)
+    return cached
+
+
+def load_layout_template(preview_dir, template_json):
+    """
+    Writes the template next to its assets and parses it.
+    The parsed template is reused while the submitted template stays the same.
+    """
+    template_hash = hashlib.sha1(
+        json.dumps(template_json, sort_keys=True).encode()
+    ).hexdigest()
+    cached = get_layout_preview_cache(preview_dir.name)
+    if cached.get("template_hash") == template_hash:
+        return cached["template"], cached["tuning_config"]
+
+    config_path = preview_dir / "config.json"
+    tuning_config = CONFIG_DEFAULTS
+    if config_path.exists():
+        tuning_config = open_config_with_defaults(config_path)
+        # The server has no display to show the interactive windows on
+        tuning_config.outputs.show_image_level = 0
+    template_path = preview_dir / "template.json"
+    with open(template_path, "w") as f:
+        json.dump(template_json, f)
+    template = Template(template_path, tuning_config)
+    cached.update(
+        template_hash=template_hash, template=template, tuning_config=tuning_config
+    )
+    return template, tuning_config
+
+
+def get_preprocessed_sample(preview_dir, template, template_json, tuning_config):
+    """
+    Returns the sample image after running the template's preprocessors.
+    The result is reused until the preprocessors or the processing dimensions change.
+    """
+    preprocessors_key = get_preprocessors_key(template_json, tuning_config)
+    cached = get_layout_preview_cache(preview_dir.name)
+    if cached.get("preprocessors_key") == preprocessors_key:
+        return cached["preprocessed"]
+
+    # Fall back to the copy on disk when the in-memory entry was evicted
+    preprocessed_path = preview_dir / "preprocessed.png"
+    key_path = preview_dir / "preprocessed.key"
+    if (
+        "preprocessors_key" not in cached
+        and preprocessed_path.exists()
+        and key_path.exists()
+        and key_path.read_text() == preprocessors_key
+    ):
+        preprocessed = cv2.imread(str(preprocessed_path), cv2.IMREAD_GRAYSCALE)
+    else:
+        sample_path = next(preview_dir.glob("sample.*"))
+        in_omr = cv2.imread(str(sample_path), cv2.IMREAD_GRAYSCALE)
+        preprocessed = template.image_instance_ops.apply_preprocessors(
+            str(sample_path), in_omr, template, SheetContext(str(sample_path))
+        )
+        if preprocessed is None:
+            raise HTTPException(
+                status_code=422,
+                detail="Preprocessors could not process the sample image",
+            )
+        cv2.imwrite(str(preprocessed_path), preprocessed)
+        key_path.write_text(preprocessors_key)
+
+    cached.update(preprocessors_key=preprocessors_key, preprocessed=preprocessed)
+    return preprocessed
+
+
+@app.post("/api/layout-preview")
+async def create_layout_preview(
+    image: UploadFile = File(...),
+    template: UploadFile = File(...),
+    config: Optional[UploadFile] = File(None),
+    assets: List[UploadFile] = File([]),
+):
+    """
+    Upload a sample sheet for layout previews and run its preprocessors once
+
+    Args:
+        image: Sample OMR sheet image
+        template: template.json whose preProcessors are applied to the sample
+        config: Optional config.json file
+        assets: Optional files referenced by the preprocessors (e.g. marker images)
+
+    Returns:
+        The preview id to render edited templates against
+    """
+    preview_dir = Path(tempfile.mkdtemp(dir=UPLOAD_DIR, prefix="layout_"))
+
+    try:
+        ext = Path(image.filename).suffix.lower()
+        if ext not in [".png", ".jpg", ".jpeg"]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid image format: {image.filename}. Only PNG, JPG, JPEG allowed.",
+            )
+        with open(preview_dir / f"sample{ext}", "wb") as f:
+            f.write(await image.read())
+
+        if config and config.filename:
+            with open(preview_dir / "config.json", "wb") as f:
+                f.write(await config.read())
+
+        for asset in assets:
+            if asset.filename:
+                with open(preview_dir / Path(asset.filename).name, "wb") as f:
+                    f.write(await asset.read())
+
+        template_json = json.loads(await template.read())
+        start = perf_counter()
+        layout_template, tuning_config = load_layout_template(
+            preview_dir, template_json
+        )
+        preprocessed = get_preprocessed_sample(
+            preview_dir, layout_template, template_json, tuning_config
+        )
+
+        return JSONResponse(
+            content={
+                "status": "success",
+                "preview_id": preview_dir.name,
+                "preprocessed_shape": list(preprocessed.shape),
+                "preprocessing_time_ms": round((perf_counter() - start) * 1000, 1),
+            }
+        )
+
+    except HTTPException:
+        shutil.rmtree(preview_dir, ignore_errors=True)
+        raise
+    except Exception as e:
+        logger.error(f"Error preparing layout preview: {str(e)}")
+        shutil.rmtree(preview_dir, ignore_errors=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/layout-preview/{preview_id}")
+async def render_layout_preview(
+    preview_id: str,
+    template: dict = Body(...),
+    format: str = "png",
+    width: Optional[int] = None,
+):
+    """
+    Render the layout of an edited template over the preprocessed sample
+
+    Args:
+        preview_id: The id returned on upload of the sample
+        template: The edited template JSON
+        format: Image encoding of the overlay, either png or webp
+        width: Optional width to downscale the overlay to before encoding
+
+    Returns:
+        The encoded overlay image
+    """
+    if format not in LAYOUT_PREVIEW_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format: {format}. Only {', '.join(LAYOUT_PREVIEW_FORMATS)} allowed.",
+        )
+    preview_dir = UPLOAD_DIR / preview_id
+    if not preview_dir.name.startswith("layout_") or not preview_dir.is_dir():
+        raise HTTPException(status_code=404, detail="Layout preview not found")
+
+    try:
+        start = perf_counter()
+        layout_template, tuning_config = load_layout_template(preview_dir, template)
+        preprocessed = get_preprocessed_sample(
+            preview_dir, layout_template, template, tuning_config
+        )
+        template_layout = layout_template.image_instance_ops.draw_template_layout(
+            preprocessed, layout_template, shifted=False, border=2
+        )
+        if width and width < template_layout.shape[1]:
+            template_layout = ImageUtils.resize_util(template_layout, width)
+        extension, media_type, params = LAYOUT_PREVIEW_FORMATS[format]
+        _, encoded = cv2.imencode(extension, template_layout, params)
+
+        return Response(
+            content=encoded.tobytes(),
+            media_type=media_type,
+            headers={
+                "Cache-Control": "no-store",
+                "X-Render-Time-Ms": str(round((perf_counter() - start) * 1000, 1)),
+            },
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering layout preview: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
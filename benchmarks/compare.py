@@ -0,0 +1,134 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+
+import argparse
+import json
+import sys
+
+from rich.table import Table
+
+from src.logger import console, logger
+
+BASELINE_STATS = ("min", "median", "mean", "stddev", "rounds")
+
+
+def load_benchmarks(path):
+    """Reads the benchmarks of a baseline, or of a --benchmark-json output of pytest-benchmark"""
+    with open(path) as f:
+        content = json.load(f)
+    benchmarks = content["benchmarks"]
+    if isinstance(benchmarks, dict):
+        # already a baseline
+        return benchmarks
+    return {
+        benchmark["fullname"]: {
+            **{stat: benchmark["stats"][stat] for stat in BASELINE_STATS},
+            "extra_info": benchmark["extra_info"],
+        }
+        for benchmark in benchmarks
+    }
+
+
+def save_baseline(results_path, baseline_path):
+    with open(results_path) as f:
+        machine_info = json.load(f)["machine_info"]
+    baseline = {
+        "machine_info": {
+            key: machine_info.get(key)
+            for key in ("python_version", "system", "machine", "cpu")
+        },
+        "benchmarks": load_benchmarks(results_path),
+    }
+    if baseline["machine_info"]["cpu"]:
+        baseline["machine_info"]["cpu"] = {
+            key: baseline["machine_info"]["cpu"].get(key)
+            for key in ("brand_raw", "count")
+        }
+    with open(baseline_path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    logger.info(
+        f"Saved {len(baseline['benchmarks'])} benchmark(s) as the baseline '{baseline_path}'"
+    )
+
+
+def compare_to_baseline(baseline_path, results_path, threshold, stat):
+    """Returns the names of the benchmarks that got slower than the baseline by more than threshold"""
+    baseline, results = load_benchmarks(baseline_path), load_benchmarks(results_path)
+    table = Table(title=f"Benchmarks vs '{baseline_path}' ({stat})")
+    table.add_column("Benchmark", style="cyan", no_wrap=True)
+    table.add_column("Baseline (ms)", justify="right")
+    table.add_column("Current (ms)", justify="right")
+    table.add_column("Change", justify="right")
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            table.add_row(name, "-", f"{result[stat] * 1000:.2f}", "new")
+            continue
+        before, after = baseline[name][stat], result[stat]
+        change = (after - before) / before
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        table.add_row(
+            name,
+            f"{before * 1000:.2f}",
+            f"{after * 1000:.2f}",
+            f"[{'red' if regressed else 'green'}]{change:+.1%}",
+        )
+    console.print(table)
+    return regressions
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description="Save benchmark results as a baseline, or check them against one"
+    )
+    subparsers = argparser.add_subparsers(dest="command", required=True)
+
+    save_parser = subparsers.add_parser(
+        "save", help="Save the results of a --benchmark-json run as a baseline."
+    )
+    save_parser.add_argument("results_path")
+    save_parser.add_argument("baseline_path")
+
+    check_parser = subparsers.add_parser(
+        "check",
+        help="Fail when a benchmark got slower than the baseline by more than the threshold.",
+    )
+    check_parser.add_argument("baseline_path")
+    check_parser.add_argument("results_path")
+    check_parser.add_argument(
+        "--threshold",
+        default=0.2,
+        type=float,
+        help="Allowed slowdown as a fraction of the baseline (default 0.2).",
+    )
+    check_parser.add_argument(
+        "--stat",
+        default="median",
+        choices=["min", "median", "mean"],
+        help="Statistic to compare (default median).",
+    )
+    return vars(argparser.parse_args())
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args["command"] == "save":
+        save_baseline(args["results_path"], args["baseline_path"])
+    else:
+        regressions = compare_to_baseline(
+            args["baseline_path"], args["results_path"], args["threshold"], args["stat"]
+        )
+        if regressions:
+            logger.error(
+                f"{len(regressions)} benchmark(s) regressed by more than {args['threshold']:.0%}: {regressions}"
+            )
+            sys.exit(1)
+        logger.info("No benchmark regressed past the threshold")
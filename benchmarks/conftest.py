@@ -0,0 +1,110 @@
+import json
+import logging
+from pathlib import Path
+
+import cv2
+import pytest
+
+from src.core import SheetContext
+from src.defaults import CONFIG_DEFAULTS
+from src.entry import collect_directory_jobs
+from src.evaluation import EvaluationConfig
+from src.logger import logger
+from src.template import Template
+from src.utils.image import ImageUtils
+from src.utils.parsing import get_concatenated_response, open_config_with_defaults
+
+BENCHMARKS_DIR = Path(__file__).parent
+BUDGETS = json.loads(BENCHMARKS_DIR.joinpath("budgets.json").read_text())
+
+# A template with markers, alignment-free reading and an answer key
+MARKERS_SAMPLE_DIR = Path("samples", "community", "UmarFarootAPS")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def quiet_logs():
+    # Log lines are not what is being measured here
+    log_level = logger.log.level
+    logger.log.setLevel(logging.WARNING)
+    yield
+    logger.log.setLevel(log_level)
+
+
+@pytest.fixture(autouse=True)
+def check_stage_budget(request):
+    """Fails a benchmark whose median goes past its budget in budgets.json"""
+    if "benchmark" not in request.fixturenames:
+        yield
+        return
+    benchmark = request.getfixturevalue("benchmark")
+    yield
+    if benchmark.disabled or benchmark.stats is None:
+        return
+    stage = benchmark.extra_info["stage"]
+    median_ms = benchmark.stats.stats.median * 1000
+    if "sheets" in benchmark.extra_info:
+        median_ms /= benchmark.extra_info["sheets"]
+    budget_ms = BUDGETS[stage]
+    assert (
+        median_ms <= budget_ms
+    ), f"'{stage}' took {median_ms:.2f} ms, over its budget of {budget_ms} ms"
+
+
+def collect_sample_jobs(sample_dir, output_dir):
+    args = {"setLayout": False, "output_dir": output_dir}
+    directory_jobs = []
+    collect_directory_jobs(sample_dir, sample_dir, args, directory_jobs)
+    for directory_job in directory_jobs:
+        tuning_config = directory_job.tuning_config
+        if tuning_config is CONFIG_DEFAULTS:
+            continue
+        # Measure the reading itself, not the debug windows and image stacks
+        tuning_config.outputs.show_image_level = 0
+        tuning_config.outputs.save_image_level = 0
+        directory_job.template.image_instance_ops.save_image_level = 0
+    return directory_jobs
+
+
+class MarkersSample:
+    """The template, evaluation and a sheet of the markers sample, at each stage of reading"""
+
+    def __init__(self):
+        self.tuning_config = open_config_with_defaults(
+            MARKERS_SAMPLE_DIR.joinpath("config.json")
+        )
+        self.template = Template(
+            MARKERS_SAMPLE_DIR.joinpath("template.json"), self.tuning_config
+        )
+        self.evaluation_config = EvaluationConfig(
+            MARKERS_SAMPLE_DIR,
+            MARKERS_SAMPLE_DIR.joinpath("evaluation.json"),
+            self.template,
+            self.tuning_config,
+        )
+        # Printing the explanation table would dwarf the scoring itself
+        self.evaluation_config.should_explain_scoring = False
+        (self.crop_on_markers,) = self.template.pre_processors
+        image_ops = self.template.image_instance_ops
+
+        self.file_path = MARKERS_SAMPLE_DIR.joinpath("scans", "scan-type-1.jpg")
+        self.image = cv2.imread(str(self.file_path), cv2.IMREAD_GRAYSCALE)
+        dimensions = self.tuning_config.dimensions
+        self.resized = ImageUtils.resize_util(
+            self.image, dimensions.processing_width, dimensions.processing_height
+        )
+        self.warped = image_ops.apply_preprocessors(
+            self.file_path, self.image, self.template, SheetContext(self.file_path)
+        )
+        self.page = ImageUtils.resize_util(self.warped, *self.template.page_dimensions)
+        response_dict, *_ = image_ops.read_omr_response(
+            self.template,
+            image=self.warped,
+            name=self.file_path.name,
+            context=SheetContext(self.file_path),
+        )
+        self.omr_response = get_concatenated_response(response_dict, self.template)
+
+
+@pytest.fixture(scope="session")
+def markers_sample():
+    return MarkersSample()
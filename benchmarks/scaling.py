@@ -0,0 +1,262 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+
+import argparse
+import json
+import logging
+import sys
+import tracemalloc
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import matplotlib.pyplot as plt
+import numpy as np
+from rich.table import Table
+
+from src.core import SheetContext
+from src.defaults import CONFIG_DEFAULTS
+from src.logger import console, logger
+from src.template import Template
+from src.utils.parsing import get_concatenated_response
+from src.utils.synthetic import SyntheticSheetGenerator
+
+DEFAULT_BUBBLE_COUNTS = (1000, 2000, 5000, 10000, 20000)
+# Costs growing faster than bubbles**MAX_SCALING_EXPONENT are reported as super-linear
+MAX_SCALING_EXPONENT = 1.25
+
+# Layout of the generated exam templates (in pixels of the page)
+BUBBLE_SIZE = 20
+BUBBLE_PITCH = 24
+QUESTIONS_PER_BLOCK = 50
+BLOCK_COLUMNS = 10
+BLOCK_MARGIN = 40
+HEADER_HEIGHT = 300
+# Roll number (10 digits) and booklet code fields
+HEADER_BUBBLES = 10 * 10 + 4
+
+
+def get_exam_template(bubble_count):
+    """Returns an entrance-exam template.json of about bubble_count bubbles:
+    a roll number, a booklet code and MCQ5 questions in blocks of QUESTIONS_PER_BLOCK"""
+    question_count = max(1, round((bubble_count - HEADER_BUBBLES) / 5))
+    field_blocks = {
+        "Roll": {
+            "fieldType": "QTYPE_INT",
+            "fieldLabels": ["roll1..10"],
+            "bubblesGap": BUBBLE_PITCH,
+            "labelsGap": BUBBLE_PITCH,
+            "origin": [BLOCK_MARGIN, BLOCK_MARGIN],
+        },
+        "Booklet": {
+            "fieldType": "QTYPE_MCQ4",
+            "fieldLabels": ["booklet"],
+            "bubblesGap": BUBBLE_PITCH,
+            "labelsGap": BUBBLE_PITCH,
+            "origin": [BLOCK_MARGIN + 12 * BUBBLE_PITCH, BLOCK_MARGIN],
+        },
+    }
+    block_width = 5 * BUBBLE_PITCH + BLOCK_MARGIN
+    block_height = QUESTIONS_PER_BLOCK * BUBBLE_PITCH + BLOCK_MARGIN
+    block_count = -(-question_count // QUESTIONS_PER_BLOCK)
+    for block in range(block_count):
+        start = block * QUESTIONS_PER_BLOCK + 1
+        end = min(question_count, start + QUESTIONS_PER_BLOCK - 1)
+        field_blocks[f"MCQBlock{block + 1}"] = {
+            "fieldType": "QTYPE_MCQ5",
+            "fieldLabels": [f"q{start}..{end}"],
+            "bubblesGap": BUBBLE_PITCH,
+            "labelsGap": BUBBLE_PITCH,
+            "origin": [
+                BLOCK_MARGIN + (block % BLOCK_COLUMNS) * block_width,
+                HEADER_HEIGHT + (block // BLOCK_COLUMNS) * block_height,
+            ],
+        }
+    block_rows = -(-block_count // BLOCK_COLUMNS)
+    return {
+        "pageDimensions": [
+            BLOCK_MARGIN + min(block_count, BLOCK_COLUMNS) * block_width,
+            HEADER_HEIGHT + block_rows * block_height,
+        ],
+        "bubbleDimensions": [BUBBLE_SIZE, BUBBLE_SIZE],
+        "fieldBlocks": field_blocks,
+    }
+
+
+def measure(function, repeat):
+    """Returns the fastest of repeat runs (in seconds) and the peak of traced memory (in bytes)"""
+    durations = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        durations.append(perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(durations), peak
+
+
+def measure_template_size(bubble_count, repeat=3):
+    """Measures building a template of about bubble_count bubbles, reading a sheet of it and drawing its layout"""
+    with TemporaryDirectory() as template_dir:
+        template_path = Path(template_dir, "template.json")
+        template_path.write_text(json.dumps(get_exam_template(bubble_count)))
+
+        build_seconds, build_peak = measure(
+            lambda: Template(template_path, CONFIG_DEFAULTS), repeat
+        )
+        template = Template(template_path, CONFIG_DEFAULTS)
+        generator = SyntheticSheetGenerator(template_path)
+        rng = generator.get_rng(0)
+        page = generator.render_page(generator.random_response(rng), rng)
+
+    image_ops = template.image_instance_ops
+
+    def read_sheet():
+        response_dict, *_ = image_ops.read_omr_response(
+            template, image=page, name="scaling.jpg", context=SheetContext(None)
+        )
+        return get_concatenated_response(response_dict, template)
+
+    read_seconds, read_peak = measure(read_sheet, repeat)
+    layout_seconds, _ = measure(
+        lambda: image_ops.draw_template_layout(page, template, draw_qvals=True),
+        repeat,
+    )
+    return {
+        "bubbles": sum(
+            len(field_block_bubbles)
+            for field_block in template.field_blocks
+            for field_block_bubbles in field_block.traverse_bubbles
+        ),
+        "build_seconds": build_seconds,
+        "build_peak": build_peak,
+        "read_seconds": read_seconds,
+        "read_peak": read_peak,
+        "layout_seconds": layout_seconds,
+    }
+
+
+def get_scaling_exponents(rows):
+    """Fits cost ~ bubbles**exponent on a log-log scale, for each measured cost"""
+    bubbles = np.log([row["bubbles"] for row in rows])
+    return {
+        key: float(np.polyfit(bubbles, np.log([row[key] for row in rows]), 1)[0])
+        for key in ["build_seconds", "build_peak", "read_seconds", "layout_seconds"]
+    }
+
+
+def print_scaling_table(rows, exponents):
+    table = Table(title="Template Scaling")
+    table.add_column("Bubbles", justify="right", style="cyan")
+    table.add_column("Build (ms)", justify="right")
+    table.add_column("Build Memory (MB)", justify="right")
+    table.add_column("Read (ms/sheet)", justify="right")
+    table.add_column("Read (µs/bubble)", justify="right")
+    table.add_column("Read Memory (MB)", justify="right")
+    table.add_column("Layout (ms)", justify="right")
+    for row in rows:
+        table.add_row(
+            str(row["bubbles"]),
+            f"{row['build_seconds'] * 1000:.1f}",
+            f"{row['build_peak'] / 2**20:.1f}",
+            f"{row['read_seconds'] * 1000:.1f}",
+            f"{row['read_seconds'] * 1e6 / row['bubbles']:.2f}",
+            f"{row['read_peak'] / 2**20:.1f}",
+            f"{row['layout_seconds'] * 1000:.1f}",
+        )
+
+    def format_exponent(key):
+        exponent = exponents[key]
+        return (
+            f"[{'red' if exponent > MAX_SCALING_EXPONENT else 'green'}]{exponent:.2f}"
+        )
+
+    table.add_section()
+    table.add_row(
+        "Exponent",
+        format_exponent("build_seconds"),
+        format_exponent("build_peak"),
+        format_exponent("read_seconds"),
+        "",
+        "",
+        format_exponent("layout_seconds"),
+    )
+    console.print(table, justify="center")
+
+
+def plot_scaling_curve(rows, plot_path):
+    bubbles = [row["bubbles"] for row in rows]
+    figure, axes = plt.subplots()
+    for key, label in [
+        ("build_seconds", "Template build"),
+        ("read_seconds", "Read per sheet"),
+        ("layout_seconds", "Template layout"),
+    ]:
+        axes.loglog(bubbles, [row[key] for row in rows], marker="o", label=label)
+    axes.set_xlabel("Bubbles")
+    axes.set_ylabel("Seconds")
+    axes.legend()
+    figure.savefig(plot_path)
+    plt.close(figure)
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description="Measure how template building and reading scale with the number of bubbles"
+    )
+    argparser.add_argument(
+        "--bubbles",
+        default=list(DEFAULT_BUBBLE_COUNTS),
+        nargs="+",
+        type=int,
+        dest="bubble_counts",
+        help="Approximate bubble counts of the generated templates.",
+    )
+    argparser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        dest="repeat",
+        help="Runs per measurement, the fastest of which is reported.",
+    )
+    argparser.add_argument(
+        "--plot",
+        default=None,
+        dest="plot_path",
+        help="Path to save a log-log plot of the scaling curve to.",
+    )
+    return vars(argparser.parse_args())
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Log lines are not what is being measured here
+    logger.log.setLevel(logging.WARNING)
+    rows = [
+        measure_template_size(bubble_count, args["repeat"])
+        for bubble_count in args["bubble_counts"]
+    ]
+    exponents = get_scaling_exponents(rows)
+    print_scaling_table(rows, exponents)
+    if args["plot_path"]:
+        plot_scaling_curve(rows, args["plot_path"])
+    super_linear = {
+        key: exponent
+        for key, exponent in exponents.items()
+        if exponent > MAX_SCALING_EXPONENT
+    }
+    if super_linear:
+        logger.error(
+            f"Super-linear scaling (exponent > {MAX_SCALING_EXPONENT}): {super_linear}"
+        )
+        sys.exit(1)
@@ -0,0 +1,17 @@
+from benchmarks.scaling import (
+    MAX_SCALING_EXPONENT,
+    get_scaling_exponents,
+    measure_template_size,
+)
+
+
+def test_template_costs_scale_linearly():
+    rows = [measure_template_size(bubble_count) for bubble_count in (1000, 4000)]
+    assert rows[1]["bubbles"] > 3 * rows[0]["bubbles"]
+    exponents = get_scaling_exponents(rows)
+    super_linear = {
+        key: exponent
+        for key, exponent in exponents.items()
+        if exponent > MAX_SCALING_EXPONENT
+    }
+    assert not super_linear, f"Super-linear scaling: {super_linear}"
@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.conftest import collect_sample_jobs
+from src.entry import process_directory_jobs
+
+SAMPLE_DIRS = sorted(
+    str(path.relative_to("samples"))
+    for path in Path("samples").iterdir()
+    if path.is_dir()
+)
+
+
+@pytest.mark.parametrize("sample", SAMPLE_DIRS)
+def test_sample_sheets(benchmark, sample, tmp_path):
+    directory_jobs = collect_sample_jobs(Path("samples", sample), tmp_path)
+    sheets = sum(len(directory_job.omr_files) for directory_job in directory_jobs)
+    benchmark.extra_info.update({"stage": "sheet", "sheets": sheets})
+
+    benchmark.pedantic(
+        process_directory_jobs, args=(directory_jobs,), rounds=3, warmup_rounds=1
+    )
+
+    benchmark.extra_info["sheets_per_second"] = round(
+        sheets / benchmark.stats.stats.median, 2
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+
+from src.evaluation import evaluate_concatenated_response
+from src.utils.image import ImageUtils
+
+
+def test_get_best_match(benchmark, markers_sample):
+    benchmark.extra_info["stage"] = "get_best_match"
+    image_eroded_sub = ImageUtils.normalize_util(markers_sample.resized)
+    best_scale, _ = benchmark(
+        markers_sample.crop_on_markers.getBestMatch, image_eroded_sub
+    )
+    assert best_scale is not None
+
+
+def test_four_point_transform(benchmark, markers_sample):
+    benchmark.extra_info["stage"] = "four_point_transform"
+    h, w = markers_sample.resized.shape[:2]
+    corners = np.array([[40, 30], [w - 50, 45], [w - 35, h - 40], [25, h - 55]])
+    warped = benchmark(ImageUtils.four_point_transform, markers_sample.resized, corners)
+    assert warped.size > 0
+
+
+def test_bubble_means(benchmark, markers_sample):
+    benchmark.extra_info["stage"] = "bubble_means"
+    template = markers_sample.template
+    image_ops = template.image_instance_ops
+
+    def read_all_field_blocks():
+        return [
+            image_ops.get_field_block_strip_means(markers_sample.page, field_block)
+            for field_block in template.field_blocks
+        ]
+
+    field_block_strips = benchmark(read_all_field_blocks)
+    assert len(field_block_strips) == len(template.field_blocks)
+
+
+def test_get_global_threshold(benchmark, markers_sample):
+    benchmark.extra_info["stage"] = "get_global_threshold"
+    template = markers_sample.template
+    image_ops = template.image_instance_ops
+    all_q_vals = [
+        q_val
+        for field_block in template.field_blocks
+        for q_strip_vals in image_ops.get_field_block_strip_means(
+            markers_sample.page, field_block
+        )
+        for q_val in q_strip_vals
+    ]
+    global_thr, _, _ = benchmark(
+        image_ops.get_global_threshold, all_q_vals, looseness=4, plot_show=False
+    )
+    assert 0 < global_thr <= 255
+
+
+def test_evaluate_concatenated_response(benchmark, markers_sample, tmp_path):
+    benchmark.extra_info["stage"] = "evaluate_concatenated_response"
+    score = benchmark(
+        evaluate_concatenated_response,
+        markers_sample.omr_response,
+        markers_sample.evaluation_config,
+        markers_sample.file_path,
+        tmp_path,
+    )
+    assert score > 0
@@ -0,0 +1,126 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from src.utils.parity import PARITY_MODES, ParityHarness
+from src.utils.synthetic import SyntheticSheetGenerator
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description="Check that alternative engines and modes read sheets exactly like the reference"
+    )
+
+    argparser.add_argument(
+        "-i",
+        "--inputDir",
+        default=["samples"],
+        nargs="*",
+        type=str,
+        dest="input_paths",
+        help="Directories of sheets (with their templates) to compare the modes on.",
+    )
+
+    argparser.add_argument(
+        "-o",
+        "--outputDir",
+        default="outputs/parity",
+        required=False,
+        dest="output_dir",
+        help="Directory for the report and the images of the mismatched sheets.",
+    )
+
+    alternative_modes = [name for name in PARITY_MODES if name != "reference"]
+    argparser.add_argument(
+        "--modes",
+        default=alternative_modes,
+        nargs="+",
+        choices=alternative_modes,
+        dest="modes",
+        help="Modes to compare with the reference (default all).",
+    )
+
+    argparser.add_argument(
+        "--synthetic",
+        default=[],
+        nargs="*",
+        dest="synthetic_templates",
+        help="Template(s) to also generate sheets from and compare the modes on.",
+    )
+
+    argparser.add_argument(
+        "--count",
+        default=20,
+        type=int,
+        dest="count",
+        help="Number of sheets to generate for each of the --synthetic templates.",
+    )
+
+    argparser.add_argument(
+        "--seed", default=0, type=int, dest="seed", help="Seed of the generated sheets."
+    )
+
+    argparser.add_argument(
+        "--warp",
+        default=0.0,
+        type=float,
+        dest="warp",
+        help="Perspective warp of the generated sheets (see generate_sheets.py).",
+    )
+
+    argparser.add_argument(
+        "--noise",
+        default=8.0,
+        type=float,
+        dest="noise",
+        help="Standard deviation of the noise added to the generated sheets.",
+    )
+
+    argparser.add_argument(
+        "--cornerTolerance",
+        default=0.5,
+        type=float,
+        dest="corner_tolerance",
+        help="Largest allowed difference of a warped corner coordinate, in pixels.",
+    )
+
+    argparser.add_argument(
+        "--thresholdTolerance",
+        default=1e-6,
+        type=float,
+        dest="threshold_tolerance",
+        help="Largest allowed difference of a threshold.",
+    )
+
+    return vars(argparser.parse_args())
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output_dir = Path(args["output_dir"])
+    input_paths = list(args["input_paths"])
+    for template_path in args["synthetic_templates"]:
+        template_path = Path(template_path)
+        synthetic_dir = output_dir.joinpath("synthetic", template_path.parent.name)
+        SyntheticSheetGenerator(
+            template_path, seed=args["seed"], warp=args["warp"], noise=args["noise"]
+        ).generate(synthetic_dir, args["count"])
+        input_paths.append(synthetic_dir)
+
+    harness = ParityHarness(
+        [PARITY_MODES[name] for name in args["modes"]],
+        output_dir,
+        corner_tolerance=args["corner_tolerance"],
+        threshold_tolerance=args["threshold_tolerance"],
+    )
+    if harness.run(input_paths):
+        sys.exit(1)
@@ -5,7 +5,7 @@ import { useDropzone } from 'react-dropzone'
 import { ArrowLeft, Upload, Sparkles, Download, Save, Check, Edit2 } from 'lucide-react'
 import Link from 'next/link'
 import { useRouter } from 'next/navigation'
-import { autoDetectTemplate, getDownloadUrl, getServerUrl } from '@/lib/api'
+import { autoDetectTemplate, getDownloadUrl, getServerUrl, type DetectedInfo } from '@/lib/api'
 import { useBuilder } from '@/contexts/BuilderContext'
 
 export default function SmartDetection() {
@@ -16,6 +16,7 @@ export default function SmartDetection() {
   const [uploadedImage, setUploadedImage] = useState<File | null>(null)
   const [previewUrl, setPreviewUrl] = useState<string | null>(null)
   const [detectedTemplate, setDetectedTemplate] = useState<any>(null)
+  const [detectedInfo, setDetectedInfo] = useState<DetectedInfo | null>(null)
   const [markedImageUrl, setMarkedImageUrl] = useState<string | null>(null)
   const [jobId, setJobId] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
@@ -71,11 +72,12 @@ export default function SmartDetection() {
       console.log('Detection result:', result)
       
       setDetectedTemplate(result.template)
+      setDetectedInfo(result.detected_info)
       setJobId(result.job_id)
   setMarkedImageUrl(getDownloadUrl(result.job_id, result.marked_image))
       
       // Initialize answers array
-      const numQuestions = result.template.detected_info.valid_questions
+      const numQuestions = result.detected_info.valid_questions
       setAnswers(new Array(numQuestions).fill('A'))
       
       setStep('review')
@@ -287,7 +289,7 @@ export default function SmartDetection() {
         )}
 
         {/* Review Step */}
-        {step === 'review' && detectedTemplate && (
+        {step === 'review' && detectedTemplate && detectedInfo && (
           <div className="space-y-6">
             <div className="bg-white rounded-lg shadow-lg p-6">
               <h2 className="text-xl font-semibold text-gray-900 mb-4">Detection Results</h2>
@@ -315,21 +317,21 @@ export default function SmartDetection() {
                         <span className="font-medium text-green-900">Questions Detected</span>
                       </div>
                       <p className="text-3xl font-bold text-green-600">
-                        {detectedTemplate.detected_info.valid_questions}
+                        {detectedInfo.valid_questions}
                       </p>
                     </div>
 
                     <div className="bg-blue-50 border border-blue-200 rounded-lg p-4">
                       <p className="text-sm text-gray-600">Options per Question</p>
                       <p className="text-2xl font-bold text-blue-600">
-                        {detectedTemplate.detected_info.options_per_question}
+                        {detectedInfo.options_per_question}
                       </p>
                     </div>
 
                     <div className="bg-purple-50 border border-purple-200 rounded-lg p-4">
                       <p className="text-sm text-gray-600">Total Bubbles</p>
                       <p className="text-2xl font-bold text-purple-600">
-                        {detectedTemplate.detected_info.total_bubbles}
+                        {detectedInfo.total_bubbles}
                       </p>
                     </div>
                   </div>
@@ -365,13 +367,13 @@ export default function SmartDetection() {
         )}
 
         {/* Answers Step */}
-        {step === 'answers' && detectedTemplate && (
+        {step === 'answers' && detectedTemplate && detectedInfo && (
           <div className="bg-white rounded-lg shadow-lg p-6">
             <div className="flex items-center justify-between mb-6">
               <div>
                 <h2 className="text-xl font-semibold text-gray-900">Enter Answer Key</h2>
                 <p className="text-sm text-gray-600 mt-1">
-                  Set the correct answer for each of the {detectedTemplate.detected_info.valid_questions} questions
+                  Set the correct answer for each of the {detectedInfo.valid_questions} questions
                 </p>
               </div>
               <button
@@ -392,7 +394,7 @@ export default function SmartDetection() {
                     onChange={(e) => handleAnswerChange(index, e.target.value)}
                     className="flex-1 px-2 py-1 border border-gray-300 rounded focus:outline-none focus:ring-2 focus:ring-purple-500 text-sm"
                   >
-                    {Array.from({ length: detectedTemplate.detected_info.options_per_question }, (_, i) => (
+                    {Array.from({ length: detectedInfo.options_per_question }, (_, i) => (
                       <option key={i} value={String.fromCharCode(65 + i)}>
                         {String.fromCharCode(65 + i)}
                       </option>
@@ -1,7 +1,7 @@
 'use client'
 
 import { Download, FileText, Image as ImageIcon } from 'lucide-react'
-import { getDownloadUrl } from '@/lib/api'
+import { getDownloadUrl, getThumbnailUrl } from '@/lib/api'
 
 interface ResultsSectionProps {
   results: any
@@ -93,6 +93,19 @@ export default function ResultsSection({
                     </p>
                   </div>
                 </div>
+                <a
+                  href={getThumbnailUrl(results.job_id, image, 'large')}
+                  target="_blank"
+                  rel="noopener noreferrer"
+                >
+                  {/* eslint-disable-next-line @next/next/no-img-element */}
+                  <img
+                    src={getThumbnailUrl(results.job_id, image, 'small')}
+                    alt={image.split('/').pop() ?? image}
+                    loading="lazy"
+                    className="w-full h-40 object-contain bg-white rounded mb-2"
+                  />
+                </a>
                 <button
                   onClick={() => downloadFile(results.job_id, image)}
                   className="w-full bg-gray-200 text-gray-700 px-3 py-2 rounded hover:bg-gray-300 transition-colors text-sm"
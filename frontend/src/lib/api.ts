@@ -29,6 +29,15 @@ export const getApiUrl = (path = '') => joinUrl(API_BASE_URL, path)
 export const getDownloadUrl = (jobId: string, filePath: string) =>
   getApiUrl(`download/${jobId}/${filePath}`)
 
+export type ThumbnailSize = 'small' | 'medium' | 'large'
+
+export const getThumbnailUrl = (
+  jobId: string,
+  filePath: string,
+  size: ThumbnailSize = 'small',
+  format: 'jpeg' | 'webp' = 'webp'
+) => getApiUrl(`thumbnail/${jobId}/${filePath}?size=${size}&format=${format}`)
+
 export interface ProcessResult {
   status: string
   message: string
@@ -37,6 +46,44 @@ export interface ProcessResult {
   csv_file?: string
   output_images: string[]
   job_id: string
+  results_url: string
+}
+
+export type SheetStatus = 'ok' | 'multi_marked' | 'error'
+
+export interface ResultsQuery {
+  status?: SheetStatus[]
+  minScore?: number
+  maxScore?: number
+  columns?: string[]
+  offset?: number
+  limit?: number
+}
+
+export interface ResultsPage {
+  job_id: string
+  total: number
+  offset: number
+  limit: number
+  columns: string[]
+  records: Record<string, string | number | null>[]
+}
+
+export async function fetchResults(
+  jobId: string,
+  query: ResultsQuery = {}
+): Promise<ResultsPage> {
+  const response = await axios.get<ResultsPage>(getApiUrl(`results/${jobId}`), {
+    params: {
+      status: query.status?.join(','),
+      min_score: query.minScore,
+      max_score: query.maxScore,
+      columns: query.columns?.join(','),
+      offset: query.offset,
+      limit: query.limit,
+    },
+  })
+  return response.data
 }
 
 export async function processOMRSheets(
@@ -105,9 +152,20 @@ export async function listSamples() {
   }
 }
 
+export interface DetectedInfo {
+  total_bubbles: number
+  field_blocks: number
+  valid_questions: number
+  options_per_question: number
+  bubble_spacing_horizontal: number
+  bubble_spacing_vertical: number
+  detection_time_ms: number
+}
+
 export interface AutoDetectResult {
   status: string
   template: any
+  detected_info: DetectedInfo
   job_id: string
   marked_image: string
 }
@@ -139,3 +197,66 @@ export async function autoDetectTemplate(image: File): Promise<AutoDetectResult>
     }
   }
 }
+
+export interface LayoutPreviewResult {
+  status: string
+  preview_id: string
+  preprocessed_shape: number[]
+  preprocessing_time_ms: number
+}
+
+export async function createLayoutPreview(
+  image: File,
+  template: object,
+  config?: File,
+  assets: File[] = []
+): Promise<LayoutPreviewResult> {
+  const formData = new FormData()
+  formData.append('image', image)
+  formData.append(
+    'template',
+    new Blob([JSON.stringify(template)], { type: 'application/json' }),
+    'template.json'
+  )
+  if (config) {
+    formData.append('config', config)
+  }
+  assets.forEach((asset) => formData.append('assets', asset))
+
+  try {
+    const response = await axios.post<LayoutPreviewResult>(
+      getApiUrl('layout-preview'),
+      formData,
+      {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+        timeout: 60000,
+      }
+    )
+    return response.data
+  } catch (error: any) {
+    throw new Error(error.response?.data?.detail || 'Failed to prepare layout preview')
+  }
+}
+
+export async function renderLayoutPreview(
+  previewId: string,
+  template: object,
+  format: 'png' | 'webp' = 'webp',
+  width?: number
+): Promise<Blob> {
+  try {
+    const response = await axios.post(
+      getApiUrl(`layout-preview/${previewId}`),
+      template,
+      {
+        params: { format, width },
+        responseType: 'blob',
+      }
+    )
+    return response.data
+  } catch (error: any) {
+    throw new Error('Failed to render layout preview')
+  }
+}
@@ -0,0 +1,146 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+
+import argparse
+from pathlib import Path
+
+from src.logger import logger
+from src.utils.file import load_json
+from src.utils.synthetic import SyntheticSheetGenerator
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description="Generate filled OMR sheets with ground truth from a template.json"
+    )
+
+    argparser.add_argument(
+        "-t",
+        "--template",
+        required=True,
+        dest="template_path",
+        help="Path of the template.json to render the sheets from.",
+    )
+
+    argparser.add_argument(
+        "-o",
+        "--outputDir",
+        default="inputs/synthetic",
+        required=False,
+        dest="output_dir",
+        help="Directory to write the sheets to, along with a copy of the template.",
+    )
+
+    argparser.add_argument(
+        "-n",
+        "--count",
+        default=10,
+        type=int,
+        dest="count",
+        help="Number of sheets to generate.",
+    )
+
+    argparser.add_argument(
+        "--start",
+        default=0,
+        type=int,
+        dest="start",
+        help="Index of the first sheet, to extend an existing batch.",
+    )
+
+    argparser.add_argument(
+        "--seed", default=0, type=int, dest="seed", help="Seed of the batch."
+    )
+
+    argparser.add_argument(
+        "--responses",
+        default=None,
+        dest="responses_path",
+        help="Json file with a list of responses (field label to marked value(s)), \
+        one per sheet, instead of random ones.",
+    )
+
+    argparser.add_argument(
+        "--scale",
+        default=2,
+        type=float,
+        dest="scale",
+        help="Size of the sheets relative to the processing dimensions.",
+    )
+
+    argparser.add_argument(
+        "--fillProbability",
+        default=0.9,
+        type=float,
+        dest="fill_probability",
+        help="Probability of a field being marked.",
+    )
+
+    argparser.add_argument(
+        "--multiMarkProbability",
+        default=0.0,
+        type=float,
+        dest="multi_mark_probability",
+        help="Probability of a marked field having more than one bubble marked.",
+    )
+
+    argparser.add_argument(
+        "--warp",
+        default=0.0,
+        type=float,
+        dest="warp",
+        help="Perspective warp, as the largest shift of a corner relative to \
+        the sheet size (e.g. 0.03). Needs CropPage or CropOnMarkers in the template.",
+    )
+
+    argparser.add_argument(
+        "--noise",
+        default=0.0,
+        type=float,
+        dest="noise",
+        help="Standard deviation of the gaussian noise added to the sheets.",
+    )
+
+    argparser.add_argument(
+        "--blur",
+        default=0,
+        type=int,
+        dest="blur",
+        help="Radius of the gaussian blur applied to the sheets.",
+    )
+
+    argparser.add_argument(
+        "--ext",
+        default=".jpg",
+        choices=[".jpg", ".png"],
+        dest="ext",
+        help="Image format of the sheets.",
+    )
+
+    return vars(argparser.parse_args())
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    generator = SyntheticSheetGenerator(
+        Path(args["template_path"]),
+        seed=args["seed"],
+        scale=args["scale"],
+        fill_probability=args["fill_probability"],
+        multi_mark_probability=args["multi_mark_probability"],
+        warp=args["warp"],
+        noise=args["noise"],
+        blur=args["blur"],
+    )
+    responses = load_json(args["responses_path"]) if args["responses_path"] else None
+    count = len(responses) if responses else args["count"]
+    generator.generate(
+        args["output_dir"], count, responses, start=args["start"], ext=args["ext"]
+    )
+    logger.info(f"Generated {count} sheet(s) in '{args['output_dir']}'")
@@ -69,6 +69,86 @@ def parse_args():
         run again until the template is set.",
     )
 
+    argparser.add_argument(
+        "-t",
+        "--threads",
+        default=1,
+        required=False,
+        type=int,
+        dest="threads",
+        help="Number of threads to read the OMR sheets with. \
+        All threads share one template, so this does not multiply memory use.",
+    )
+
+    argparser.add_argument(
+        "-p",
+        "--processes",
+        default=1,
+        required=False,
+        type=int,
+        dest="processes",
+        help="Number of worker processes to read the OMR sheets with. \
+        Decoded images are passed to them through shared memory.",
+    )
+
+    argparser.add_argument(
+        "--tuneWorkers",
+        required=False,
+        dest="tuneWorkers",
+        action="store_true",
+        help="Pick the number of threads and OpenCV threads from a short \
+        benchmark on the first sheets before reading them all.",
+    )
+
+    argparser.add_argument(
+        "--memoryLimit",
+        default=None,
+        required=False,
+        type=int,
+        dest="memoryLimit",
+        help="Memory ceiling for the run in MB. New sheets are held back \
+        while the reader and its workers use more than this.",
+    )
+
+    argparser.add_argument(
+        "--trace",
+        default=None,
+        required=False,
+        type=str,
+        dest="trace",
+        help="Save the time spent in each processing stage to this file \
+        (Chrome trace format) and print a table of stage timings.",
+    )
+
+    argparser.add_argument(
+        "--metrics",
+        default=None,
+        required=False,
+        type=str,
+        dest="metrics",
+        help="Save the counters and latency histograms of the run to this \
+        file in the Prometheus text format.",
+    )
+
+    argparser.add_argument(
+        "--runId",
+        default=None,
+        required=False,
+        type=str,
+        dest="runId",
+        help="Record the sheets of this run under this id in the results database \
+        (see sqlite_results in config.json). A new id is generated by default.",
+    )
+
+    argparser.add_argument(
+        "--memoryProfile",
+        required=False,
+        dest="memoryProfile",
+        action="store_true",
+        help="Measure the memory of each processing stage and sheet, \
+        print the top allocations and warn if memory keeps growing across sheets.",
+    )
+
     (
         args,
         unknown,
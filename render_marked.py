@@ -0,0 +1,68 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+
+import argparse
+import os
+
+from src.annotations import render_deferred_outputs
+from src.logger import logger
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description="Draw the marked images of sheets read with deferred_rendering"
+    )
+
+    argparser.add_argument(
+        "-o",
+        "--outputDir",
+        default="outputs",
+        required=False,
+        dest="output_dir",
+        help="Output directory of the run, searched for CheckedOMRs annotations.",
+    )
+
+    argparser.add_argument(
+        "--files",
+        default=None,
+        nargs="+",
+        dest="file_ids",
+        help="Names of the sheets to draw (default all recorded sheets).",
+    )
+
+    argparser.add_argument(
+        "--overwrite",
+        default=False,
+        action="store_true",
+        dest="overwrite",
+        help="Draw the images that were already drawn again.",
+    )
+
+    argparser.add_argument(
+        "--lowPriority",
+        default=False,
+        action="store_true",
+        dest="low_priority",
+        help="Lower the scheduling priority of this pass, to run it alongside other work.",
+    )
+
+    return vars(argparser.parse_args())
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args["low_priority"]:
+        if hasattr(os, "nice"):
+            os.nice(10)
+        else:
+            logger.warning("Skipping --lowPriority as it is not supported here")
+    image_paths = render_deferred_outputs(
+        args["output_dir"], args["file_ids"], args["overwrite"]
+    )
+    logger.info(f"Saved {len(image_paths)} marked image(s) in total")
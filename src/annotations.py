@@ -0,0 +1,282 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import json
+from collections import OrderedDict
+from copy import deepcopy
+from pathlib import Path
+
+import cv2
+import numpy as np
+from dotmap import DotMap
+
+from src import constants
+from src.core import SheetContext
+from src.defaults import CONFIG_DEFAULTS
+from src.image_writer import IMAGE_WRITER, get_image_path
+from src.logger import logger
+from src.template import Template
+from src.utils.parsing import OVERRIDE_MERGER
+
+# Warped corners of a re-read sheet further than this (in pixels) from the recorded ones
+MAX_CORNER_DRIFT = 1.0
+
+
+def get_directory_record(template):
+    """Returns the record of what the sheets of a directory are read with, for the sheet records after it"""
+    return {
+        "kind": "directory",
+        "template_path": str(Path(template.path).resolve()),
+        "tuning_config": template.image_instance_ops.tuning_config.toDict(),
+    }
+
+
+def get_sheet_record(file_path, file_id, context):
+    """Returns the record of how to draw the marked image of a sheet, from the state of its reading"""
+    return {
+        "kind": "sheet",
+        "file_id": file_id,
+        "input_path": str(Path(file_path).resolve()),
+        "warped_corners": {
+            name: [[float(x), float(y)] for x, y in corners]
+            for name, corners in context.warped_corners.items()
+        },
+        "field_block_shifts": {
+            name: int(shift) for name, shift in context.field_block_shifts.items()
+        },
+        "global_threshold": float(context.global_threshold),
+        "global_std_threshold": float(context.global_std_threshold),
+        "field_thresholds": {
+            field_label: float(threshold)
+            for field_label, threshold in context.field_thresholds.items()
+        },
+        "marked_bubbles": context.marked_bubbles,
+    }
+
+
+def append_annotation_records(annotations_path, records):
+    with open(annotations_path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_annotation_records(annotations_path):
+    """
+    Returns the sheet records of an annotations file along with their directory records, by file id.
+    Files read again in later runs keep their latest record.
+    """
+    records, directory_record = {}, None
+    with open(annotations_path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["kind"] == "directory":
+                directory_record = record
+            else:
+                records[record["file_id"]] = (directory_record, record)
+    return records
+
+
+class AnnotationRenderer:
+    """
+    Draws the marked images of sheets read with deferred_rendering, from their annotation records.
+
+    The recorded shifts and marked bubbles are drawn on the sheet cropped again by the pre-processors,
+    so the images match the ones drawn while reading. Templates are built once per directory record,
+    and annotation files are read once (and again when they change). Both are kept for the
+    cache_size most recently used ones.
+    """
+
+    CACHE_SIZE = 16
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self.templates = OrderedDict()
+        # Sheets of each annotations file by the name of their image, with its modification time
+        self.indexes = OrderedDict()
+
+    def get_cached(self, cache, key):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    def set_cached(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def get_template(self, directory_record):
+        key = json.dumps(directory_record, sort_keys=True)
+        template = self.get_cached(self.templates, key)
+        if template is None:
+            # (with the defaults of options added since the record was written)
+            tuning_config = OVERRIDE_MERGER.merge(
+                deepcopy(CONFIG_DEFAULTS.toDict()),
+                deepcopy(directory_record["tuning_config"]),
+            )
+            # Nothing is shown or stacked while drawing
+            tuning_config["outputs"]["show_image_level"] = 0
+            tuning_config["outputs"]["save_image_level"] = 0
+            template = Template(
+                Path(directory_record["template_path"]),
+                DotMap(tuning_config, _dynamic=False),
+            )
+            self.set_cached(self.templates, key, template)
+        return template
+
+    @staticmethod
+    def get_image_options(directory_record):
+        """Returns the image_writer options of a directory record, without building its template"""
+        image_options = OVERRIDE_MERGER.merge(
+            deepcopy(CONFIG_DEFAULTS.outputs.image_writer.toDict()),
+            deepcopy(
+                directory_record["tuning_config"]
+                .get("outputs", {})
+                .get("image_writer", {})
+            ),
+        )
+        return DotMap(image_options, _dynamic=False)
+
+    def get_sheets(self, save_marked_dir):
+        """
+        Returns the sheets recorded in a CheckedOMRs directory by the name of their marked image,
+        as (file id, image path, image options, directory record, sheet record).
+        """
+        annotations_path = Path(save_marked_dir).joinpath(
+            constants.ANNOTATIONS_FILENAME
+        )
+        key = annotations_path.resolve()
+        modified_time = annotations_path.stat().st_mtime_ns
+        index = self.get_cached(self.indexes, key)
+        if index is None or index[0] != modified_time:
+            sheets, directory_image_options = {}, {}
+            for file_id, (directory_record, sheet_record) in load_annotation_records(
+                annotations_path
+            ).items():
+                # The sheets of a directory record share its object
+                image_options = directory_image_options.get(id(directory_record))
+                if image_options is None:
+                    image_options = directory_image_options[
+                        id(directory_record)
+                    ] = self.get_image_options(directory_record)
+                image_path = get_image_path(
+                    Path(save_marked_dir).joinpath(file_id), image_options
+                )
+                sheets[image_path.name] = (
+                    file_id,
+                    image_path,
+                    image_options,
+                    directory_record,
+                    sheet_record,
+                )
+            index = (modified_time, sheets)
+            self.set_cached(self.indexes, key, index)
+        return index[1]
+
+    def forget(self, directory):
+        """Drops the templates and annotation files under a directory, e.g. of a removed job"""
+        directory = Path(directory).resolve()
+        for key, template in list(self.templates.items()):
+            template_path = Path(template.path).resolve()
+            if template_path == directory or directory in template_path.parents:
+                del self.templates[key]
+        for key in list(self.indexes):
+            if key == directory or directory in key.parents:
+                del self.indexes[key]
+
+    def render(self, directory_record, sheet_record):
+        template = self.get_template(directory_record)
+        image_instance_ops = template.image_instance_ops
+        file_path = Path(sheet_record["input_path"])
+        context = SheetContext(file_path)
+        in_omr = cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE)
+        if in_omr is None:
+            raise Exception(f"Could not read the input image: '{file_path}'")
+        in_omr = image_instance_ops.apply_preprocessors(
+            file_path, in_omr, template, context
+        )
+        if in_omr is None:
+            raise Exception(f"Could not crop the input image again: '{file_path}'")
+
+        for name, corners in sheet_record["warped_corners"].items():
+            drift = np.max(
+                np.abs(np.array(context.warped_corners[name]) - np.array(corners))
+            )
+            if drift > MAX_CORNER_DRIFT:
+                logger.warning(
+                    f"{name} warped '{file_path.name}' from corners {round(drift, 1)} px away from the recorded ones, has the input image changed?"
+                )
+
+        return image_instance_ops.render_marked_image(
+            image_instance_ops.get_page_image(template, in_omr),
+            template,
+            sheet_record["field_block_shifts"],
+            sheet_record["marked_bubbles"],
+        )
+
+    def save_sheets(self, sheets, overwrite=False):
+        image_paths = []
+        for (
+            file_id,
+            image_path,
+            image_options,
+            directory_record,
+            sheet_record,
+        ) in sheets:
+            if image_path.exists() and not overwrite:
+                continue
+            final_marked = self.render(directory_record, sheet_record)
+            IMAGE_WRITER.write(
+                str(image_path), final_marked, image_options, sheet=file_id
+            )
+            image_paths.append(image_path)
+        IMAGE_WRITER.flush()
+        return image_paths
+
+    def render_directory(self, save_marked_dir, file_ids=None, overwrite=False):
+        """
+        Saves the marked images recorded in a CheckedOMRs directory, returns their paths.
+        file_ids selects sheets by their input file name or by the name of their image.
+        """
+        sheets = self.get_sheets(save_marked_dir)
+        return self.save_sheets(
+            [
+                sheet
+                for image_name, sheet in sheets.items()
+                if file_ids is None or {sheet[0], image_name} & set(file_ids)
+            ],
+            overwrite,
+        )
+
+    def render_image(self, image_path):
+        """
+        Saves a marked image from the annotations file next to it, if it was recorded there.
+        Returns whether the image was saved.
+        """
+        image_path = Path(image_path)
+        if not image_path.parent.joinpath(constants.ANNOTATIONS_FILENAME).exists():
+            return False
+        sheet = self.get_sheets(image_path.parent).get(image_path.name)
+        return sheet is not None and bool(self.save_sheets([sheet]))
+
+
+def render_deferred_outputs(output_dir, file_ids=None, overwrite=False):
+    """Saves the marked images recorded in all the CheckedOMRs directories under output_dir"""
+    renderer = AnnotationRenderer()
+    image_paths = []
+    for annotations_path in sorted(
+        Path(output_dir).rglob(constants.ANNOTATIONS_FILENAME)
+    ):
+        directory_image_paths = renderer.render_directory(
+            annotations_path.parent, file_ids, overwrite
+        )
+        logger.info(
+            f"Saved {len(directory_image_paths)} marked image(s) to '{annotations_path.parent}'"
+        )
+        image_paths.extend(directory_image_paths)
+    return image_paths
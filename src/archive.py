@@ -0,0 +1,210 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import io
+import json
+import os
+import tarfile
+import zipfile
+from pathlib import Path
+from threading import Lock
+from time import localtime, time
+
+from src import constants
+from src.logger import logger
+
+MB = 1024 * 1024
+TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+ZIP_MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class ArchiveWriter:
+    """
+    Appends the output files of a directory to a few large archive shards (zip or tar),
+    instead of writing one file each.
+
+    Files are stored uncompressed one after the other, and a new shard is started once a shard
+    holds shard_size_mb of files. Each file is listed in an index with its shard and the position
+    of its data, so it can be read back without scanning the shards. Earlier shards are kept.
+    """
+
+    def __init__(self, output_dir, archive_options):
+        self.output_dir = Path(output_dir)
+        self.archive_dir = self.output_dir.joinpath(constants.ARCHIVE_DIRNAME)
+        self.format = archive_options.format
+        self.shard_size = archive_options.shard_size_mb * MB
+        # The process the shards are written from, forked workers hand their files over to it
+        self.pid = os.getpid()
+        self.lock = Lock()
+        self.shard, self.shard_path, self.shard_bytes = None, None, 0
+        self.index_file = None
+
+    def get_next_shard_path(self):
+        shard_count = len(list(self.archive_dir.glob(f"outputs-*.{self.format}")))
+        return self.archive_dir.joinpath(f"outputs-{shard_count:05d}.{self.format}")
+
+    def open_shard(self):
+        self.close_shard()
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_path = self.get_next_shard_path()
+        logger.info(f"Appending outputs to '{self.shard_path}'")
+        if self.format == "tar":
+            self.shard = tarfile.open(self.shard_path, "w")
+        else:
+            self.shard = zipfile.ZipFile(
+                self.shard_path, "w", compression=zipfile.ZIP_STORED
+            )
+        self.shard_bytes = 0
+        if self.index_file is None:
+            self.index_file = open(
+                self.archive_dir.joinpath(constants.ARCHIVE_INDEX_FILENAME), "a"
+            )
+
+    def add(self, name, data):
+        """Appends the bytes of a file, named by its path relative to the output directory"""
+        with self.lock:
+            if self.shard is None or self.shard_bytes >= self.shard_size:
+                self.open_shard()
+            if self.format == "tar":
+                info = tarfile.TarInfo(name)
+                info.size, info.mtime = len(data), int(time())
+                self.shard.addfile(info, io.BytesIO(data))
+                padded_size = -(-len(data) // TAR_BLOCK_SIZE) * TAR_BLOCK_SIZE
+                offset = self.shard.offset - padded_size
+            else:
+                # Zip files cannot hold times before 1980
+                date_time = max(localtime()[:6], ZIP_MIN_DATE_TIME)
+                self.shard.writestr(zipfile.ZipInfo(name, date_time), data)
+                offset = self.shard.fp.tell() - len(data)
+            self.shard_bytes += len(data)
+            self.index_file.write(
+                json.dumps(
+                    {
+                        "name": name,
+                        "shard": self.shard_path.name,
+                        "offset": offset,
+                        "size": len(data),
+                    }
+                )
+                + "\n"
+            )
+
+    def close_shard(self):
+        if self.shard is not None:
+            self.shard.close()
+            self.shard = None
+
+    def close(self):
+        with self.lock:
+            self.close_shard()
+            if self.index_file is not None:
+                self.index_file.close()
+                self.index_file = None
+
+
+class ArchiveRegistry:
+    """The archives of the output directories of a run, which output files are written to by path"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.archives = {}
+        # (path, bytes) of the files written in a forked worker, for the main process to append
+        self.forked_files = []
+
+    def open(self, output_dir, archive_options):
+        archive = ArchiveWriter(output_dir, archive_options)
+        with self.lock:
+            self.archives[Path(output_dir).resolve()] = archive
+        return archive
+
+    def find(self, path):
+        """Returns the archive a path is written to along with its name in there, or None"""
+        if not self.archives:
+            return None
+        path = Path(path).resolve()
+        for output_dir, archive in self.archives.items():
+            if output_dir in path.parents:
+                return archive, path.relative_to(output_dir).as_posix()
+        return None
+
+    def write_file(self, path, data):
+        """Appends a file to the archive of its output directory, returns False if it has none"""
+        found = self.find(path)
+        if found is None:
+            return False
+        archive, name = found
+        if os.getpid() != archive.pid:
+            with self.lock:
+                self.forked_files.append((str(path), data))
+            return True
+        archive.add(name, data)
+        return True
+
+    def drain(self):
+        """Returns the files written in this worker so far and forgets them (used to send them from worker processes)"""
+        with self.lock:
+            files, self.forked_files = self.forked_files, []
+        return files
+
+    def extend(self, files):
+        for path, data in files:
+            self.write_file(path, data)
+
+    def close(self):
+        with self.lock:
+            archives, self.archives = self.archives, {}
+        for archive in archives.values():
+            archive.close()
+
+
+ARCHIVES = ArchiveRegistry()
+
+
+def write_output_file(path, data):
+    """Writes the bytes of an output file, into the archive of its output directory if it has one"""
+    if not ARCHIVES.write_file(path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def load_archive_index(archive_dir):
+    """Returns the index entries of an archive directory by name, files written again keep their latest entry"""
+    entries = {}
+    with open(Path(archive_dir, constants.ARCHIVE_INDEX_FILENAME), "r") as f:
+        for line in f:
+            entry = json.loads(line)
+            entries[entry["name"]] = entry
+    return entries
+
+
+def read_archived_file(archive_dir, entry):
+    with open(Path(archive_dir, entry["shard"]), "rb") as f:
+        f.seek(entry["offset"])
+        return f.read(entry["size"])
+
+
+def find_archived_entry(path):
+    """Returns the archive directory and the index entry of an output file, or None if not archived"""
+    path = Path(path)
+    for output_dir in path.parents:
+        archive_dir = output_dir.joinpath(constants.ARCHIVE_DIRNAME)
+        if archive_dir.joinpath(constants.ARCHIVE_INDEX_FILENAME).exists():
+            entry = load_archive_index(archive_dir).get(
+                path.relative_to(output_dir).as_posix()
+            )
+            if entry is not None:
+                return archive_dir, entry
+    return None
+
+
+def find_archived_file(path):
+    """Returns the bytes of an output file from the archive of its output directory, or None if not archived"""
+    found = find_archived_entry(path)
+    if found is None:
+        return None
+    return read_archived_file(*found)
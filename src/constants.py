@@ -12,6 +12,11 @@ from dotmap import DotMap
 TEMPLATE_FILENAME = "template.json"
 EVALUATION_FILENAME = "evaluation.json"
 CONFIG_FILENAME = "config.json"
+ANNOTATIONS_FILENAME = "annotations.jsonl"
+ARCHIVE_DIRNAME = "Archive"
+ARCHIVE_INDEX_FILENAME = "index.jsonl"
+EXPLANATION_LOG_FILENAME = "Explanations"
+SHEET_STATUSES_FILENAME = "sheet_statuses.jsonl"
 
 FIELD_LABEL_NUMBER_REGEX = r"([^\d]+)(\d*)"
 #
@@ -48,6 +53,8 @@ CLR_BLACK = (50, 150, 150)
 CLR_WHITE = (250, 250, 250)
 CLR_GRAY = (130, 130, 130)
 CLR_DARK_GRAY = (100, 100, 100)
+# Templates with as many bubbles get their layout pasted from layers drawn once
+LAYOUT_LAYER_MIN_BUBBLES = 1000
 
 # TODO: move to config.json
 GLOBAL_PAGE_THRESHOLD_WHITE = 200
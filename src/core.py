@@ -1,28 +1,159 @@
 import os
+import threading
 from collections import defaultdict
-from typing import Any
 
 import cv2
 import matplotlib.pyplot as plt
 import numpy as np
 
 import src.constants as constants
+from src.image_writer import IMAGE_WRITER
 from src.logger import logger
-from src.utils.image import CLAHE_HELPER, ImageUtils
+from src.tracing import TRACER
+from src.utils.image import ImageUtils
 from src.utils.interaction import InteractionUtils
+from src.utils.parallel import parallel_map
+
+# Page-sized images reused by the sheets read on the same thread
+READ_BUFFERS = threading.local()
+
+
+def get_read_buffer(name, shape, dtype=np.uint8):
+    """Returns the buffer of this thread for the given step, (re)allocated when the page size changes.
+    Its content is only valid until the next sheet read on the same thread."""
+    buffers = getattr(READ_BUFFERS, "buffers", None)
+    if buffers is None:
+        buffers = READ_BUFFERS.buffers = {}
+    buffer = buffers.get(name)
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        buffer = buffers[name] = np.empty(shape, dtype)
+    return buffer
+
+
+class SheetContext:
+    """Class to hold the state of a single image while it is being processed. One instance for each OMR sheet.
+    Keeping this state off the Template lets one Template serve concurrent sheets."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        # debug images to stack, grouped by save_image_level
+        self.save_img_list = defaultdict(list)
+        # alignment shifts found by auto_align, by field block name
+        self.field_block_shifts = defaultdict(int)
+        # average marker matching score from CropOnMarkers (analysis data)
+        self.marker_match_score = None
+        # corners each cropping pre-processor warped from, by pre-processor name (analysis data)
+        self.warped_corners = {}
+        # thresholds found while reading the bubbles (analysis data)
+        self.global_threshold = None
+        self.global_std_threshold = None
+        self.field_thresholds = {}
+        # indexes of the marked bubbles within each field, by field label
+        self.marked_bubbles = {}
+
+
+class LayoutLayer:
+    """
+    The outlines of a field block and its bubbles, drawn once with the same calls as
+    draw_field_block_layout, to be pasted on each image at the shift of the block.
+    The outlines are solid, so pasting the drawn pixels gives the same image as drawing them.
+    """
+
+    # Room for the thickness of the outlines around the block
+    MARGIN = 4
+
+    def __init__(self, field_block, border):
+        points = [field_block.origin] + [
+            [pt.x, pt.y]
+            for field_block_bubbles in field_block.traverse_bubbles
+            for pt in field_block_bubbles
+        ]
+        box_w, box_h = field_block.bubble_dimensions
+        d = field_block.dimensions
+        self.x, self.y = np.min(points, axis=0) - self.MARGIN
+        right, bottom = np.max(points, axis=0) + [
+            max(d[0], box_w) + self.MARGIN,
+            max(d[1], box_h) + self.MARGIN,
+        ]
+        shape = (bottom - self.y + 1, right - self.x + 1)
+        self.layer = np.zeros(shape, np.uint8)
+        self.draw(field_block, border, -self.x, -self.y)
+        # The drawing colors are non-zero on a gray image, which marks the pixels drawn
+        self.mask = (self.layer > 0).astype(np.uint8)
+
+    def draw(self, field_block, border, dx, dy):
+        ImageInstanceOps.draw_field_block_layout(
+            self.layer, field_block, border, dx, dy
+        )
+
+    def paste(self, img, shift):
+        x, y = self.x + shift, self.y
+        height, width = self.layer.shape
+        # Clip to the image as the drawing would
+        left, top = max(0, -x), max(0, -y)
+        right = min(width, img.shape[1] - x)
+        bottom = min(height, img.shape[0] - y)
+        if right <= left or bottom <= top:
+            return
+        # A masked copy into the view of the image, many times faster than np.copyto with where
+        cv2.copyTo(
+            self.layer[top:bottom, left:right],
+            self.mask[top:bottom, left:right],
+            img[y + top : y + bottom, x + left : x + right],
+        )
+
+
+class UnmarkedBubblesLayer(LayoutLayer):
+    """
+    Every bubble of a field block filled in as unmarked, drawn once with the same calls as
+    draw_marked_bubbles. The marked bubbles of a sheet are left out when pasting.
+    """
+
+    def draw(self, field_block, border, dx, dy):
+        box_w, box_h = field_block.bubble_dimensions
+        # The filled boxes of the bubbles of each field on the page, as slice bounds
+        self.bubble_boxes = {}
+        for field_block_bubbles in field_block.traverse_bubbles:
+            boxes = self.bubble_boxes[field_block_bubbles[0].field_label] = []
+            for bubble in field_block_bubbles:
+                x, y = bubble.x + dx, bubble.y + dy
+                left, top = int(x + box_w / 10), int(y + box_h / 10)
+                right, bottom = int(x + box_w - box_w / 10), int(y + box_h - box_h / 10)
+                cv2.rectangle(
+                    self.layer,
+                    (left, top),
+                    (right, bottom),
+                    constants.CLR_GRAY,
+                    border,
+                )
+                boxes.append((top - dy, bottom + 1 - dy, left - dx, right + 1 - dx))
+
+    def paste_unmarked(self, img, shift, marked_bubbles):
+        """Pastes the layer, keeping the pixels under the marked bubbles as they were"""
+        marked_boxes = [
+            (top, bottom, max(0, left + shift), max(0, right + shift))
+            for field_label, boxes in self.bubble_boxes.items()
+            for bubble_index in marked_bubbles.get(field_label, [])
+            for top, bottom, left, right in [boxes[bubble_index]]
+        ]
+        under_marked = [
+            img[top:bottom, left:right].copy()
+            for top, bottom, left, right in marked_boxes
+        ]
+        self.paste(img, shift)
+        for (top, bottom, left, right), pixels in zip(marked_boxes, under_marked):
+            img[top:bottom, left:right] = pixels
 
 
 class ImageInstanceOps:
     """Class to hold fine-tuned utilities for a group of images. One instance for each processing directory."""
 
-    save_img_list: Any = defaultdict(list)
-
     def __init__(self, tuning_config):
         super().__init__()
         self.tuning_config = tuning_config
         self.save_image_level = tuning_config.outputs.save_image_level
 
-    def apply_preprocessors(self, file_path, in_omr, template):
+    def apply_preprocessors(self, file_path, in_omr, template, context):
         tuning_config = self.tuning_config
         # resize to conform to template
         in_omr = ImageUtils.resize_util(
@@ -33,45 +164,78 @@ class ImageInstanceOps:
 
         # run pre_processors in sequence
         for pre_processor in template.pre_processors:
-            in_omr = pre_processor.apply_filter(in_omr, file_path)
+            with TRACER.span(f"preprocess.{pre_processor.__class__.__name__}"):
+                in_omr = pre_processor.apply_filter(in_omr, file_path, context)
         return in_omr
 
-    def read_omr_response(self, template, image, name, save_dir=None):
+    def should_render_marked(self, save_dir):
+        """Whether any requested output shows or saves the marked image of a sheet"""
+        outputs = self.tuning_config.outputs
+        return (
+            (
+                outputs.save_detections
+                and not outputs.deferred_rendering
+                and save_dir is not None
+            )
+            or outputs.show_image_level >= 2
+            or self.save_image_level >= 2
+        )
+
+    @staticmethod
+    def get_page_image(template, image):
+        """Resizes a cropped sheet to the page of the template and normalizes it, in this thread's page buffer"""
+        page_width, page_height = template.page_dimensions
+        img = ImageUtils.resize_util(
+            image,
+            page_width,
+            page_height,
+            dst=get_read_buffer("page", (page_height, page_width), image.dtype),
+        )
+        if img.max() > img.min():
+            img = ImageUtils.normalize_util(img, dst=img)
+        return img
+
+    def read_omr_response(
+        self, template, image, name, context, save_dir=None, render_marked=None
+    ):
+        """
+        Reads the marked bubbles of a cropped sheet. The marked image is only drawn when an
+        output needs it (or render_marked is True), otherwise None is returned in its place.
+        """
         config = self.tuning_config
         auto_align = config.alignment_params.auto_align
+        shifts = context.field_block_shifts
+        if render_marked is None:
+            render_marked = self.should_render_marked(save_dir)
         try:
-            img = image.copy()
-            # origDim = img.shape[:2]
-            img = ImageUtils.resize_util(
-                img, template.page_dimensions[0], template.page_dimensions[1]
-            )
-            if img.max() > img.min():
-                img = ImageUtils.normalize_util(img)
-            # Processing copies
-            transp_layer = img.copy()
-            final_marked = img.copy()
+            # Working images go to this thread's buffers, only the outputs are allocated per sheet
+            page_width, page_height = template.page_dimensions
+            page_shape = (page_height, page_width)
+            img = self.get_page_image(template, image)
 
-            morph = img.copy()
-            self.append_save_img(3, morph)
+            morph = img
+            self.append_save_img(3, morph, context)
 
             if auto_align:
                 # Note: clahe is good for morphology, bad for thresholding
-                morph = CLAHE_HELPER.apply(morph)
-                self.append_save_img(3, morph)
+                # Note: CLAHE objects keep internal buffers, so one is created per sheet
+                clahe = cv2.createCLAHE(clipLimit=5.0, tileGridSize=(8, 8))
+                morph = clahe.apply(
+                    img, dst=get_read_buffer("morph", page_shape, img.dtype)
+                )
+                self.append_save_img(3, morph, context)
                 # Remove shadows further, make columns/boxes darker (less gamma)
                 morph = ImageUtils.adjust_gamma(
-                    morph, config.threshold_params.GAMMA_LOW
+                    morph, config.threshold_params.GAMMA_LOW, dst=morph
                 )
                 # TODO: all numbers should come from either constants or config
-                _, morph = cv2.threshold(morph, 220, 220, cv2.THRESH_TRUNC)
-                morph = ImageUtils.normalize_util(morph)
-                self.append_save_img(3, morph)
+                _, morph = cv2.threshold(morph, 220, 220, cv2.THRESH_TRUNC, dst=morph)
+                morph = ImageUtils.normalize_util(morph, dst=morph)
+                self.append_save_img(3, morph, context)
                 if config.outputs.show_image_level >= 4:
                     InteractionUtils.show("morph1", morph, 0, 1, config)
 
             # Move them to data class if needed
-            # Overlay Transparencies
-            alpha = 0.65
             omr_response = {}
             multi_marked, multi_roll = 0, 0
 
@@ -86,14 +250,23 @@ class ImageInstanceOps:
 
             # Find Shifts for the field_blocks --> Before calculating threshold!
             if auto_align:
+                align_start = TRACER.now()
                 # print("Begin Alignment")
                 # Open : erode then dilate
                 v_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 10))
                 morph_v = cv2.morphologyEx(
-                    morph, cv2.MORPH_OPEN, v_kernel, iterations=3
+                    morph,
+                    cv2.MORPH_OPEN,
+                    v_kernel,
+                    dst=get_read_buffer("morph_v", page_shape, morph.dtype),
+                    iterations=3,
+                )
+                _, morph_v = cv2.threshold(
+                    morph_v, 200, 200, cv2.THRESH_TRUNC, dst=morph_v
+                )
+                morph_v = cv2.bitwise_not(
+                    ImageUtils.normalize_util(morph_v, dst=morph_v), dst=morph_v
                 )
-                _, morph_v = cv2.threshold(morph_v, 200, 200, cv2.THRESH_TRUNC)
-                morph_v = 255 - ImageUtils.normalize_util(morph_v)
 
                 if config.outputs.show_image_level >= 3:
                     InteractionUtils.show(
@@ -103,14 +276,18 @@ class ImageInstanceOps:
                 # InteractionUtils.show("morph1",morph,0,1,config=config)
                 # InteractionUtils.show("morphed_vertical",morph_v,0,1,config=config)
 
-                self.append_save_img(3, morph_v)
+                self.append_save_img(3, morph_v, context)
 
                 morph_thr = 60  # for Mobile images, 40 for scanned Images
-                _, morph_v = cv2.threshold(morph_v, morph_thr, 255, cv2.THRESH_BINARY)
+                _, morph_v = cv2.threshold(
+                    morph_v, morph_thr, 255, cv2.THRESH_BINARY, dst=morph_v
+                )
                 # kernel best tuned to 5x5 now
-                morph_v = cv2.erode(morph_v, np.ones((5, 5), np.uint8), iterations=2)
+                morph_v = cv2.erode(
+                    morph_v, np.ones((5, 5), np.uint8), dst=morph_v, iterations=2
+                )
 
-                self.append_save_img(3, morph_v)
+                self.append_save_img(3, morph_v, context)
                 # h_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (10, 2))
                 # morph_h = cv2.morphologyEx(morph, cv2.MORPH_OPEN, h_kernel, iterations=3)
                 # ret, morph_h = cv2.threshold(morph_h,200,200,cv2.THRESH_TRUNC)
@@ -123,7 +300,7 @@ class ImageInstanceOps:
                         "morph_thr_eroded", morph_v, 0, 1, config=config
                     )
 
-                self.append_save_img(6, morph_v)
+                self.append_save_img(6, morph_v, context)
 
                 # template relative alignment code
                 for field_block in template.field_blocks:
@@ -183,9 +360,9 @@ class ImageInstanceOps:
                                 break
                         steps += 1
 
-                    field_block.shift = shift
+                    shifts[field_block.name] = shift
                     # print("Aligned field_block: ",field_block.name,"Corrected Shift:",
-                    #   field_block.shift,", dimensions:", field_block.dimensions,
+                    #   shifts[field_block.name],", dimensions:", field_block.dimensions,
                     #   "origin:", field_block.origin,'\n')
                 # print("End Alignment")
 
@@ -193,32 +370,34 @@ class ImageInstanceOps:
             if config.outputs.show_image_level >= 2:
                 initial_align = self.draw_template_layout(img, template, shifted=False)
                 final_align = self.draw_template_layout(
-                    img, template, shifted=True, draw_qvals=True
+                    img, template, shifted=True, draw_qvals=True, shifts=shifts
                 )
                 # appendSaveImg(4,mean_vals)
-                self.append_save_img(2, initial_align)
-                self.append_save_img(2, final_align)
+                self.append_save_img(2, initial_align, context)
+                self.append_save_img(2, final_align, context)
 
                 if auto_align:
                     final_align = np.hstack((initial_align, final_align))
-            self.append_save_img(5, img)
+            if auto_align:
+                TRACER.record("align", align_start)
+            self.append_save_img(5, img, context)
 
             # Get mean bubbleValues n other stats
             all_q_vals, all_q_strip_arrs, all_q_std_vals = [], [], []
             total_q_strip_no = 0
-            for field_block in template.field_blocks:
-                box_w, box_h = field_block.bubble_dimensions
+
+            # Field blocks are read independently, then gathered in template order
+            with TRACER.span("read_bubbles"):
+                field_block_strips = parallel_map(
+                    lambda field_block: self.get_field_block_strip_means(
+                        img, field_block, shifts[field_block.name]
+                    ),
+                    template.field_blocks,
+                    config.processing_params.intra_sheet_threads,
+                )
+            for q_strip_arrs in field_block_strips:
                 q_std_vals = []
-                for field_block_bubbles in field_block.traverse_bubbles:
-                    q_strip_vals = []
-                    for pt in field_block_bubbles:
-                        # shifted
-                        x, y = (pt.x + field_block.shift, pt.y)
-                        rect = [y, y + box_h, x, x + box_w]
-                        q_strip_vals.append(
-                            cv2.mean(img[rect[0] : rect[1], rect[2] : rect[3]])[0]
-                            # detectCross(img, rect) ? 100 : 0
-                        )
+                for q_strip_vals in q_strip_arrs:
                     q_std_vals.append(round(np.std(q_strip_vals), 2))
                     all_q_strip_arrs.append(q_strip_vals)
                     # _, _, _ = get_global_threshold(q_strip_vals, "QStrip Plot",
@@ -230,6 +409,7 @@ class ImageInstanceOps:
                     total_q_strip_no += 1
                 all_q_std_vals.extend(q_std_vals)
 
+            threshold_start = TRACER.now()
             global_std_thresh, _, _ = self.get_global_threshold(
                 all_q_std_vals
             )  # , "Q-wise Std-dev Plot", plot_show=True, sort_in_plot=True)
@@ -241,6 +421,8 @@ class ImageInstanceOps:
             # to support show_image_level
             # , "Mean Intensity Histogram",plot_show=True, sort_in_plot=True)
             global_thr, _, _ = self.get_global_threshold(all_q_vals, looseness=4)
+            context.global_threshold = global_thr
+            context.global_std_threshold = global_std_thresh
 
             logger.info(
                 f"Thresholding: \tglobal_thr: {round(global_thr, 2)} \tglobal_std_THR: {round(global_std_thresh, 2)}\t{'(Looks like a Xeroxed OMR)' if (global_thr == 255) else ''}"
@@ -259,8 +441,7 @@ class ImageInstanceOps:
             per_omr_threshold_avg, total_q_strip_no, total_q_box_no = 0, 0, 0
             for field_block in template.field_blocks:
                 block_q_strip_no = 1
-                box_w, box_h = field_block.bubble_dimensions
-                shift = field_block.shift
+                shift = shifts[field_block.name]
                 s, d = field_block.origin, field_block.dimensions
                 key = field_block.name[:3]
                 # cv2.rectangle(final_marked,(s[0]+shift,s[1]),(s[0]+shift+d[0],
@@ -280,6 +461,9 @@ class ImageInstanceOps:
                     # print(field_block_bubbles[0].field_label,key,block_q_strip_no, "THR: ",
                     #   round(per_q_strip_threshold,2))
                     per_omr_threshold_avg += per_q_strip_threshold
+                    context.field_thresholds[
+                        field_block_bubbles[0].field_label
+                    ] = per_q_strip_threshold
 
                     # Note: Little debugging visualization - view the particular Qstrip
                     # if(
@@ -292,50 +476,18 @@ class ImageInstanceOps:
                     #     img[st[1] : end[1], st[0]+shift : end[0]+shift],0,config=config)
 
                     # TODO: get rid of total_q_box_no
-                    detected_bubbles = []
-                    for bubble in field_block_bubbles:
+                    detected_bubbles, marked_indexes = [], []
+                    for bubble_index, bubble in enumerate(field_block_bubbles):
                         bubble_is_marked = (
                             per_q_strip_threshold > all_q_vals[total_q_box_no]
                         )
                         total_q_box_no += 1
                         if bubble_is_marked:
                             detected_bubbles.append(bubble)
-                            x, y, field_value = (
-                                bubble.x + field_block.shift,
-                                bubble.y,
-                                bubble.field_value,
-                            )
-                            cv2.rectangle(
-                                final_marked,
-                                (int(x + box_w / 12), int(y + box_h / 12)),
-                                (
-                                    int(x + box_w - box_w / 12),
-                                    int(y + box_h - box_h / 12),
-                                ),
-                                constants.CLR_DARK_GRAY,
-                                3,
-                            )
-
-                            cv2.putText(
-                                final_marked,
-                                str(field_value),
-                                (x, y),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                constants.TEXT_SIZE,
-                                (20, 20, 10),
-                                int(1 + 3.5 * constants.TEXT_SIZE),
-                            )
-                        else:
-                            cv2.rectangle(
-                                final_marked,
-                                (int(x + box_w / 10), int(y + box_h / 10)),
-                                (
-                                    int(x + box_w - box_w / 10),
-                                    int(y + box_h - box_h / 10),
-                                ),
-                                constants.CLR_GRAY,
-                                -1,
-                            )
+                            marked_indexes.append(bubble_index)
+                    context.marked_bubbles[
+                        field_block_bubbles[0].field_label
+                    ] = marked_indexes
 
                     for bubble in detected_bubbles:
                         field_label, field_value = (
@@ -370,9 +522,11 @@ class ImageInstanceOps:
 
             per_omr_threshold_avg /= total_q_strip_no
             per_omr_threshold_avg = round(per_omr_threshold_avg, 2)
-            # Translucent
-            cv2.addWeighted(
-                final_marked, alpha, transp_layer, 1 - alpha, 0, final_marked
+            TRACER.record("threshold", threshold_start)
+            final_marked = (
+                self.render_marked_image(img, template, shifts, context.marked_bubbles)
+                if render_marked
+                else None
             )
             # Box types
             if config.outputs.show_image_level >= 6:
@@ -408,17 +562,29 @@ class ImageInstanceOps:
                     "Template Alignment Adjustment", final_align, 0, 0, config=config
                 )
 
-            if config.outputs.save_detections and save_dir is not None:
+            # Only timed when outputs are written
+            save_start = TRACER.now() if save_dir is not None else None
+            if (
+                config.outputs.save_detections
+                and not config.outputs.deferred_rendering
+                and save_dir is not None
+            ):
                 if multi_roll:
                     save_dir = save_dir.joinpath("_MULTI_")
-                image_path = str(save_dir.joinpath(name))
-                ImageUtils.save_img(image_path, final_marked)
+                IMAGE_WRITER.write(
+                    str(save_dir.joinpath(name)),
+                    final_marked,
+                    config.outputs.image_writer,
+                    sheet=name,
+                )
 
-            self.append_save_img(2, final_marked)
+            self.append_save_img(2, final_marked, context)
 
             if save_dir is not None:
                 for i in range(config.outputs.save_image_level):
-                    self.save_image_stacks(i + 1, name, save_dir)
+                    self.save_image_stacks(i + 1, name, save_dir, context)
+            if save_dir is not None:
+                TRACER.record("save_images", save_start)
 
             return omr_response, final_marked, multi_marked, multi_roll
 
@@ -426,52 +592,130 @@ class ImageInstanceOps:
             raise e
 
     @staticmethod
-    def draw_template_layout(img, template, shifted=True, draw_qvals=False, border=-1):
+    def draw_marked_bubbles(final_marked, template, shifts, marked_bubbles):
+        """
+        Outlines the marked bubbles with their values and fills in the other bubbles.
+        On a gray image of a large template, the filled bubbles are pasted from layers
+        drawn once per template, and only the marked ones are drawn here.
+        """
+        use_layers = (
+            final_marked.ndim == 2
+            and template.bubble_count >= constants.LAYOUT_LAYER_MIN_BUBBLES
+        )
+        for field_block in template.field_blocks:
+            box_w, box_h = field_block.bubble_dimensions
+            shift = shifts.get(field_block.name, 0)
+            if use_layers:
+                ImageInstanceOps.get_layout_layer(
+                    template, field_block, -1, UnmarkedBubblesLayer
+                ).paste_unmarked(final_marked, shift, marked_bubbles)
+            for field_block_bubbles in field_block.traverse_bubbles:
+                marked_indexes = marked_bubbles.get(
+                    field_block_bubbles[0].field_label, []
+                )
+                # Only the marked bubbles are left to draw over the layer
+                bubble_indexes = (
+                    marked_indexes if use_layers else range(len(field_block_bubbles))
+                )
+                for bubble_index in bubble_indexes:
+                    bubble = field_block_bubbles[bubble_index]
+                    x, y, field_value = (
+                        bubble.x + shift,
+                        bubble.y,
+                        bubble.field_value,
+                    )
+                    if bubble_index in marked_indexes:
+                        cv2.rectangle(
+                            final_marked,
+                            (int(x + box_w / 12), int(y + box_h / 12)),
+                            (
+                                int(x + box_w - box_w / 12),
+                                int(y + box_h - box_h / 12),
+                            ),
+                            constants.CLR_DARK_GRAY,
+                            3,
+                        )
+
+                        cv2.putText(
+                            final_marked,
+                            str(field_value),
+                            (x, y),
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            constants.TEXT_SIZE,
+                            (20, 20, 10),
+                            int(1 + 3.5 * constants.TEXT_SIZE),
+                        )
+                    else:
+                        cv2.rectangle(
+                            final_marked,
+                            (int(x + box_w / 10), int(y + box_h / 10)),
+                            (
+                                int(x + box_w - box_w / 10),
+                                int(y + box_h - box_h / 10),
+                            ),
+                            constants.CLR_GRAY,
+                            -1,
+                        )
+
+    def render_marked_image(self, img, template, shifts, marked_bubbles):
+        """
+        Draws the marked image of a sheet from its page image (resized and normalized),
+        the shifts of its field blocks and the indexes of its marked bubbles.
+        """
+        final_marked = img.copy()
+        self.draw_marked_bubbles(final_marked, template, shifts, marked_bubbles)
+        # Translucent
+        alpha = 0.65
+        cv2.addWeighted(final_marked, alpha, img, 1 - alpha, 0, final_marked)
+        return final_marked
+
+    @staticmethod
+    def get_field_block_strip_means(img, field_block, shift=0):
+        """Returns the mean intensities of the bubbles of a field block, one list per field"""
+        box_w, box_h = field_block.bubble_dimensions
+        q_strip_arrs = []
+        for field_block_bubbles in field_block.traverse_bubbles:
+            q_strip_vals = []
+            for pt in field_block_bubbles:
+                # shifted
+                x, y = (pt.x + shift, pt.y)
+                rect = [y, y + box_h, x, x + box_w]
+                q_strip_vals.append(
+                    cv2.mean(img[rect[0] : rect[1], rect[2] : rect[3]])[0]
+                    # detectCross(img, rect) ? 100 : 0
+                )
+            q_strip_arrs.append(q_strip_vals)
+        return q_strip_arrs
+
+    @staticmethod
+    def draw_template_layout(
+        img, template, shifted=True, draw_qvals=False, border=-1, shifts=None
+    ):
         img = ImageUtils.resize_util(
             img, template.page_dimensions[0], template.page_dimensions[1]
         )
         final_align = img.copy()
+        # The outlines of large templates are pasted from layers drawn once per template
+        use_layers = (
+            not draw_qvals
+            and final_align.ndim == 2
+            and template.bubble_count >= constants.LAYOUT_LAYER_MIN_BUBBLES
+        )
         for field_block in template.field_blocks:
             s, d = field_block.origin, field_block.dimensions
-            box_w, box_h = field_block.bubble_dimensions
-            shift = field_block.shift
-            if shifted:
-                cv2.rectangle(
-                    final_align,
-                    (s[0] + shift, s[1]),
-                    (s[0] + shift + d[0], s[1] + d[1]),
-                    constants.CLR_BLACK,
-                    3,
+            shift = shifts[field_block.name] if shifts and shifted else 0
+            if use_layers:
+                ImageInstanceOps.get_layout_layer(template, field_block, border).paste(
+                    final_align, shift
                 )
             else:
-                cv2.rectangle(
+                ImageInstanceOps.draw_field_block_layout(
                     final_align,
-                    (s[0], s[1]),
-                    (s[0] + d[0], s[1] + d[1]),
-                    constants.CLR_BLACK,
-                    3,
+                    field_block,
+                    border,
+                    shift,
+                    qvals_img=img if draw_qvals else None,
                 )
-            for field_block_bubbles in field_block.traverse_bubbles:
-                for pt in field_block_bubbles:
-                    x, y = (pt.x + field_block.shift, pt.y) if shifted else (pt.x, pt.y)
-                    cv2.rectangle(
-                        final_align,
-                        (int(x + box_w / 10), int(y + box_h / 10)),
-                        (int(x + box_w - box_w / 10), int(y + box_h - box_h / 10)),
-                        constants.CLR_GRAY,
-                        border,
-                    )
-                    if draw_qvals:
-                        rect = [y, y + box_h, x, x + box_w]
-                        cv2.putText(
-                            final_align,
-                            f"{int(cv2.mean(img[rect[0] : rect[1], rect[2] : rect[3]])[0])}",
-                            (rect[2] + 2, rect[0] + (box_h * 2) // 3),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.6,
-                            constants.CLR_BLACK,
-                            2,
-                        )
             if shifted:
                 text_in_px = cv2.getTextSize(
                     field_block.name, cv2.FONT_HERSHEY_SIMPLEX, constants.TEXT_SIZE, 4
@@ -487,6 +731,50 @@ class ImageInstanceOps:
                 )
         return final_align
 
+    @staticmethod
+    def draw_field_block_layout(
+        final_align, field_block, border, dx=0, dy=0, qvals_img=None
+    ):
+        """Outlines a field block and its bubbles moved by (dx, dy), with the mean value of each bubble in qvals_img if given"""
+        s, d = field_block.origin, field_block.dimensions
+        box_w, box_h = field_block.bubble_dimensions
+        cv2.rectangle(
+            final_align,
+            (s[0] + dx, s[1] + dy),
+            (s[0] + dx + d[0], s[1] + dy + d[1]),
+            constants.CLR_BLACK,
+            3,
+        )
+        for field_block_bubbles in field_block.traverse_bubbles:
+            for pt in field_block_bubbles:
+                x, y = pt.x + dx, pt.y + dy
+                cv2.rectangle(
+                    final_align,
+                    (int(x + box_w / 10), int(y + box_h / 10)),
+                    (int(x + box_w - box_w / 10), int(y + box_h - box_h / 10)),
+                    constants.CLR_GRAY,
+                    border,
+                )
+                if qvals_img is not None:
+                    rect = [y, y + box_h, x, x + box_w]
+                    cv2.putText(
+                        final_align,
+                        f"{int(cv2.mean(qvals_img[rect[0] : rect[1], rect[2] : rect[3]])[0])}",
+                        (rect[2] + 2, rect[0] + (box_h * 2) // 3),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6,
+                        constants.CLR_BLACK,
+                        2,
+                    )
+
+    @staticmethod
+    def get_layout_layer(template, field_block, border, layer_class=LayoutLayer):
+        key = (layer_class, field_block.name, border)
+        layer = template.layout_layers.get(key)
+        if layer is None:
+            layer = template.layout_layers[key] = layer_class(field_block, border)
+        return layer
+
     def get_global_threshold(
         self,
         q_vals_orig,
@@ -691,31 +979,34 @@ class ImageInstanceOps:
                 plt.show()
         return thr1
 
-    def append_save_img(self, key, img):
+    def append_save_img(self, key, img, context):
         if self.save_image_level >= int(key):
-            self.save_img_list[key].append(img.copy())
+            context.save_img_list[key].append(img.copy())
 
-    def save_image_stacks(self, key, filename, save_dir):
+    def save_image_stacks(self, key, filename, save_dir, context):
         config = self.tuning_config
-        if self.save_image_level >= int(key) and self.save_img_list[key] != []:
+        save_img_list = context.save_img_list
+        if self.save_image_level >= int(key) and save_img_list[key] != []:
             name = os.path.splitext(filename)[0]
             result = np.hstack(
                 tuple(
                     [
                         ImageUtils.resize_util_h(img, config.dimensions.display_height)
-                        for img in self.save_img_list[key]
+                        for img in save_img_list[key]
                     ]
                 )
             )
             result = ImageUtils.resize_util(
                 result,
                 min(
-                    len(self.save_img_list[key]) * config.dimensions.display_width // 3,
+                    len(save_img_list[key]) * config.dimensions.display_width // 3,
                     int(config.dimensions.display_width * 2.5),
                 ),
             )
-            ImageUtils.save_img(f"{save_dir}stack/{name}_{str(key)}_stack.jpg", result)
-
-    def reset_all_save_img(self):
-        for i in range(self.save_image_level):
-            self.save_img_list[i + 1] = []
+            IMAGE_WRITER.write(
+                f"{save_dir}stack/{name}_{str(key)}_stack.jpg",
+                result,
+                config.outputs.image_writer,
+                sheet=filename,
+                kind="stack",
+            )
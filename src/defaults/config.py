@@ -24,11 +24,49 @@ CONFIG_DEFAULTS = DotMap(
             "stride": 1,
             "thickness": 3,
         },
+        "processing_params": {
+            # Note: 'intra_sheet_threads' > 1 reads the parts of a single sheet in parallel, use to cut the latency per sheet.
+            "intra_sheet_threads": 1,
+        },
         "outputs": {
             "show_image_level": 0,
             "save_image_level": 0,
             "save_detections": True,
+            "deferred_rendering": False,
             "filter_out_multimarked_files": False,
+            # Note: images are written on 'threads' background threads (0 writes them while reading),
+            # and 'format' other than "same" changes their extension and applies its quality option.
+            "image_writer": {
+                "threads": 1,
+                "queue_size": 8,
+                "format": "same",
+                "jpeg_quality": 95,
+                "png_compression": 3,
+                "webp_quality": 90,
+                "scale": 1.0,
+            },
+            # Note: 'archive' packs the marked images and stacks into "zip" or "tar" shards.
+            "archive": {
+                "format": "none",
+                "shard_size_mb": 1024,
+            },
+            # Note: 'columnar_results' also writes the results to a "parquet" or "arrow" file, with typed columns
+            "columnar_results": {
+                "format": "none",
+                "buffer_rows": 10000,
+            },
+            # Note: 'sqlite_results' also writes the results of every run to an SQLite database (path is relative to the output directory of the run)
+            "sqlite_results": {
+                "enabled": False,
+                "path": "results.sqlite",
+                "batch_size": 500,
+                "index_columns": [],
+            },
+            # Note: 'explanation_log' is the "csv", "parquet" or "arrow" log of evaluation explanations (see enable_evaluation_table_to_csv)
+            "explanation_log": {
+                "format": "csv",
+                "buffer_rows": 10000,
+            },
         },
     },
     _dynamic=False,
@@ -7,26 +7,66 @@
 
 """
 import os
-from csv import QUOTE_NONNUMERIC
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from multiprocessing import get_context
 from pathlib import Path
 from time import time
 
 import cv2
-import pandas as pd
 from rich.table import Table
 
 from src import constants
+from src.annotations import (
+    append_annotation_records,
+    get_directory_record,
+    get_sheet_record,
+)
+from src.archive import ARCHIVES
+from src.core import SheetContext
 from src.defaults import CONFIG_DEFAULTS
 from src.evaluation import EvaluationConfig, evaluate_concatenated_response
+from src.explanations import EXPLANATION_LOGS
+from src.governor import ResourceGovernor
+from src.image_writer import IMAGE_WRITER, get_image_path
 from src.logger import console, logger
+from src.memory import MEMORY_PROFILER
+from src.metrics import (
+    MARKER_MATCH_SCORE,
+    METRICS,
+    MULTI_MARKED_SHEETS,
+    SHEET_ERRORS,
+    SHEETS_PROCESSED,
+)
+from src.results import (
+    append_sheet_results,
+    close_results_sinks,
+    new_run_id,
+    setup_results_sinks,
+)
+from src.scheduler import (
+    LOOKAHEAD_SHEETS_PER_WORKER,
+    DirectoryJob,
+    build_job_graph,
+    get_schedule,
+)
 from src.template import Template
-from src.utils.file import Paths, setup_dirs_for_paths, setup_outputs_for_template
+from src.tracing import TRACER
+from src.utils.file import (
+    Paths,
+    close_output_files,
+    setup_dirs_for_paths,
+    setup_outputs_for_template,
+    write_output_row,
+)
 from src.utils.image import ImageUtils
 from src.utils.interaction import InteractionUtils, Stats
 from src.utils.parsing import get_concatenated_response, open_config_with_defaults
-
-# Load processors
-STATS = Stats()
+from src.utils.shared_memory import SharedImageRing
 
 
 def entry_point(input_dir, args):
@@ -78,6 +118,65 @@ def process_dir(
     template=None,
     tuning_config=CONFIG_DEFAULTS,
     evaluation_config=None,
+):
+    # The sheets read by this call are recorded as one run in the results database
+    args = {**args, "runId": args.get("runId") or new_run_id()}
+    # Build the job graph of the whole input tree before reading any sheet
+    directory_jobs = []
+    try:
+        collect_directory_jobs(
+            root_dir,
+            curr_dir,
+            args,
+            directory_jobs,
+            template,
+            tuning_config,
+            evaluation_config,
+        )
+
+        if args["setLayout"]:
+            for directory_job in directory_jobs:
+                show_template_layouts(
+                    directory_job.omr_files,
+                    directory_job.template,
+                    directory_job.tuning_config,
+                )
+        elif directory_jobs:
+            governor = ResourceGovernor(
+                threads=max(1, int(args.get("threads", 1))),
+                processes=max(1, int(args.get("processes", 1))),
+                memory_limit_mb=args.get("memoryLimit"),
+                interactive=any(
+                    directory_job.tuning_config.outputs.show_image_level > 0
+                    for directory_job in directory_jobs
+                ),
+            )
+            process_directory_jobs(
+                directory_jobs,
+                governor,
+                tune_workers=args.get("tuneWorkers", False),
+                trace_path=args.get("trace"),
+                metrics_path=args.get("metrics"),
+                memory_profile=args.get("memoryProfile", False),
+            )
+    finally:
+        # Close the output files of this run, also when it stopped on an error
+        for directory_job in directory_jobs:
+            close_results_sinks(directory_job.outputs_namespace)
+            close_output_files(directory_job.outputs_namespace)
+        # Write the indexes and the ends of the archives, and the rest of the explanation logs
+        ARCHIVES.close()
+        EXPLANATION_LOGS.close()
+
+
+def collect_directory_jobs(
+    root_dir,
+    curr_dir,
+    args,
+    directory_jobs,
+    template=None,
+    tuning_config=CONFIG_DEFAULTS,
+    evaluation_config=None,
 ):
     # Update local tuning_config (in current recursion stack)
     local_config_path = curr_dir.joinpath(constants.CONFIG_FILENAME)
@@ -140,6 +239,25 @@ def process_dir(
 
         setup_dirs_for_paths(paths)
         outputs_namespace = setup_outputs_for_template(paths, template)
+        setup_results_sinks(
+            curr_dir,
+            outputs_namespace,
+            tuning_config,
+            args.get("runId"),
+            args["output_dir"],
+            sheet_statuses=args.get("sheetStatuses", False),
+        )
+        if tuning_config.outputs.archive.format != "none":
+            ARCHIVES.open(paths.output_dir, tuning_config.outputs.archive)
+        if evaluation_config and evaluation_config.enable_evaluation_table_to_csv:
+            EXPLANATION_LOGS.open(
+                paths.evaluation_dir, tuning_config.outputs.explanation_log
+            )
+        if tuning_config.outputs.deferred_rendering:
+            # The sheet records of this run follow what their template is read with
+            append_annotation_records(
+                paths.annotations_path, [get_directory_record(template)]
+            )
 
         print_config_summary(
             curr_dir,
@@ -150,16 +268,16 @@ def process_dir(
             evaluation_config,
             args,
         )
-        if args["setLayout"]:
-            show_template_layouts(omr_files, template, tuning_config)
-        else:
-            process_files(
+        directory_jobs.append(
+            DirectoryJob(
+                curr_dir,
                 omr_files,
                 template,
                 tuning_config,
                 evaluation_config,
                 outputs_namespace,
             )
+        )
 
     elif not subdirs:
         # Each subdirectory should have images or should be non-leaf
@@ -168,12 +286,13 @@ def process_dir(
             Empty directories not allowed."
         )
 
-    # recursively process sub-folders
+    # recursively collect sub-folders
     for d in subdirs:
-        process_dir(
+        collect_directory_jobs(
             root_dir,
             d,
             args,
+            directory_jobs,
             template,
             tuning_config,
             evaluation_config,
@@ -186,7 +305,7 @@ def show_template_layouts(omr_files, template, tuning_config):
         file_path = str(file_path)
         in_omr = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
         in_omr = template.image_instance_ops.apply_preprocessors(
-            file_path, in_omr, template
+            file_path, in_omr, template, SheetContext(file_path)
         )
         template_layout = template.image_instance_ops.draw_template_layout(
             in_omr, template, shifted=False, border=2
@@ -196,161 +315,433 @@ def show_template_layouts(omr_files, template, tuning_config):
         )
 
 
-def process_files(
-    omr_files,
-    template,
-    tuning_config,
-    evaluation_config,
-    outputs_namespace,
+def process_directory_jobs(
+    directory_jobs,
+    governor=None,
+    tune_workers=False,
+    trace_path=None,
+    metrics_path=None,
+    memory_profile=False,
 ):
     start_time = int(time())
     files_counter = 0
-    STATS.files_not_moved = 0
+    stats = Stats()
+    sheet_jobs = build_job_graph(directory_jobs)
+
+    if governor is None:
+        governor = ResourceGovernor()
+    if tune_workers:
+        governor.tune(sheet_jobs, benchmark_sheet_job)
+    if memory_profile and governor.get_workers() > 1:
+        logger.warning(
+            "Reading the sheets one at a time for --memoryProfile, as memory is measured per process"
+        )
+        governor.threads, governor.processes = 1, 1
+    governor.apply()
+    IMAGE_WRITER.reset()
+    if trace_path:
+        TRACER.enable()
+    if memory_profile:
+        MEMORY_PROFILER.enable()
+
+    if governor.processes > 1:
+        sheet_results = read_sheets_in_processes(sheet_jobs, governor)
+    elif governor.threads > 1:
+        sheet_results = read_sheets_in_threads(sheet_jobs, governor)
+    else:
+        sheet_results = map(read_sheet_job, sheet_jobs)
 
-    for file_path in omr_files:
+    for sheet_job, sheet_result in zip(sheet_jobs, sheet_results):
         files_counter += 1
-        file_name = file_path.name
+        directory_job = sheet_job.directory_job
+        with TRACER.span("write_outputs", file=sheet_job.file_path.name):
+            write_sheet_outputs(
+                sheet_job.files_counter,
+                sheet_job.file_path,
+                sheet_result,
+                directory_job.outputs_namespace,
+                directory_job.tuning_config,
+                stats,
+            )
+    IMAGE_WRITER.flush()
+    for directory_job in directory_jobs:
+        close_results_sinks(directory_job.outputs_namespace)
 
-        in_omr = cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE)
+    if memory_profile:
+        MEMORY_PROFILER.disable()
 
-        logger.info("")
-        logger.info(
-            f"({files_counter}) Opening image: \t'{file_path}'\tResolution: {in_omr.shape}"
+    print_stats(
+        start_time, files_counter, directory_jobs[0].tuning_config, stats, governor
+    )
+    if trace_path:
+        TRACER.disable()
+        TRACER.write_chrome_trace(trace_path)
+        TRACER.print_stage_table()
+        logger.info(f"Saved the trace of {files_counter} file(s) to '{trace_path}'")
+    if metrics_path:
+        METRICS.write_text_file(metrics_path)
+        logger.info(f"Saved the metrics of the run to '{metrics_path}'")
+    if memory_profile:
+        MEMORY_PROFILER.report()
+
+
+def read_sheet_job(sheet_job, in_omr=None):
+    directory_job = sheet_job.directory_job
+    with TRACER.span("sheet", file=sheet_job.file_path.name):
+        return read_omr_sheet(
+            sheet_job.files_counter,
+            sheet_job.file_path,
+            directory_job.template,
+            directory_job.tuning_config,
+            directory_job.evaluation_config,
+            directory_job.outputs_namespace,
+            in_omr,
         )
 
-        template.image_instance_ops.reset_all_save_img()
 
-        template.image_instance_ops.append_save_img(1, in_omr)
-
-        in_omr = template.image_instance_ops.apply_preprocessors(
-            file_path, in_omr, template
+def benchmark_sheet_job(sheet_job):
+    """Reads a sheet without writing any outputs, for tuning the workers"""
+    template = sheet_job.directory_job.template
+    file_path = sheet_job.file_path
+    context = SheetContext(file_path)
+    in_omr = cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE)
+    if in_omr is None:
+        return
+    in_omr = template.image_instance_ops.apply_preprocessors(
+        file_path, in_omr, template, context
+    )
+    if in_omr is not None:
+        template.image_instance_ops.read_omr_response(
+            template, image=in_omr, name=file_path.name, context=context
         )
 
+
+def read_sheets_in_threads(sheet_jobs, governor):
+    """
+    Reads the sheets of all directories on one thread pool, started largest first
+    within the lookahead. Yields the results in the order of sheet_jobs.
+    """
+    threads = governor.threads
+    sheet_indices = {sheet_job: index for index, sheet_job in enumerate(sheet_jobs)}
+    futures, in_flight = {}, set()
+    next_index = 0
+    lookahead = LOOKAHEAD_SHEETS_PER_WORKER * threads
+    executor = ThreadPoolExecutor(max_workers=threads)
+    try:
+        for sheet_job in get_schedule(sheet_jobs, lookahead):
+            # Finished sheets wait for the earlier ones, keep them within the lookahead
+            while sheet_indices[sheet_job] - next_index >= lookahead:
+                yield futures.pop(next_index).result()
+                next_index += 1
+            # Backpressure: keep a bounded number of sheets in memory at a time
+            while in_flight and (
+                len(in_flight) >= 2 * threads or governor.is_over_memory_limit()
+            ):
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+            future = executor.submit(read_sheet_job, sheet_job)
+            in_flight.add(future)
+            futures[sheet_indices[sheet_job]] = future
+
+            # Hand over the finished sheets that are next in order
+            while next_index in futures and futures[next_index].done():
+                yield futures.pop(next_index).result()
+                next_index += 1
+
+        while next_index < len(sheet_jobs):
+            yield futures.pop(next_index).result()
+            next_index += 1
+    finally:
+        # The sheets not handed over are not needed anymore, e.g. when the run was stopped
+        for future in futures.values():
+            future.cancel()
+        executor.shutdown()
+
+
+# Sheet jobs of the current run. Forked worker processes inherit these along
+# with their templates, so only an index and an image descriptor are sent to them.
+FORKED_SHEET_JOBS = []
+
+
+def init_forked_worker():
+    # Forget the spans, metrics and image writes recorded by the main process before the fork
+    TRACER.drain()
+    METRICS.reset()
+    IMAGE_WRITER.drain()
+    ARCHIVES.drain()
+    EXPLANATION_LOGS.drain()
+
+
+def read_shared_sheet_job(sheet_index, descriptor):
+    # Images that could not be decoded are not in the ring, and go to the errors as usual
+    in_omr = None if descriptor is None else SharedImageRing.view(descriptor)
+    sheet_result = read_sheet_job(FORKED_SHEET_JOBS[sheet_index], in_omr)
+    # Workers may exit with images still queued, so they are written before handing the sheet over
+    IMAGE_WRITER.flush()
+    # Hand the spans, metrics, image writes, archived files and explanation rows of this worker over to the main process
+    return (
+        sheet_result,
+        TRACER.drain(),
+        METRICS.drain(),
+        IMAGE_WRITER.drain(),
+        ARCHIVES.drain(),
+        EXPLANATION_LOGS.drain(),
+    )
+
+
+def get_shared_sheet_result(future):
+    (
+        sheet_result,
+        events,
+        metrics,
+        image_writes,
+        archived_files,
+        explanation_rows,
+    ) = future.result()
+    TRACER.extend(events)
+    METRICS.merge(metrics)
+    IMAGE_WRITER.extend(image_writes)
+    ARCHIVES.extend(archived_files)
+    EXPLANATION_LOGS.extend(explanation_rows)
+    return sheet_result
+
+
+def read_sheets_in_processes(sheet_jobs, governor):
+    """
+    Decodes the sheets on this process and reads them on forked worker processes.
+    Yields the results in the order of sheet_jobs.
+    """
+    processes = governor.processes
+    FORKED_SHEET_JOBS[:] = sheet_jobs
+    sheet_indices = {sheet_job: index for index, sheet_job in enumerate(sheet_jobs)}
+    futures, slots_in_use = {}, {}
+    next_index = 0
+    try:
+        # Two slots per worker: one being read while the next one is decoded
+        with SharedImageRing(slots=2 * processes) as ring, ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=get_context("fork"),
+            initializer=init_forked_worker,
+        ) as executor:
+            lookahead = LOOKAHEAD_SHEETS_PER_WORKER * processes
+            for sheet_job in get_schedule(sheet_jobs, lookahead):
+                # Finished sheets wait for the earlier ones, keep them within the lookahead
+                while sheet_indices[sheet_job] - next_index >= lookahead:
+                    yield get_shared_sheet_result(futures.pop(next_index))
+                    next_index += 1
+                # Backpressure: wait for a worker to free a slot before decoding more,
+                # and for sheets to finish while the run is above its memory ceiling
+                while not ring.has_free_slot() or (
+                    slots_in_use and governor.is_over_memory_limit()
+                ):
+                    done, _ = wait(slots_in_use, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        ring.release(slots_in_use.pop(future))
+
+                with TRACER.span("decode", file=sheet_job.file_path.name):
+                    in_omr = cv2.imread(str(sheet_job.file_path), cv2.IMREAD_GRAYSCALE)
+                sheet_index = sheet_indices[sheet_job]
+                if in_omr is None:
+                    future = executor.submit(read_shared_sheet_job, sheet_index, None)
+                else:
+                    slot, descriptor = ring.put(in_omr)
+                    future = executor.submit(
+                        read_shared_sheet_job, sheet_index, descriptor
+                    )
+                    slots_in_use[future] = slot
+                futures[sheet_index] = future
+
+                # Hand over the finished sheets that are next in order
+                while next_index in futures and futures[next_index].done():
+                    yield get_shared_sheet_result(futures.pop(next_index))
+                    next_index += 1
+
+            while next_index < len(sheet_jobs):
+                yield get_shared_sheet_result(futures.pop(next_index))
+                next_index += 1
+    finally:
+        FORKED_SHEET_JOBS.clear()
+
+
+def read_omr_sheet(
+    files_counter,
+    file_path,
+    template,
+    tuning_config,
+    evaluation_config,
+    outputs_namespace,
+    in_omr=None,
+):
+    """Reads one sheet. Only sheet-local state is modified here, so that sheets can be read on worker threads."""
+    file_name = file_path.name
+    context = SheetContext(file_path)
+
+    if in_omr is None:
+        with TRACER.span("decode", file=file_name):
+            in_omr = cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE)
         if in_omr is None:
+            logger.error(f"({files_counter}) Could not read the image: '{file_path}'")
             # Error OMR case
-            new_file_path = outputs_namespace.paths.errors_dir.joinpath(file_name)
-            outputs_namespace.OUTPUT_SET.append(
-                [file_name] + outputs_namespace.empty_resp
-            )
-            if check_and_move(
-                constants.ERROR_CODES.NO_MARKER_ERR, file_path, new_file_path
-            ):
-                err_line = [
-                    file_name,
-                    file_path,
-                    new_file_path,
-                    "NA",
-                ] + outputs_namespace.empty_resp
-                pd.DataFrame(err_line, dtype=str).T.to_csv(
-                    outputs_namespace.files_obj["Errors"],
-                    mode="a",
-                    quoting=QUOTE_NONNUMERIC,
-                    header=False,
-                    index=False,
-                )
-            continue
-
-        # uniquify
-        file_id = str(file_name)
-        save_dir = outputs_namespace.paths.save_marked_dir
-        (
-            response_dict,
-            final_marked,
-            multi_marked,
-            _,
-        ) = template.image_instance_ops.read_omr_response(
-            template, image=in_omr, name=file_id, save_dir=save_dir
-        )
+            return None
+
+    logger.info("")
+    logger.info(
+        f"({files_counter}) Opening image: \t'{file_path}'\tResolution: {in_omr.shape}"
+    )
 
-        # TODO: move inner try catch here
-        # concatenate roll nos, set unmarked responses, etc
-        omr_response = get_concatenated_response(response_dict, template)
+    template.image_instance_ops.append_save_img(1, in_omr, context)
 
-        if (
-            evaluation_config is None
-            or not evaluation_config.get_should_explain_scoring()
-        ):
-            logger.info(f"Read Response: \n{omr_response}")
+    in_omr = template.image_instance_ops.apply_preprocessors(
+        file_path, in_omr, template, context
+    )
 
-        score = 0
-        if evaluation_config is not None:
+    if in_omr is None:
+        # Error OMR case
+        return None
+
+    if context.marker_match_score is not None:
+        MARKER_MATCH_SCORE.observe(context.marker_match_score)
+
+    # uniquify
+    file_id = str(file_name)
+    save_dir = outputs_namespace.paths.save_marked_dir
+    (
+        response_dict,
+        final_marked,
+        multi_marked,
+        _,
+    ) = template.image_instance_ops.read_omr_response(
+        template, image=in_omr, name=file_id, context=context, save_dir=save_dir
+    )
+
+    # TODO: move inner try catch here
+    # concatenate roll nos, set unmarked responses, etc
+    omr_response = get_concatenated_response(response_dict, template)
+
+    if evaluation_config is None or not evaluation_config.get_should_explain_scoring():
+        logger.info(f"Read Response: \n{omr_response}")
+
+    score = 0
+    if evaluation_config is not None:
+        with TRACER.span("evaluate"):
             score = evaluate_concatenated_response(
-                omr_response, evaluation_config, file_path, outputs_namespace.paths.evaluation_dir
-            )
-            logger.info(
-                f"(/{files_counter}) Graded with score: {round(score, 2)}\t for file: '{file_id}'"
-            )
-        else:
-            logger.info(f"(/{files_counter}) Processed file: '{file_id}'")
-
-        if tuning_config.outputs.show_image_level >= 2:
-            InteractionUtils.show(
-                f"Final Marked Bubbles : '{file_id}'",
-                ImageUtils.resize_util_h(
-                    final_marked, int(tuning_config.dimensions.display_height * 1.3)
-                ),
-                1,
-                1,
-                config=tuning_config,
+                omr_response,
+                evaluation_config,
+                file_path,
+                outputs_namespace.paths.evaluation_dir,
             )
+        logger.info(
+            f"(/{files_counter}) Graded with score: {round(score, 2)}\t for file: '{file_id}'"
+        )
+    else:
+        logger.info(f"(/{files_counter}) Processed file: '{file_id}'")
 
-        resp_array = []
-        for k in template.output_columns:
-            resp_array.append(omr_response[k])
-
-        outputs_namespace.OUTPUT_SET.append([file_name] + resp_array)
-
-        if multi_marked == 0 or not tuning_config.outputs.filter_out_multimarked_files:
-            STATS.files_not_moved += 1
-            new_file_path = save_dir.joinpath(file_id)
-            # Enter into Results sheet-
-            results_line = [file_name, file_path, new_file_path, score] + resp_array
-            # Write/Append to results_line file(opened in append mode)
-            pd.DataFrame(results_line, dtype=str).T.to_csv(
-                outputs_namespace.files_obj["Results"],
-                mode="a",
-                quoting=QUOTE_NONNUMERIC,
-                header=False,
-                index=False,
-            )
-        else:
-            # multi_marked file
-            logger.info(f"[{files_counter}] Found multi-marked file: '{file_id}'")
-            new_file_path = outputs_namespace.paths.multi_marked_dir.joinpath(file_name)
-            if check_and_move(
-                constants.ERROR_CODES.MULTI_BUBBLE_WARN, file_path, new_file_path
-            ):
-                mm_line = [file_name, file_path, new_file_path, "NA"] + resp_array
-                pd.DataFrame(mm_line, dtype=str).T.to_csv(
-                    outputs_namespace.files_obj["MultiMarked"],
-                    mode="a",
-                    quoting=QUOTE_NONNUMERIC,
-                    header=False,
-                    index=False,
-                )
-            # else:
-            #     TODO:  Add appropriate record handling here
-            #     pass
+    if tuning_config.outputs.show_image_level >= 2:
+        InteractionUtils.show(
+            f"Final Marked Bubbles : '{file_id}'",
+            ImageUtils.resize_util_h(
+                final_marked, int(tuning_config.dimensions.display_height * 1.3)
+            ),
+            1,
+            1,
+            config=tuning_config,
+        )
+
+    resp_array = []
+    for k in template.output_columns:
+        resp_array.append(omr_response[k])
+
+    annotation = None
+    if tuning_config.outputs.deferred_rendering:
+        annotation = get_sheet_record(file_path, file_id, context)
 
-    print_stats(start_time, files_counter, tuning_config)
+    return resp_array, multi_marked, score, annotation
 
 
-def check_and_move(error_code, file_path, filepath2):
+def write_sheet_outputs(
+    files_counter, file_path, sheet_result, outputs_namespace, tuning_config, stats
+):
+    file_name = file_path.name
+    SHEETS_PROCESSED.inc()
+    if sheet_result is None:
+        # Error OMR case
+        new_file_path = outputs_namespace.paths.errors_dir.joinpath(file_name)
+        if check_and_move(
+            constants.ERROR_CODES.NO_MARKER_ERR, file_path, new_file_path, stats
+        ):
+            err_line = [
+                file_name,
+                file_path,
+                new_file_path,
+                "NA",
+            ] + outputs_namespace.empty_resp
+            write_output_row(outputs_namespace, "Errors", err_line)
+            append_sheet_results(outputs_namespace, "error", err_line)
+        return
+
+    resp_array, multi_marked, score, annotation = sheet_result
+    file_id = str(file_name)
+    save_dir = outputs_namespace.paths.save_marked_dir
+
+    if annotation is not None:
+        append_annotation_records(
+            outputs_namespace.paths.annotations_path, [annotation]
+        )
+    if multi_marked != 0:
+        MULTI_MARKED_SHEETS.inc()
+
+    if multi_marked == 0 or not tuning_config.outputs.filter_out_multimarked_files:
+        stats.files_not_moved += 1
+        new_file_path = get_image_path(
+            save_dir.joinpath(file_id), tuning_config.outputs.image_writer
+        )
+        # Enter into Results sheet-
+        results_line = [file_name, file_path, new_file_path, score] + resp_array
+        # Append to the results file (kept open for the run)
+        write_output_row(outputs_namespace, "Results", results_line)
+        append_sheet_results(
+            outputs_namespace, "multi_marked" if multi_marked else "ok", results_line
+        )
+    else:
+        # multi_marked file
+        logger.info(f"[{files_counter}] Found multi-marked file: '{file_id}'")
+        new_file_path = outputs_namespace.paths.multi_marked_dir.joinpath(file_name)
+        if check_and_move(
+            constants.ERROR_CODES.MULTI_BUBBLE_WARN, file_path, new_file_path, stats
+        ):
+            mm_line = [file_name, file_path, new_file_path, "NA"] + resp_array
+            write_output_row(outputs_namespace, "MultiMarked", mm_line)
+            append_sheet_results(outputs_namespace, "multi_marked", mm_line)
+        # else:
+        #     TODO:  Add appropriate record handling here
+        #     pass
+
+
+def check_and_move(error_code, file_path, filepath2, stats):
     # TODO: fix file movement into error/multimarked/invalid etc again
-    STATS.files_not_moved += 1
+    error_name = next(
+        name for name, code in constants.ERROR_CODES.items() if code == error_code
+    )
+    SHEET_ERRORS.inc(error_code=error_name)
+    stats.files_not_moved += 1
     return True
 
 
-def print_stats(start_time, files_counter, tuning_config):
+def print_stats(start_time, files_counter, tuning_config, stats, governor=None):
     time_checking = max(1, round(time() - start_time, 2))
     log = logger.info
     log("")
-    log(f"{'Total file(s) moved': <27}: {STATS.files_moved}")
-    log(f"{'Total file(s) not moved': <27}: {STATS.files_not_moved}")
+    log(f"{'Total file(s) moved': <27}: {stats.files_moved}")
+    log(f"{'Total file(s) not moved': <27}: {stats.files_not_moved}")
     log("--------------------------------")
     log(
-        f"{'Total file(s) processed': <27}: {files_counter} ({'Sum Tallied!' if files_counter == (STATS.files_moved + STATS.files_not_moved) else 'Not Tallying!'})"
+        f"{'Total file(s) processed': <27}: {files_counter} ({'Sum Tallied!' if files_counter == (stats.files_moved + stats.files_not_moved) else 'Not Tallying!'})"
     )
+    if governor is not None:
+        for key, value in governor.get_summary():
+            log(f"{key: <27}: {value}")
+    for key, value in IMAGE_WRITER.get_summary():
+        log(f"{key: <27}: {value}")
 
     if tuning_config.outputs.show_image_level <= 0:
         log(
@@ -2,12 +2,13 @@ import ast
 import os
 import re
 from copy import deepcopy
-from csv import QUOTE_NONNUMERIC
 
 import cv2
 import pandas as pd
 from rich.table import Table
 
+from src.core import SheetContext
+from src.explanations import EXPLANATION_LOGS
 from src.logger import console, logger
 from src.schemas.constants import (
     BONUS_SECTION_PREFIX,
@@ -201,6 +202,7 @@ class EvaluationConfig:
         self.enable_evaluation_table_to_csv = options.get(
             "enable_evaluation_table_to_csv", False
         )
+        self.explanation_log_options = tuning_config.outputs.explanation_log
 
         if source_type == "csv":
             csv_path = curr_dir.joinpath(options["answer_key_csv_path"])
@@ -233,8 +235,9 @@ class EvaluationConfig:
                 )
                 # TODO: use a common function for below changes?
                 in_omr = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+                context = SheetContext(image_path)
                 in_omr = template.image_instance_ops.apply_preprocessors(
-                    image_path, in_omr, template
+                    image_path, in_omr, template, context
                 )
                 if in_omr is None:
                     raise Exception(
@@ -249,6 +252,7 @@ class EvaluationConfig:
                     template,
                     image=in_omr,
                     name=image_path,
+                    context=context,
                     save_dir=None,
                 )
                 omr_response = get_concatenated_response(response_dict, template)
@@ -321,8 +325,6 @@ class EvaluationConfig:
 
     # Externally called methods have higher abstraction level.
     def prepare_and_validate_omr_response(self, omr_response):
-        self.reset_explanation_table()
-
         omr_response_questions = set(omr_response.keys())
         all_questions = set(self.questions_in_order)
         missing_questions = sorted(all_questions.difference(omr_response_questions))
@@ -343,10 +345,13 @@ class EvaluationConfig:
                 f"No answer given for potential questions in OMR response: {missing_prefixed_questions}"
             )
 
-    def match_answer_for_question(self, current_score, question, marked_answer):
+    def match_answer_for_question(
+        self, current_score, question, marked_answer, explanation_rows
+    ):
         answer_matcher = self.question_to_answer_matcher[question]
         question_verdict, delta = answer_matcher.get_verdict_marking(marked_answer)
         self.conditionally_add_explanation(
+            explanation_rows,
             answer_matcher,
             delta,
             marked_answer,
@@ -356,25 +361,21 @@ class EvaluationConfig:
         )
         return delta
 
-    def conditionally_print_explanation(self):
+    def conditionally_print_explanation(self, explanation_rows):
         if self.should_explain_scoring:
-            console.print(self.explanation_table, justify="center")
+            console.print(
+                self.prepare_explanation_table(explanation_rows), justify="center"
+            )
 
-    # Explanation Table to CSV
-    def conditionally_save_explanation_csv(self, file_path, evaluation_output_dir):
+    # Explanation rows to the log of the directory
+    def conditionally_log_explanation(
+        self, file_path, evaluation_output_dir, explanation_rows
+    ):
         if self.enable_evaluation_table_to_csv:
-            data = {col.header: col._cells for col in self.explanation_table.columns}
-
-            output_path = os.path.join(
+            EXPLANATION_LOGS.append(
                 evaluation_output_dir,
-                f"{file_path.stem}_evaluation.csv",
-            )
-
-            pd.DataFrame(data, dtype=str).to_csv(
-                output_path,
-                mode="a",
-                quoting=QUOTE_NONNUMERIC,
-                index=False,
+                [(file_path.name, *row) for row in explanation_rows],
+                self.explanation_log_options,
             )
 
     def get_should_explain_scoring(self):
@@ -473,14 +474,10 @@ class EvaluationConfig:
         return question_to_answer_matcher
 
     # Then unfolding lower abstraction levels
-    def reset_explanation_table(self):
-        self.explanation_table = None
-        self.prepare_explanation_table()
-
-    def prepare_explanation_table(self):
-        # TODO: provide a way to export this as csv/pdf
-        if not self.should_explain_scoring:
-            return
+    def get_should_collect_explanation(self):
+        return self.should_explain_scoring or self.enable_evaluation_table_to_csv
+
+    def prepare_explanation_table(self, explanation_rows):
         table = Table(title="Evaluation Explanation Table", show_lines=True)
         table.add_column("Question")
         table.add_column("Marked")
@@ -491,13 +488,27 @@ class EvaluationConfig:
         # TODO: Add max and min score in explanation (row-wise and total)
         if self.has_non_default_section:
             table.add_column("Section")
-        self.explanation_table = table
+        for (
+            question,
+            marked,
+            answer,
+            verdict,
+            delta,
+            score,
+            section,
+        ) in explanation_rows:
+            row = [question, marked, answer, verdict, str(delta), str(score)]
+            if self.has_non_default_section:
+                row.append(section)
+            table.add_row(*row)
+        return table
 
     def get_marking_scheme_for_question(self, question):
         return self.question_to_scheme.get(question, self.default_marking_scheme)
 
     def conditionally_add_explanation(
         self,
+        explanation_rows,
         answer_matcher,
         delta,
         marked_answer,
@@ -505,42 +516,40 @@ class EvaluationConfig:
         question,
         current_score,
     ):
-        if self.should_explain_scoring:
+        # Note: rows are collected per sheet, as one config is shared by concurrent sheets
+        if explanation_rows is not None:
             next_score = current_score + delta
-            # Conditionally add cells
-            row = [
-                item
-                for item in [
+            explanation_rows.append(
+                (
                     question,
                     marked_answer,
                     str(answer_matcher),
                     str.title(question_verdict),
-                    str(round(delta, 2)),
-                    str(round(next_score, 2)),
-                    (
-                        answer_matcher.get_section_explanation()
-                        if self.has_non_default_section
-                        else None
-                    ),
-                ]
-                if item is not None
-            ]
-            self.explanation_table.add_row(*row)
+                    round(delta, 2),
+                    round(next_score, 2),
+                    answer_matcher.get_section_explanation(),
+                )
+            )
 
 
 def evaluate_concatenated_response(
     concatenated_response, evaluation_config, file_path, evaluation_output_dir
 ):
     evaluation_config.prepare_and_validate_omr_response(concatenated_response)
+    explanation_rows = (
+        [] if evaluation_config.get_should_collect_explanation() else None
+    )
     current_score = 0.0
     for question in evaluation_config.questions_in_order:
         marked_answer = concatenated_response[question]
         delta = evaluation_config.match_answer_for_question(
-            current_score, question, marked_answer
+            current_score, question, marked_answer, explanation_rows
         )
         current_score += delta
 
-    evaluation_config.conditionally_print_explanation()
-    evaluation_config.conditionally_save_explanation_csv(file_path, evaluation_output_dir)
+    evaluation_config.conditionally_print_explanation(explanation_rows)
+    evaluation_config.conditionally_log_explanation(
+        file_path, evaluation_output_dir, explanation_rows
+    )
 
     return current_score
@@ -0,0 +1,131 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import csv
+import os
+from pathlib import Path
+from threading import Lock
+
+from src import constants
+from src.logger import logger
+from src.utils.columnar import COLUMNAR_FORMATS, ColumnarWriter
+
+EXPLANATION_LOG_COLUMNS = [
+    ("file", "string"),
+    ("question", "string"),
+    ("marked", "string"),
+    ("answer", "string"),
+    ("verdict", "string"),
+    ("delta", "float"),
+    ("score", "float"),
+    ("section", "string"),
+]
+EXPLANATION_LOG_EXTENSIONS = {"csv": ".csv", **COLUMNAR_FORMATS}
+
+
+class ExplanationLog:
+    """
+    One long-format log of the evaluation explanations of all sheets in a directory,
+    with a row per question of each sheet.
+
+    Rows are buffered and written buffer_rows at a time, as CSV lines or as row groups of a
+    parquet (or Arrow IPC) file. The log is written from scratch on each run, replacing the
+    log of the previous run in the directory.
+    """
+
+    def __init__(self, evaluation_dir, log_options):
+        self.format = log_options.format
+        self.buffer_rows = log_options.buffer_rows
+        self.path = Path(evaluation_dir).joinpath(
+            f"{constants.EXPLANATION_LOG_FILENAME}{EXPLANATION_LOG_EXTENSIONS[self.format]}"
+        )
+        self.lock = Lock()
+        self.rows = []
+        self.rows_written = 0
+        if self.format in COLUMNAR_FORMATS:
+            self.writer = ColumnarWriter(
+                self.path, EXPLANATION_LOG_COLUMNS, self.format
+            )
+        else:
+            self.file = open(self.path, "w", newline="")
+            self.writer = csv.writer(self.file, quoting=csv.QUOTE_NONNUMERIC)
+            self.writer.writerow([column for column, _ in EXPLANATION_LOG_COLUMNS])
+
+    def append(self, rows):
+        with self.lock:
+            self.rows.extend(rows)
+            if len(self.rows) >= self.buffer_rows:
+                self.flush_rows()
+
+    def flush_rows(self):
+        rows, self.rows = self.rows, []
+        if not rows:
+            return
+        if self.format in COLUMNAR_FORMATS:
+            self.writer.write_rows(rows)
+        else:
+            self.writer.writerows(rows)
+        self.rows_written += len(rows)
+
+    def close(self):
+        with self.lock:
+            self.flush_rows()
+            if self.format in COLUMNAR_FORMATS:
+                self.writer.close()
+            else:
+                self.file.close()
+        logger.info(f"Wrote {self.rows_written} explanation rows to '{self.path}'")
+
+
+class ExplanationLogs:
+    """The explanation logs of the evaluation directories of a run"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.logs = {}
+        # The process the logs are written from, forked workers hand their rows over to it
+        self.pid = os.getpid()
+        # (evaluation dir, rows, log options) appended in a forked worker, for the main process to write
+        self.forked_rows = []
+
+    def open(self, evaluation_dir, log_options):
+        key = Path(evaluation_dir).resolve()
+        with self.lock:
+            log = self.logs.get(key)
+            if log is None:
+                log = self.logs[key] = ExplanationLog(evaluation_dir, log_options)
+        return log
+
+    def append(self, evaluation_dir, rows, log_options):
+        """Appends the explanation rows of a sheet to the log of its evaluation directory"""
+        if os.getpid() != self.pid:
+            with self.lock:
+                self.forked_rows.append((evaluation_dir, rows, log_options))
+            return
+        # Evaluations outside of a run (e.g. benchmarks) get their log on first use
+        self.open(evaluation_dir, log_options).append(rows)
+
+    def drain(self):
+        """Returns the rows appended in this worker so far and forgets them (used to send them from worker processes)"""
+        with self.lock:
+            forked_rows, self.forked_rows = self.forked_rows, []
+        return forked_rows
+
+    def extend(self, forked_rows):
+        # The log of a directory may not be open yet, e.g. for evaluations outside of a run
+        for evaluation_dir, rows, log_options in forked_rows:
+            self.open(evaluation_dir, log_options).append(rows)
+
+    def close(self):
+        with self.lock:
+            logs, self.logs = self.logs, {}
+        for log in logs.values():
+            log.close()
+
+
+EXPLANATION_LOGS = ExplanationLogs()
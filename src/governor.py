@@ -0,0 +1,178 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import active_children, get_all_start_methods
+from time import perf_counter
+
+import cv2
+
+from src.logger import logger
+
+# Sheets used by the startup micro-benchmark of each candidate split
+BENCHMARK_SHEETS_PER_WORKER = 2
+MIN_BENCHMARK_SHEETS = 4
+
+
+def get_cpu_count():
+    # Respect the cores this process is allowed to run on (e.g. in containers)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_rss_bytes(pids):
+    """Sums the resident memory of the given processes. Returns None where /proc is not available."""
+    if not os.path.exists("/proc/self/statm"):
+        return None
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            # The process exited in between
+            continue
+    return total
+
+
+class ResourceGovernor:
+    """
+    Splits the available cores between sheet workers and OpenCV's own threads,
+    and holds back new sheets while the run is above its memory ceiling.
+
+    OpenCV parallelises calls like matchTemplate, warpPerspective and
+    morphologyEx internally. With several sheet workers running such calls at
+    once, leaving OpenCV at one thread per core oversubscribes the CPU, so the
+    cores are divided between the two levels instead.
+    """
+
+    def __init__(self, threads=1, processes=1, memory_limit_mb=None, interactive=False):
+        self.cpu_count = get_cpu_count()
+        self.threads, self.processes = threads, processes
+
+        # Images shown with show_image_level > 0 have to be shown one at a time
+        self.interactive = interactive
+        if self.interactive:
+            for key, workers in [("threads", threads), ("processes", processes)]:
+                if workers > 1:
+                    logger.warning(
+                        f"Ignoring --{key} {workers} as show_image_level > 0 needs the images to be shown one at a time"
+                    )
+            self.threads, self.processes = 1, 1
+
+        if self.processes > 1 and "fork" not in get_all_start_methods():
+            logger.warning(
+                f"Ignoring --processes {processes} as worker processes need the 'fork' start method on this platform"
+            )
+            self.processes = 1
+        if self.processes > 1 and self.threads > 1:
+            logger.warning(f"Ignoring --threads {threads} in favour of --processes")
+            self.threads = 1
+
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        if self.memory_limit is not None and get_rss_bytes([]) is None:
+            logger.warning(
+                "Ignoring --memoryLimit as memory usage cannot be measured on this platform"
+            )
+            self.memory_limit = None
+
+        self.opencv_threads = None
+        self.tuned_from = None
+        self.peak_rss = 0
+        self.backpressure_waits = 0
+
+    def get_workers(self):
+        return max(self.threads, self.processes)
+
+    def get_mode(self):
+        if self.processes > 1:
+            return "processes"
+        return "threads" if self.threads > 1 else "sequential"
+
+    def apply(self):
+        if self.opencv_threads is None:
+            self.opencv_threads = max(1, self.cpu_count // self.get_workers())
+        # Forked worker processes inherit this setting
+        cv2.setNumThreads(self.opencv_threads)
+
+    def tune(self, sheet_jobs, read_sheet_job):
+        """
+        Picks the number of worker threads and OpenCV threads from a short run over the first sheets.
+        read_sheet_job should read a sheet without writing any outputs.
+        """
+        if self.interactive:
+            logger.warning(
+                "Skipping worker tuning as show_image_level > 0 needs the images to be shown one at a time"
+            )
+            return
+        if self.processes > 1:
+            logger.warning("Skipping worker tuning as it only applies to --threads")
+            return
+        sample_size = max(
+            MIN_BENCHMARK_SHEETS, BENCHMARK_SHEETS_PER_WORKER * self.cpu_count
+        )
+        sample_jobs = sheet_jobs[:sample_size]
+        candidate_workers = sorted({1, max(1, self.cpu_count // 2), self.cpu_count})
+
+        logger.info(
+            f"Tuning workers on {len(sample_jobs)} sheet(s) for {candidate_workers} thread(s)"
+        )
+        # The benchmark reads the same sheets several times, keep its logs out of the run
+        log_level = logger.log.level
+        logger.log.setLevel(logging.WARNING)
+        timings = {}
+        try:
+            for workers in candidate_workers:
+                opencv_threads = max(1, self.cpu_count // workers)
+                cv2.setNumThreads(opencv_threads)
+                start = perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    list(executor.map(read_sheet_job, sample_jobs))
+                timings[(workers, opencv_threads)] = perf_counter() - start
+        finally:
+            logger.log.setLevel(log_level)
+
+        (self.threads, self.opencv_threads), best_time = min(
+            timings.items(), key=lambda item: item[1]
+        )
+        self.tuned_from = len(sample_jobs)
+        logger.info(
+            f"Tuned to {self.threads} worker thread(s) with {self.opencv_threads} OpenCV thread(s) ({round(best_time, 2)}s for the sample)"
+        )
+
+    def is_over_memory_limit(self):
+        """Checks the memory of this process and its worker processes against the ceiling"""
+        if self.memory_limit is None:
+            return False
+        pids = [os.getpid()] + [child.pid for child in active_children()]
+        rss = get_rss_bytes(pids)
+        self.peak_rss = max(self.peak_rss, rss)
+        if rss > self.memory_limit:
+            self.backpressure_waits += 1
+            return True
+        return False
+
+    def get_summary(self):
+        summary = [
+            ("Sheet workers", f"{self.get_workers()} ({self.get_mode()})"),
+            ("OpenCV threads", f"{self.opencv_threads} (of {self.cpu_count} core(s))"),
+        ]
+        if self.tuned_from:
+            summary.append(("Tuned on", f"{self.tuned_from} sheet(s)"))
+        if self.memory_limit is not None:
+            summary.append(
+                (
+                    "Memory ceiling",
+                    f"{self.memory_limit // (1024 * 1024)} MB (peak {self.peak_rss // (1024 * 1024)} MB, held back {self.backpressure_waits} time(s))",
+                )
+            )
+        return summary
@@ -0,0 +1,190 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from threading import Lock, Semaphore
+from time import perf_counter
+
+import cv2
+
+from src.archive import write_output_file
+from src.logger import logger
+from src.memory import MEMORY_PROFILER
+from src.metrics import IMAGE_BYTES_WRITTEN
+from src.tracing import TRACER
+
+# format -> (extension, quality option, OpenCV flag of the option)
+IMAGE_FORMATS = {
+    "jpg": (".jpg", "jpeg_quality", cv2.IMWRITE_JPEG_QUALITY),
+    "png": (".png", "png_compression", cv2.IMWRITE_PNG_COMPRESSION),
+    "webp": (".webp", "webp_quality", cv2.IMWRITE_WEBP_QUALITY),
+}
+KB = 1024
+
+
+def get_image_path(path, image_options):
+    """Returns the path an image is written to, with the extension of the configured format"""
+    if image_options.format == "same":
+        return path
+    image_path = Path(path).with_suffix(IMAGE_FORMATS[image_options.format][0])
+    return str(image_path) if isinstance(path, str) else image_path
+
+
+def encode_image(image, path, image_options):
+    """Returns the bytes of an image encoded for path, scaled down and compressed as configured"""
+    if image_options.scale != 1:
+        image = cv2.resize(
+            image,
+            None,
+            fx=image_options.scale,
+            fy=image_options.scale,
+            interpolation=cv2.INTER_AREA,
+        )
+    params = []
+    if image_options.format != "same":
+        _, option, flag = IMAGE_FORMATS[image_options.format]
+        params = [flag, int(image_options[option])]
+    success, encoded = cv2.imencode(Path(path).suffix, image, params)
+    if not success:
+        raise Exception(f"Could not encode the image: '{path}'")
+    return encoded.tobytes()
+
+
+class ImageWriter:
+    """
+    Writes the output images of sheets on background threads, so that encoding and disk writes
+    overlap with reading the next sheets.
+
+    At most queue_size images wait to be written per pool, further writes block until one is done.
+    The images passed in must not be modified afterwards. The bytes written and the time spent
+    writing are totalled per kind of image, for the summary at the end of a run.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        # (executor, free places in its queue) by (process id, threads, queue size).
+        # Forked worker processes do not inherit the threads of a pool, so each process gets its own.
+        self.pools = {}
+        self.pending = set()
+        self.reset()
+
+    def reset(self):
+        # kind -> [images, bytes, seconds] written, kept as totals so that memory does not grow with the sheets
+        self.totals = defaultdict(lambda: [0, 0, 0.0])
+
+    def get_pool(self, image_options):
+        key = (os.getpid(), image_options.threads, image_options.queue_size)
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = (
+                    ThreadPoolExecutor(
+                        max_workers=image_options.threads,
+                        thread_name_prefix="image-writer",
+                    ),
+                    Semaphore(image_options.queue_size),
+                )
+        return pool
+
+    def write(self, path, image, image_options, sheet=None, kind="marked"):
+        """Queues an image to be written, returns the path it is written to"""
+        path = get_image_path(path, image_options)
+        # Memory is profiled per span on one thread, so images are written right away then
+        if image_options.threads == 0 or MEMORY_PROFILER.enabled:
+            self.write_now(path, image, image_options, sheet, kind)
+            return path
+
+        executor, queue_places = self.get_pool(image_options)
+        # Backpressure: wait for a place in the queue
+        queue_places.acquire()
+        future = executor.submit(
+            self.write_now, path, image, image_options, sheet, kind
+        )
+        with self.lock:
+            self.pending.add(future)
+
+        def on_done(future):
+            queue_places.release()
+            with self.lock:
+                self.pending.discard(future)
+
+        future.add_done_callback(on_done)
+        return path
+
+    def write_now(self, path, image, image_options, sheet=None, kind="marked"):
+        logger.info(f"Saving Image to '{path}'")
+        start = perf_counter()
+        try:
+            with TRACER.span("write_image", file=sheet):
+                encoded = encode_image(image, path, image_options)
+                write_output_file(path, encoded)
+        except Exception as e:
+            # Like cv2.imwrite, a failed image does not stop the run
+            logger.error(f"Could not write the image '{path}': {e}")
+            return
+        IMAGE_BYTES_WRITTEN.inc(len(encoded), kind=kind)
+        with self.lock:
+            self.add_totals(kind, 1, len(encoded), perf_counter() - start)
+
+    def add_totals(self, kind, count, size, seconds):
+        totals = self.totals[kind]
+        totals[0] += count
+        totals[1] += size
+        totals[2] += seconds
+
+    def flush(self):
+        """Waits for the queued images to be written"""
+        with self.lock:
+            pending = set(self.pending)
+        wait(pending)
+
+    def drain(self):
+        """Returns the totals of the images written so far and forgets them (used to send them from worker processes)"""
+        with self.lock:
+            totals = dict(self.totals)
+            self.reset()
+        return totals
+
+    def extend(self, totals):
+        with self.lock:
+            for kind, (count, size, seconds) in totals.items():
+                self.add_totals(kind, count, size, seconds)
+
+    def get_summary(self):
+        by_kind = self.totals
+        if not by_kind:
+            return []
+        # Each sheet writes one marked image
+        sheet_count = max(
+            by_kind["marked"][0]
+            if "marked" in by_kind
+            else max(count for count, _, _ in by_kind.values()),
+            1,
+        )
+        summary = [
+            (
+                f"Images written ({kind})",
+                f"{count} ({round(size / (KB * KB), 1)} MB in {round(seconds, 2)} seconds)",
+            )
+            for kind, (count, size, seconds) in sorted(by_kind.items())
+        ]
+        total_size = sum(size for _, size, _ in by_kind.values())
+        total_seconds = sum(seconds for _, _, seconds in by_kind.values())
+        summary.append(
+            (
+                "Image writes per sheet",
+                f"~{round(total_size / sheet_count / KB, 1)} KB in ~{round(total_seconds * 1000 / sheet_count, 1)} ms",
+            )
+        )
+        return summary
+
+
+IMAGE_WRITER = ImageWriter()
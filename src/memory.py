@@ -0,0 +1,174 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import os
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+from rich.table import Table
+
+from src.governor import get_rss_bytes
+from src.logger import console, logger
+
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 10
+# Sheets read before the retained memory is expected to level off (caches, pools)
+WARMUP_SHEETS = 3
+# Retained memory growing faster than this per sheet is reported as a possible leak
+MAX_GROWTH_PER_SHEET = 64 * 1024
+MB = 1024 * 1024
+
+
+def get_short_path(filename):
+    # Paths relative to the project, or to the installed packages
+    if "site-packages" in filename:
+        return filename.split("site-packages")[-1].lstrip(os.sep)
+    if filename.startswith(os.getcwd()):
+        return os.path.relpath(filename)
+    return filename
+
+
+class MemoryProfiler:
+    """
+    Records the memory used by each processing stage, per sheet.
+
+    Stages are the spans of the tracer. For each span, the peak of Python and numpy
+    allocations above what was allocated when it started is measured with tracemalloc,
+    along with the resident memory of the process when it ends. The memory still
+    allocated after each sheet is tracked to catch growth over long runs.
+    Memory is attributed per process, so sheets should be read one at a time.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        # [span start, traced memory at the start, highest traced memory since] of the open spans
+        self.open_spans = []
+        # stage -> list of (peak increase, rss at the end)
+        self.stages = defaultdict(list)
+        # traced memory still allocated after each sheet
+        self.retained = []
+        self.start_snapshot, self.end_snapshot = None, None
+
+    def enable(self):
+        if not hasattr(tracemalloc, "reset_peak"):
+            logger.warning("Skipping memory profiling as it needs Python 3.9 or later")
+            return
+        self.reset()
+        self.enabled = True
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.start_snapshot = tracemalloc.take_snapshot()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.end_snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    def update_open_spans(self):
+        # The peak since the last span boundary counts towards every span still open
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for open_span in self.open_spans:
+            open_span[2] = max(open_span[2], peak)
+        return current
+
+    def start_span(self, start):
+        current = self.update_open_spans()
+        self.open_spans.append([start, current, current])
+
+    def end_span(self, name, start):
+        current = self.update_open_spans()
+        # Spans end in the reverse order of their starts
+        index = next(
+            (
+                index
+                for index in reversed(range(len(self.open_spans)))
+                if self.open_spans[index][0] == start
+            ),
+            None,
+        )
+        if index is None:
+            # Started before profiling was enabled
+            return
+        _, start_memory, peak = self.open_spans[index]
+        del self.open_spans[index:]
+        self.stages[name].append((peak - start_memory, get_rss_bytes([os.getpid()])))
+        if name == "sheet":
+            self.retained.append(current)
+
+    def get_growth_per_sheet(self):
+        """Returns the slope of the retained memory over the sheets after the warmup, in bytes per sheet"""
+        retained = self.retained[WARMUP_SHEETS:]
+        if len(retained) < 2:
+            return None
+        return float(np.polyfit(np.arange(len(retained)), retained, 1)[0])
+
+    def print_stage_table(self):
+        table = Table(title="Stage Memory (MB)", show_lines=False)
+        table.add_column("Stage", style="cyan", no_wrap=True)
+        table.add_column("Count", justify="right")
+        table.add_column("Peak p50", justify="right", style="magenta")
+        table.add_column("Peak max", justify="right", style="magenta")
+        table.add_column("RSS max", justify="right")
+        for name, samples in sorted(self.stages.items()):
+            peaks = [peak for peak, _ in samples]
+            rss_values = [rss for _, rss in samples if rss is not None]
+            table.add_row(
+                name,
+                str(len(samples)),
+                f"{np.percentile(peaks, 50) / MB:.2f}",
+                f"{max(peaks) / MB:.2f}",
+                f"{max(rss_values) / MB:.1f}" if rss_values else "NA",
+            )
+        console.print(table, justify="center")
+
+    def print_top_allocations(self):
+        table = Table(title="Top Allocations Retained Since the Start")
+        table.add_column("Location", style="cyan")
+        table.add_column("Size (KB)", justify="right")
+        table.add_column("Blocks", justify="right")
+        # Leave out the bookkeeping of tracemalloc and of this profiler
+        differences = self.end_snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        ).compare_to(self.start_snapshot, "lineno")
+        for difference in differences[:TOP_ALLOCATIONS]:
+            frame = difference.traceback[0]
+            table.add_row(
+                f"{get_short_path(frame.filename)}:{frame.lineno}",
+                f"{difference.size_diff / 1024:+.1f}",
+                f"{difference.count_diff:+d}",
+            )
+        console.print(table, justify="center")
+
+    def report(self):
+        self.print_stage_table()
+        self.print_top_allocations()
+        growth = self.get_growth_per_sheet()
+        if growth is None:
+            logger.info(
+                f"Read too few sheets to measure memory growth (need more than {WARMUP_SHEETS + 1})"
+            )
+        elif growth > MAX_GROWTH_PER_SHEET:
+            logger.warning(
+                f"Retained memory grew by {growth / 1024:.1f} KB per sheet over {len(self.retained)} sheets, check the top allocations for a leak"
+            )
+        else:
+            logger.info(
+                f"Retained memory changed by {growth / 1024:.1f} KB per sheet over {len(self.retained)} sheets"
+            )
+
+
+MEMORY_PROFILER = MemoryProfiler()
@@ -0,0 +1,224 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import os
+from bisect import bisect_left
+from threading import Lock
+
+from src import constants
+
+STAGE_SECONDS_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+MARKER_MATCH_SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def format_labels(labelnames, label_values, extra=()):
+    pairs = list(zip(labelnames, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation = name, documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def drain(self):
+        with self.lock:
+            values, self.values = self.values, {}
+        return values
+
+    def merge(self, values):
+        with self.lock:
+            for key, value in values.items():
+                self.values[key] = self.values.get(key, 0) + value
+
+    def get_samples(self):
+        with self.lock:
+            values = dict(self.values)
+        if not values and not self.labelnames:
+            values = {(): 0}
+        for key, value in sorted(values.items()):
+            yield self.name, format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Counts observations into cumulative buckets, optionally split by labels"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        self.name, self.documentation = name, documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.lock = Lock()
+        # label values -> [bucket counts, sum, count]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            bucket_counts, _, _ = entry = self.values[key]
+            bucket_counts[bucket] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def drain(self):
+        with self.lock:
+            values, self.values = self.values, {}
+        return values
+
+    def merge(self, values):
+        with self.lock:
+            for key, (bucket_counts, total, count) in values.items():
+                if key not in self.values:
+                    self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+                entry = self.values[key]
+                entry[0] = [a + b for a, b in zip(entry[0], bucket_counts)]
+                entry[1] += total
+                entry[2] += count
+
+    def get_samples(self):
+        with self.lock:
+            values = {
+                key: (list(bucket_counts), total, count)
+                for key, (bucket_counts, total, count) in self.values.items()
+            }
+        for key, (bucket_counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = format_labels(
+                    self.labelnames, key, [("le", format_value(upper_bound))]
+                )
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = format_labels(self.labelnames, key)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+    """
+    Holds the counters and histograms of this process and renders them in the
+    Prometheus text exposition format. Worker processes drain their values and
+    the main process merges them, so a run reports all of its sheets.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise Exception(f"Metric already registered: '{metric.name}'")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=()):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def drain(self):
+        return {name: metric.drain() for name, metric in self.metrics.items()}
+
+    def merge(self, drained_values):
+        for name, values in drained_values.items():
+            self.metrics[name].merge(values)
+
+    def reset(self):
+        self.drain()
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample_name, labels, value in metric.get_samples():
+                lines.append(f"{sample_name}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_text_file(self, metrics_path):
+        # Write and rename so that a collector never reads a partial file
+        temp_path = f"{metrics_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render())
+        os.replace(temp_path, metrics_path)
+
+
+METRICS = MetricsRegistry()
+
+SHEETS_PROCESSED = METRICS.counter(
+    "omr_sheets_processed_total", "OMR sheets processed, including the ones in error"
+)
+SHEET_ERRORS = METRICS.counter(
+    "omr_sheet_errors_total",
+    "OMR sheets moved for manual checking, by error code",
+    ["error_code"],
+)
+MULTI_MARKED_SHEETS = METRICS.counter(
+    "omr_multi_marked_sheets_total", "OMR sheets with at least one multi-marked field"
+)
+STAGE_SECONDS = METRICS.histogram(
+    "omr_stage_duration_seconds",
+    "Time spent in each processing stage of a sheet",
+    ["stage"],
+    STAGE_SECONDS_BUCKETS,
+)
+IMAGE_BYTES_WRITTEN = METRICS.counter(
+    "omr_image_bytes_written_total",
+    "Bytes of the output images written, by kind of image",
+    ["kind"],
+)
+MARKER_MATCH_SCORE = METRICS.histogram(
+    "omr_marker_match_score",
+    "Average marker matching score of the sheets cropped on markers",
+    buckets=MARKER_MATCH_SCORE_BUCKETS,
+)
+
+# Export a zero for each error code so that rates can be computed before the first error
+for error_name in constants.ERROR_CODES.keys():
+    SHEET_ERRORS.inc(0, error_code=error_name)
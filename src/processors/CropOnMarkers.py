@@ -7,6 +7,7 @@ from src.logger import logger
 from src.processors.interfaces.ImagePreprocessor import ImagePreprocessor
 from src.utils.image import ImageUtils
 from src.utils.interaction import InteractionUtils
+from src.utils.parallel import parallel_map
 
 
 class CropOnMarkers(ImagePreprocessor):
@@ -14,7 +15,6 @@ class CropOnMarkers(ImagePreprocessor):
         super().__init__(*args, **kwargs)
         config = self.tuning_config
         marker_ops = self.options
-        self.threshold_circles = []
         # img_utils = ImageUtils()
 
         # options with defaults
@@ -29,6 +29,7 @@ class CropOnMarkers(ImagePreprocessor):
         self.marker_rescale_steps = int(marker_ops.get("marker_rescale_steps", 10))
         self.apply_erode_subtract = marker_ops.get("apply_erode_subtract", True)
         self.marker = self.load_marker(marker_ops, config)
+        self.intra_sheet_threads = config.processing_params.intra_sheet_threads
 
     def __str__(self):
         return self.marker_path
@@ -36,7 +37,7 @@ class CropOnMarkers(ImagePreprocessor):
     def exclude_files(self):
         return [self.marker_path]
 
-    def apply_filter(self, image, file_path):
+    def apply_filter(self, image, file_path, context):
         config = self.tuning_config
         image_instance_ops = self.image_instance_ops
         image_eroded_sub = ImageUtils.normalize_util(
@@ -71,8 +72,14 @@ class CropOnMarkers(ImagePreprocessor):
         centres = []
         sum_t, max_t = 0, 0
         quarter_match_log = "Matching Marker:  "
+        # The quadrants are matched independently, then checked in order
+        quad_matches = parallel_map(
+            lambda quad: cv2.matchTemplate(quad, optimal_marker, cv2.TM_CCOEFF_NORMED),
+            [quads[k] for k in range(0, 4)],
+            self.intra_sheet_threads,
+        )
         for k in range(0, 4):
-            res = cv2.matchTemplate(quads[k], optimal_marker, cv2.TM_CCOEFF_NORMED)
+            res = quad_matches[k]
             max_t = res.max()
             quarter_match_log += f"Quarter{str(k + 1)}: {str(round(max_t, 3))}\t"
             if (
@@ -129,13 +136,14 @@ class CropOnMarkers(ImagePreprocessor):
         logger.info(quarter_match_log)
         logger.info(f"Optimal Scale: {best_scale}")
         # analysis data
-        self.threshold_circles.append(sum_t / 4)
+        context.marker_match_score = sum_t / 4
+        context.warped_corners[self.__class__.__name__] = centres
 
         image = ImageUtils.four_point_transform(image, np.array(centres))
         # appendSaveImg(1,image_eroded_sub)
         # appendSaveImg(1,image_norm)
 
-        image_instance_ops.append_save_img(2, image_eroded_sub)
+        image_instance_ops.append_save_img(2, image_eroded_sub, context)
         # Debugging image -
         # res = cv2.matchTemplate(image_eroded_sub,optimal_marker,cv2.TM_CCOEFF_NORMED)
         # res[ : , midw:midw+2] = 255
@@ -195,26 +203,33 @@ class CropOnMarkers(ImagePreprocessor):
             self.marker_rescale_range[1] - self.marker_rescale_range[0]
         ) // self.marker_rescale_steps
         _h, _w = self.marker.shape[:2]
-        res, best_scale = None, None
+        best_scale = None
         all_max_t = 0
 
-        for r0 in np.arange(
-            self.marker_rescale_range[1],
-            self.marker_rescale_range[0],
-            -1 * descent_per_step,
-        ):  # reverse order
-            s = float(r0 * 1 / 100)
-            if s == 0.0:
-                continue
+        scales = [
+            float(r0 * 1 / 100)
+            for r0 in np.arange(
+                self.marker_rescale_range[1],
+                self.marker_rescale_range[0],
+                -1 * descent_per_step,
+            )  # reverse order
+        ]
+        scales = [s for s in scales if s != 0.0]
+
+        def get_match(s):
             rescaled_marker = ImageUtils.resize_util_h(
                 self.marker, u_height=int(_h * s)
             )
             # res is the black image with white dots
-            res = cv2.matchTemplate(
+            return cv2.matchTemplate(
                 image_eroded_sub, rescaled_marker, cv2.TM_CCOEFF_NORMED
             )
 
-            max_t = res.max()
+        # Only the peaks are kept to not hold all the match images at once
+        max_ts = parallel_map(
+            lambda s: get_match(s).max(), scales, self.intra_sheet_threads
+        )
+        for s, max_t in zip(scales, max_ts):
             if all_max_t < max_t:
                 # print('Scale: '+str(s)+', Circle Match: '+str(round(max_t*100,2))+'%')
                 best_scale, all_max_t = s, max_t
@@ -223,8 +238,8 @@ class CropOnMarkers(ImagePreprocessor):
             logger.warning(
                 "\tTemplate matching too low! Consider rechecking preProcessors applied before this."
             )
-            if config.outputs.show_image_level >= 1:
-                InteractionUtils.show("res", res, 1, 0, config=config)
+            if config.outputs.show_image_level >= 1 and scales:
+                InteractionUtils.show("res", get_match(scales[-1]), 1, 0, config=config)
 
         if best_scale is None:
             logger.warning(
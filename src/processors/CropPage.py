@@ -53,7 +53,7 @@ class CropPage(ImagePreprocessor):
             int(x) for x in cropping_ops.get("morphKernel", [10, 10])
         )
 
-    def apply_filter(self, image, file_path):
+    def apply_filter(self, image, file_path, context):
         image = normalize(cv2.GaussianBlur(image, (3, 3), 0))
 
         # Resize should be done with another preprocessor is needed
@@ -65,6 +65,7 @@ class CropPage(ImagePreprocessor):
             return None
 
         logger.info(f"Found page corners: \t {sheet.tolist()}")
+        context.warped_corners[self.__class__.__name__] = sheet.tolist()
 
         # Warp layer 1
         image = ImageUtils.four_point_transform(image, sheet)
@@ -40,7 +40,7 @@ class FeatureBasedAlignment(ImagePreprocessor):
     def exclude_files(self):
         return [self.ref_path]
 
-    def apply_filter(self, image, _file_path):
+    def apply_filter(self, image, _file_path, _context):
         config = self.tuning_config
         # Convert images to grayscale
         # im1Gray = cv2.cvtColor(im1, cv2.COLOR_BGR2GRAY)
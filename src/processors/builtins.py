@@ -29,7 +29,7 @@ class Levels(ImagePreprocessor):
             ]
         ).astype("uint8")
 
-    def apply_filter(self, image, _file_path):
+    def apply_filter(self, image, _file_path, _context):
         return cv2.LUT(image, self.gamma)
 
 
@@ -39,7 +39,7 @@ class MedianBlur(ImagePreprocessor):
         options = self.options
         self.kSize = int(options.get("kSize", 5))
 
-    def apply_filter(self, image, _file_path):
+    def apply_filter(self, image, _file_path, _context):
         return cv2.medianBlur(image, self.kSize)
 
 
@@ -50,5 +50,5 @@ class GaussianBlur(ImagePreprocessor):
         self.kSize = tuple(int(x) for x in options.get("kSize", (3, 3)))
         self.sigmaX = int(options.get("sigmaX", 0))
 
-    def apply_filter(self, image, _file_path):
+    def apply_filter(self, image, _file_path, _context):
         return cv2.GaussianBlur(image, self.kSize, self.sigmaX)
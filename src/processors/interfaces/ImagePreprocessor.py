@@ -8,8 +8,10 @@ class ImagePreprocessor(Processor):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def apply_filter(self, image, filename):
-        """Apply filter to the image and returns modified image"""
+    def apply_filter(self, image, filename, context):
+        """Apply filter to the image and returns modified image.
+        Per-sheet state must go into the given SheetContext, as one instance is shared by concurrent sheets
+        """
         raise NotImplementedError
 
     @staticmethod
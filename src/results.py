@@ -0,0 +1,280 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+from time import localtime, strftime
+from uuid import uuid4
+
+from src.constants import SHEET_STATUSES_FILENAME
+from src.logger import logger
+from src.utils.columnar import COLUMNAR_FORMATS, ColumnarWriter
+
+
+def get_score(score):
+    """The CSVs hold "NA" for sheets without a score"""
+    return None if score == "NA" else float(score)
+
+
+class ColumnarResults:
+    """
+    Writes the results of all sheets of a directory to one parquet or Arrow IPC file next to the
+    results CSV, with the status of each sheet and its score as a number.
+
+    The input directory is written as a column on each row, so that the files of many directories
+    (and runs) can be loaded together as one partitioned dataset.
+    """
+
+    def __init__(self, curr_dir, outputs_namespace, columnar_options):
+        self.directory = str(curr_dir)
+        self.buffer_rows = columnar_options.buffer_rows
+        self.rows = []
+        columns = [
+            ("directory", "string"),
+            ("status", "string"),
+            ("file_id", "string"),
+            ("input_path", "string"),
+            ("output_path", "string"),
+            ("score", "float"),
+        ] + [(column, "string") for column in outputs_namespace.output_columns]
+        self.writer = ColumnarWriter(
+            self.get_path(outputs_namespace, columnar_options.format),
+            columns,
+            columnar_options.format,
+        )
+        logger.info(f"Writing columnar results to '{self.writer.path}'")
+
+    @staticmethod
+    def get_path(outputs_namespace, columnar_format):
+        # Unlike CSVs these files cannot be appended to, so each run writes a new one
+        csv_path = Path(outputs_namespace.filesMap["Results"])
+        extension = COLUMNAR_FORMATS[columnar_format]
+        path, run = csv_path.with_suffix(extension), 1
+        while path.exists():
+            path = csv_path.with_name(f"{csv_path.stem}_{run}{extension}")
+            run += 1
+        return path
+
+    def append(self, status, sheet_line):
+        file_id, input_path, output_path, score, *resp_array = sheet_line
+        self.rows.append(
+            (
+                self.directory,
+                status,
+                str(file_id),
+                str(input_path),
+                str(output_path),
+                get_score(score),
+                *resp_array,
+            )
+        )
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        self.writer.write_rows(rows)
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_input_path_hash(input_path):
+    return hashlib.sha1(os.path.abspath(input_path).encode()).hexdigest()
+
+
+def new_run_id():
+    return f"{strftime('%Y%m%d-%H%M%S', localtime())}-{uuid4().hex[:8]}"
+
+
+class SqliteResults:
+    """
+    Writes the results of the sheets of a directory into an SQLite database, which collects the
+    sheets of every run (and directory) written to it.
+
+    Sheets are inserted batch_size at a time, in one transaction per batch, into a WAL journaled
+    database so that it can be queried while a run is writing. The sheets table is indexed on
+    the run id, the file id, the hash of the input path and the template columns in index_columns,
+    which are stored in columns of their own. All template columns are also kept as a json object.
+    """
+
+    TABLE_COLUMNS = [
+        ("run_id", "TEXT NOT NULL"),
+        ("directory", "TEXT"),
+        ("status", "TEXT"),
+        ("file_id", "TEXT"),
+        ("input_path", "TEXT"),
+        ("input_path_hash", "TEXT"),
+        ("output_path", "TEXT"),
+        ("score", "REAL"),
+        ("responses", "TEXT"),
+    ]
+    INDEXED_COLUMNS = ["run_id", "file_id", "input_path_hash"]
+
+    def __init__(
+        self, curr_dir, outputs_namespace, sqlite_options, run_id, root_output_dir
+    ):
+        self.directory = str(curr_dir)
+        # Directories collected outside of process_dir are recorded as runs of their own
+        self.run_id = run_id or new_run_id()
+        self.batch_size = sqlite_options.batch_size
+        self.rows = []
+        self.output_columns = outputs_namespace.output_columns
+        # SQLite column names are case-insensitive
+        table_columns = {column.lower() for column, _ in self.TABLE_COLUMNS}
+        self.index_columns = []
+        for column in sqlite_options.index_columns:
+            if column not in self.output_columns:
+                logger.warning(
+                    f"Not indexing '{column}' in the results database as the template of '{curr_dir}' has no such column"
+                )
+            elif column.lower() in table_columns:
+                logger.warning(
+                    f"Not indexing '{column}' in the results database as the sheets table has a column of the same name"
+                )
+            else:
+                table_columns.add(column.lower())
+                self.index_columns.append(column)
+
+        # One database collects the sheets of every directory of the run
+        self.path = Path(root_output_dir).joinpath(sqlite_options.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Writing results to the database '{self.path}'")
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Only a power loss can lose the last transactions with WAL, never corrupt the database
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.setup_tables()
+        columns = [column for column, _ in self.TABLE_COLUMNS] + self.index_columns
+        self.insert_sql = (
+            f"INSERT INTO sheets ({', '.join(map(quote_identifier, columns))}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+
+    def setup_tables(self):
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS sheets ({', '.join(f'{column} {column_type}' for column, column_type in self.TABLE_COLUMNS)})"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started_at TEXT)"
+            )
+            self.connection.execute(
+                "INSERT OR IGNORE INTO runs VALUES (?, ?)",
+                (self.run_id, strftime("%Y-%m-%d %H:%M:%S", localtime())),
+            )
+            existing_columns = {
+                row[1].lower()
+                for row in self.connection.execute("PRAGMA table_info(sheets)")
+            }
+            for column in self.index_columns:
+                if column.lower() not in existing_columns:
+                    self.connection.execute(
+                        f"ALTER TABLE sheets ADD COLUMN {quote_identifier(column)} TEXT"
+                    )
+            for column in self.INDEXED_COLUMNS + self.index_columns:
+                index_name = "sheets_by_" + re.sub(r"\W", "_", column)
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote_identifier(index_name)} ON sheets ({quote_identifier(column)})"
+                )
+
+    def append(self, status, sheet_line):
+        file_id, input_path, output_path, score, *resp_array = sheet_line
+        responses = dict(zip(self.output_columns, resp_array))
+        self.rows.append(
+            (
+                self.run_id,
+                self.directory,
+                status,
+                str(file_id),
+                str(input_path),
+                get_input_path_hash(input_path),
+                str(output_path),
+                get_score(score),
+                json.dumps(responses),
+                *(responses[column] for column in self.index_columns),
+            )
+        )
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        if rows:
+            with self.connection:
+                self.connection.executemany(self.insert_sql, rows)
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+class SheetStatuses:
+    """
+    Records the status of each sheet by its input path, next to the outputs of a directory.
+    The API reads it to tell the multi-marked sheets kept in the results CSV from the others.
+    """
+
+    def __init__(self, outputs_namespace):
+        self.file = open(
+            Path(outputs_namespace.paths.output_dir, SHEET_STATUSES_FILENAME), "a"
+        )
+
+    def append(self, status, sheet_line):
+        self.file.write(
+            json.dumps({"input_path": str(sheet_line[1]), "status": status}) + "\n"
+        )
+
+    def close(self):
+        self.file.close()
+
+
+def setup_results_sinks(
+    curr_dir,
+    outputs_namespace,
+    tuning_config,
+    run_id,
+    root_output_dir,
+    sheet_statuses=False,
+):
+    """Adds the configured writers of sheet results other than the CSVs to the outputs of a directory"""
+    outputs_namespace.results_sinks = []
+    if sheet_statuses:
+        outputs_namespace.results_sinks.append(SheetStatuses(outputs_namespace))
+    columnar_options = tuning_config.outputs.columnar_results
+    if columnar_options.format != "none":
+        outputs_namespace.results_sinks.append(
+            ColumnarResults(curr_dir, outputs_namespace, columnar_options)
+        )
+    sqlite_options = tuning_config.outputs.sqlite_results
+    if sqlite_options.enabled:
+        outputs_namespace.results_sinks.append(
+            SqliteResults(
+                curr_dir, outputs_namespace, sqlite_options, run_id, root_output_dir
+            )
+        )
+
+
+def append_sheet_results(outputs_namespace, status, sheet_line):
+    for results_sink in outputs_namespace.results_sinks:
+        results_sink.append(status, sheet_line)
+
+
+def close_results_sinks(outputs_namespace):
+    for results_sink in outputs_namespace.results_sinks:
+        results_sink.close()
+    outputs_namespace.results_sinks = []
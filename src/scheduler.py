@@ -0,0 +1,81 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import os
+
+# Results are handed over in input order, so at most this many sheets per worker
+# are started ahead of the next sheet to hand over
+LOOKAHEAD_SHEETS_PER_WORKER = 8
+
+
+class DirectoryJob:
+    """Class to hold the sheets of one input directory along with the context that applies to them.
+    One instance for each directory with images in the input tree."""
+
+    def __init__(
+        self,
+        curr_dir,
+        omr_files,
+        template,
+        tuning_config,
+        evaluation_config,
+        outputs_namespace,
+    ):
+        self.curr_dir = curr_dir
+        self.omr_files = omr_files
+        self.template = template
+        self.tuning_config = tuning_config
+        self.evaluation_config = evaluation_config
+        self.outputs_namespace = outputs_namespace
+
+    def __str__(self):
+        return str(self.curr_dir)
+
+
+class SheetJob:
+    """A single sheet to read, with a reference to the directory job it belongs to"""
+
+    def __init__(self, directory_job, files_counter, file_path):
+        self.directory_job = directory_job
+        # position of the sheet within its directory, starting from 1
+        self.files_counter = files_counter
+        self.file_path = file_path
+        self.file_size = os.path.getsize(file_path)
+
+
+def build_job_graph(directory_jobs):
+    """Flattens the directory jobs into sheet jobs, in the order their outputs are written"""
+    return [
+        SheetJob(directory_job, files_counter, file_path)
+        for directory_job in directory_jobs
+        for files_counter, file_path in enumerate(directory_job.omr_files, start=1)
+    ]
+
+
+def get_schedule(sheet_jobs, window=None):
+    """
+    Returns the order to start the sheet jobs in across workers.
+
+    Larger files take longer to decode and warp, so they are started first
+    (longest processing time first). This keeps the workers busy till the end
+    instead of leaving one big sheet from the last directory to run alone.
+    Ties keep the input order so that the schedule is deterministic.
+
+    With a window, the sheets are reordered only within consecutive groups of
+    that many sheets, so that no sheet starts a window or more ahead of an
+    earlier sheet that has not started yet.
+    """
+    window = window or len(sheet_jobs) or 1
+    return [
+        sheet_job
+        for start in range(0, len(sheet_jobs), window)
+        for sheet_job in sorted(
+            sheet_jobs[start : start + window],
+            key=lambda sheet_job: -sheet_job.file_size,
+        )
+    ]
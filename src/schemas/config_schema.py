@@ -42,6 +42,13 @@ CONFIG_SCHEMA = {
                 "thickness": {"type": "integer", "minimum": 1, "maximum": 10},
             },
         },
+        "processing_params": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "intra_sheet_threads": {"type": "integer", "minimum": 1, "maximum": 64},
+            },
+        },
         "outputs": {
             "type": "object",
             "additionalProperties": False,
@@ -49,8 +56,90 @@ CONFIG_SCHEMA = {
                 "show_image_level": {"type": "integer", "minimum": 0, "maximum": 6},
                 "save_image_level": {"type": "integer", "minimum": 0, "maximum": 6},
                 "save_detections": {"type": "boolean"},
+                # This option records how to draw the marked images instead of saving them, see render_marked.py
+                "deferred_rendering": {"type": "boolean"},
                 # This option moves multimarked files into a separate folder for manual checking, skipping evaluation
                 "filter_out_multimarked_files": {"type": "boolean"},
+                # These options set how the marked images and image stacks are encoded and written
+                "image_writer": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "properties": {
+                        "threads": {"type": "integer", "minimum": 0},
+                        "queue_size": {"type": "integer", "minimum": 1},
+                        "format": {
+                            "type": "string",
+                            "enum": ["same", "jpg", "png", "webp"],
+                        },
+                        "jpeg_quality": {
+                            "type": "integer",
+                            "minimum": 0,
+                            "maximum": 100,
+                        },
+                        "png_compression": {
+                            "type": "integer",
+                            "minimum": 0,
+                            "maximum": 9,
+                        },
+                        "webp_quality": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": 100,
+                        },
+                        "scale": {
+                            "type": "number",
+                            "exclusiveMinimum": 0,
+                            "maximum": 1,
+                        },
+                    },
+                },
+                # This option appends the output files of each directory to a few archive files with an index
+                "archive": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "properties": {
+                        "format": {"type": "string", "enum": ["none", "zip", "tar"]},
+                        "shard_size_mb": {"type": "integer", "minimum": 1},
+                    },
+                },
+                # This option writes the results of a directory to a columnar file along with the CSVs
+                "columnar_results": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "properties": {
+                        "format": {
+                            "type": "string",
+                            "enum": ["none", "parquet", "arrow"],
+                        },
+                        "buffer_rows": {"type": "integer", "minimum": 1},
+                    },
+                },
+                # This option writes the results of each run to an SQLite database, indexed on the given template columns
+                "sqlite_results": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "properties": {
+                        "enabled": {"type": "boolean"},
+                        "path": {"type": "string"},
+                        "batch_size": {"type": "integer", "minimum": 1},
+                        "index_columns": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                        },
+                    },
+                },
+                # This option sets the format of the log of evaluation explanations and how many rows it buffers
+                "explanation_log": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "properties": {
+                        "format": {
+                            "type": "string",
+                            "enum": ["csv", "parquet", "arrow"],
+                        },
+                        "buffer_rows": {"type": "integer", "minimum": 1},
+                    },
+                },
             },
         },
     },
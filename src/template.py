@@ -21,6 +21,8 @@ class Template:
     def __init__(self, template_path, tuning_config):
         self.path = template_path
         self.image_instance_ops = ImageInstanceOps(tuning_config)
+        # outlines of the field blocks for draw_template_layout, drawn on first use
+        self.layout_layers = {}
 
         json_object = open_template_with_defaults(template_path)
         (
@@ -205,6 +207,14 @@ class Template:
                 f"Overflowing field block '{block_name}' with origin {block_instance.origin} and dimensions {block_instance.dimensions} in template with dimensions {self.page_dimensions}"
             )
 
+    @property
+    def bubble_count(self):
+        return sum(
+            len(field_block_bubbles)
+            for field_block in self.field_blocks
+            for field_block_bubbles in field_block.traverse_bubbles
+        )
+
     def __str__(self):
         return str(self.path)
 
@@ -212,7 +222,6 @@ class Template:
 class FieldBlock:
     def __init__(self, block_name, field_block_object):
         self.name = block_name
-        self.shift = 0
         self.setup_field_block(field_block_object)
 
     def setup_field_block(self, field_block_object):
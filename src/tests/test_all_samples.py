@@ -1,7 +1,9 @@
+import json
 import os
 import shutil
 from glob import glob
 
+from src.defaults import CONFIG_DEFAULTS
 from src.tests.utils import run_entry_point, setup_mocker_patches
 
 
@@ -10,7 +12,7 @@ def read_file(path):
         return file.read()
 
 
-def run_sample(mocker, sample_path):
+def run_sample(mocker, sample_path, **extra_args):
     setup_mocker_patches(mocker)
 
     input_path = os.path.join("samples", sample_path)
@@ -20,7 +22,7 @@ def run_sample(mocker, sample_path):
             f"Warning: output directory already exists: {output_dir}. This may affect the test execution."
         )
 
-    run_entry_point(input_path, output_dir)
+    run_entry_point(input_path, output_dir, **extra_args)
 
     sample_outputs = extract_sample_outputs(output_dir)
 
@@ -110,3 +112,51 @@ def test_run_community_UmarFarootAPS(mocker, snapshot):
 def test_run_community_UPSC_mock(mocker, snapshot):
     sample_outputs = run_sample(mocker, "community/UPSC-mock")
     assert snapshot == sample_outputs
+
+
+def test_run_threads_match_sequential(mocker):
+    # Sheets from all sub-directories are scheduled on one pool
+    sequential_outputs = run_sample(mocker, "community")
+    threaded_outputs = run_sample(mocker, "community", threads=4)
+    assert threaded_outputs == sequential_outputs
+
+
+def test_run_processes_match_sequential(mocker):
+    sequential_outputs = run_sample(mocker, "community")
+    shared_memory_outputs = run_sample(mocker, "community", processes=2)
+    assert shared_memory_outputs == sequential_outputs
+
+
+def test_run_memory_limit_matches_sequential(mocker):
+    # A ceiling below the reader's own footprint holds back every new sheet
+    sequential_outputs = run_sample(mocker, "community")
+    limited_outputs = run_sample(mocker, "community", threads=2, memoryLimit=1)
+    assert limited_outputs == sequential_outputs
+
+
+def test_run_tuned_workers_match_sequential(mocker):
+    sequential_outputs = run_sample(mocker, "community")
+    tuned_outputs = run_sample(mocker, "community", threads=2, tuneWorkers=True)
+    assert tuned_outputs == sequential_outputs
+
+
+def test_run_intra_sheet_threads_match_sequential(mocker):
+    sequential_outputs = run_sample(mocker, "community")
+    mocker.patch.dict(CONFIG_DEFAULTS.processing_params, {"intra_sheet_threads": 4})
+    intra_sheet_outputs = run_sample(mocker, "community")
+    assert intra_sheet_outputs == sequential_outputs
+
+
+def test_run_trace_records_stages(mocker, tmp_path):
+    trace_path = tmp_path.joinpath("trace.json")
+    run_sample(mocker, "community", processes=2, trace=str(trace_path))
+    with open(trace_path) as f:
+        stages = {event["name"] for event in json.load(f)["traceEvents"]}
+    assert {
+        "decode",
+        "sheet",
+        "preprocess.CropOnMarkers",
+        "read_bubbles",
+        "threshold",
+        "write_outputs",
+    } <= stages
@@ -0,0 +1,88 @@
+import json
+import shutil
+from pathlib import Path
+
+import src.annotations
+from src.annotations import (
+    AnnotationRenderer,
+    load_annotation_records,
+    render_deferred_outputs,
+)
+from src.tests.test_all_samples import extract_sample_outputs
+from src.tests.utils import run_entry_point, setup_mocker_patches
+
+
+def test_deferred_rendering_matches_inline_rendering(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    input_dir = tmp_path.joinpath("inputs")
+    shutil.copytree(Path("samples", "answer-key", "using-csv"), input_dir)
+    inline_dir = tmp_path.joinpath("inline")
+    deferred_dir = tmp_path.joinpath("deferred")
+    run_entry_point(str(input_dir), str(inline_dir))
+
+    input_dir.joinpath("config.json").write_text(
+        json.dumps({"outputs": {"deferred_rendering": True}})
+    )
+    run_entry_point(str(input_dir), str(deferred_dir))
+
+    inline_images = sorted(inline_dir.joinpath("CheckedOMRs").glob("*.png"))
+    annotations_path = deferred_dir.joinpath("CheckedOMRs", "annotations.jsonl")
+    assert len(inline_images) > 0
+    assert not list(deferred_dir.joinpath("CheckedOMRs").glob("*.png"))
+    assert sorted(load_annotation_records(annotations_path)) == [
+        image_path.name for image_path in inline_images
+    ]
+    assert {
+        path: outputs.replace(str(deferred_dir), str(inline_dir))
+        for path, outputs in extract_sample_outputs(deferred_dir).items()
+    } == extract_sample_outputs(inline_dir)
+
+    image_paths = render_deferred_outputs(deferred_dir)
+    assert [image_path.name for image_path in image_paths] == [
+        image_path.name for image_path in inline_images
+    ]
+    for image_path in inline_images:
+        deferred_image_path = deferred_dir.joinpath("CheckedOMRs", image_path.name)
+        assert deferred_image_path.read_bytes() == image_path.read_bytes()
+
+    # Images already drawn are kept
+    assert render_deferred_outputs(deferred_dir) == []
+
+
+def test_annotation_renderer_caches(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    input_dir = tmp_path.joinpath("inputs")
+    shutil.copytree(Path("samples", "sample4"), input_dir)
+    input_dir.joinpath("config.json").write_text(
+        json.dumps({"outputs": {"deferred_rendering": True}})
+    )
+    output_dir = tmp_path.joinpath("outputs")
+    run_entry_point(str(input_dir), str(output_dir))
+    save_marked_dir = output_dir.joinpath("CheckedOMRs")
+
+    load_records = mocker.spy(src.annotations, "load_annotation_records")
+    renderer = AnnotationRenderer(cache_size=1)
+    image_names = sorted(renderer.get_sheets(save_marked_dir))
+    assert len(image_names) == 3
+    for image_name in image_names:
+        assert renderer.render_image(save_marked_dir.joinpath(image_name))
+    assert not renderer.render_image(save_marked_dir.joinpath("unknown.jpg"))
+    # The annotations file is read once, and the template built once
+    assert load_records.call_count == 1
+    assert len(renderer.templates) == 1 and len(renderer.indexes) == 1
+
+    # Only the most recently used template is kept
+    _, _, _, directory_record, _ = renderer.get_sheets(save_marked_dir)[image_names[0]]
+    template = renderer.get_template(directory_record)
+    template_copy_path = input_dir.joinpath("template_copy.json")
+    shutil.copy(input_dir.joinpath("template.json"), template_copy_path)
+    renderer.get_template(
+        {**directory_record, "template_path": str(template_copy_path)}
+    )
+    assert template not in renderer.templates.values()
+    assert len(renderer.templates) == 1
+
+    renderer.forget(output_dir)
+    assert len(renderer.indexes) == 0
+    renderer.forget(input_dir)
+    assert len(renderer.templates) == 0
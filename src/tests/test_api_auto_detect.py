@@ -0,0 +1,26 @@
+import cv2
+import numpy as np
+import pytest
+
+
+def test_auto_detect_blank_and_invalid_images(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import server
+
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    client = TestClient(server.app)
+    _, blank = cv2.imencode(".png", np.full((800, 600), 255, np.uint8))
+    response = client.post(
+        "/api/auto-detect", files={"image": ("blank.png", blank.tobytes())}
+    )
+    assert response.status_code == 200
+    assert response.json()["template"]["fieldBlocks"] == {}
+
+    response = client.post(
+        "/api/auto-detect", files={"image": ("broken.png", b"not an image")}
+    )
+    assert response.status_code == 400
+    # Only the job of the blank image is kept
+    assert len(list(tmp_path.iterdir())) == 1
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+import pytest
+
+
+def test_layout_preview_reuses_the_parsed_template(mocker, tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import server
+
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    sample_dir = Path("samples", "sample1")
+    template_json = json.loads(sample_dir.joinpath("template.json").read_text())
+    client = TestClient(server.app)
+    response = client.post(
+        "/api/layout-preview",
+        files=[
+            (
+                "image",
+                (
+                    "sheet1.jpg",
+                    sample_dir.joinpath("MobileCamera", "sheet1.jpg").read_bytes(),
+                ),
+            ),
+            ("template", ("template.json", json.dumps(template_json))),
+            (
+                "assets",
+                ("omr_marker.jpg", sample_dir.joinpath("omr_marker.jpg").read_bytes()),
+            ),
+        ],
+    )
+    preview_id = response.json()["preview_id"]
+
+    new_template = mocker.spy(server, "Template")
+    first = client.post(f"/api/layout-preview/{preview_id}", json=template_json)
+    second = client.post(f"/api/layout-preview/{preview_id}", json=template_json)
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert new_template.call_count == 0
+
+    next(iter(template_json["fieldBlocks"].values()))["origin"][0] += 10
+    edited = client.post(f"/api/layout-preview/{preview_id}", json=template_json)
+    assert edited.status_code == 200 and edited.content != first.content
+    assert new_template.call_count == 1
@@ -0,0 +1,67 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src.tests.utils import run_entry_point, setup_mocker_patches
+
+
+def test_results_status_of_multi_marked_sheets(mocker, tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import server
+
+    setup_mocker_patches(mocker)
+    input_dir = tmp_path.joinpath("inputs")
+    for sample in ["sample1", "sample4"]:
+        shutil.copytree(Path("samples", sample), input_dir.joinpath(sample))
+    # The default outputs keep the multi-marked sheets of sample4 in its results CSV
+    config_path = input_dir.joinpath("sample4", "config.json")
+    config = json.loads(config_path.read_text())
+    del config["outputs"]
+    config_path.write_text(json.dumps(config))
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path.joinpath("uploads"))
+    # As set by /api/process
+    run_entry_point(
+        str(input_dir),
+        str(tmp_path.joinpath("uploads", "job", "outputs")),
+        sheetStatuses=True,
+    )
+
+    client = TestClient(server.app)
+    records = client.get("/api/results/job").json()["records"]
+    assert {(record["directory"], record["status"]) for record in records} == {
+        ("sample1/MobileCamera", "ok"),
+        ("sample4", "multi_marked"),
+    }
+
+    multi_marked = client.get("/api/results/job?status=multi_marked").json()
+    assert multi_marked["total"] == 3
+    assert {record["directory"] for record in multi_marked["records"]} == {"sample4"}
+    ok = client.get("/api/results/job?status=ok").json()
+    assert [record["directory"] for record in ok["records"]] == ["sample1/MobileCamera"]
+
+
+def test_process_links_the_results_csv(mocker, tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import server
+
+    setup_mocker_patches(mocker)
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    sample_dir = Path("samples", "sample4")
+    files = [
+        ("images", (image_path.name, image_path.read_bytes()))
+        for image_path in sorted(sample_dir.glob("*.jpg"))
+    ] + [
+        (name, (f"{name}.json", sample_dir.joinpath(f"{name}.json").read_bytes()))
+        for name in ["template", "config", "evaluation"]
+    ]
+    response = TestClient(server.app).post("/api/process", files=files).json()
+    # The explanation log is also a CSV in the outputs
+    output_dir = Path(response["output_path"])
+    assert output_dir.joinpath("Evaluation", "Explanations.csv").exists()
+    assert response["csv_file"].startswith("Results/Results_")
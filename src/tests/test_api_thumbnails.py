@@ -0,0 +1,64 @@
+import json
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from src.tests.utils import run_entry_point, setup_mocker_patches
+
+
+def test_thumbnails_of_same_named_images(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import server
+
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    output_dir = tmp_path.joinpath("job", "outputs")
+    output_dir.mkdir(parents=True)
+    for name, value in [("a.jpg", 0), ("a.png", 255)]:
+        cv2.imwrite(str(output_dir.joinpath(name)), np.full((40, 40), value, np.uint8))
+
+    client = TestClient(server.app)
+    thumbnails = {}
+    for name in ["a.jpg", "a.png"]:
+        response = client.get(f"/api/thumbnail/job/{name}")
+        assert response.status_code == 200
+        thumbnails[name] = cv2.imdecode(
+            np.frombuffer(response.content, np.uint8), cv2.IMREAD_GRAYSCALE
+        )
+    assert thumbnails["a.jpg"].mean() < 10 and thumbnails["a.png"].mean() > 245
+
+
+def test_thumbnails_of_archived_images(mocker, tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from api import server
+
+    setup_mocker_patches(mocker)
+    monkeypatch.setattr(server, "UPLOAD_DIR", tmp_path)
+    input_dir = tmp_path.joinpath("inputs")
+    shutil.copytree(Path("samples", "answer-key", "using-csv"), input_dir)
+    input_dir.joinpath("config.json").write_text(
+        json.dumps({"outputs": {"archive": {"format": "zip"}}})
+    )
+    output_dir = tmp_path.joinpath("job", "outputs")
+    run_entry_point(str(input_dir), str(output_dir))
+    assert not list(output_dir.joinpath("CheckedOMRs").glob("*.*"))
+
+    client = TestClient(server.app)
+    response = client.get("/api/thumbnail/job/CheckedOMRs/adrian_omr.png")
+    assert response.status_code == 200
+    thumbnail = cv2.imdecode(
+        np.frombuffer(response.content, np.uint8), cv2.IMREAD_COLOR
+    )
+    assert thumbnail.shape[1] == server.THUMBNAIL_SIZES["small"]
+
+    cached = client.get(
+        "/api/thumbnail/job/CheckedOMRs/adrian_omr.png",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert cached.status_code == 304
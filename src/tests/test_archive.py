@@ -0,0 +1,53 @@
+import json
+import shutil
+import tarfile
+import zipfile
+from pathlib import Path
+
+from src.archive import find_archived_file, load_archive_index, read_archived_file
+from src.tests.utils import run_entry_point, setup_mocker_patches
+
+
+def run_sample(tmp_path, name, outputs_config):
+    input_dir = tmp_path.joinpath(name, "inputs")
+    shutil.copytree(Path("samples", "answer-key", "using-csv"), input_dir)
+    output_dir = tmp_path.joinpath(name, "outputs")
+    input_dir.joinpath("config.json").write_text(
+        json.dumps({"outputs": outputs_config})
+    )
+    run_entry_point(str(input_dir), str(output_dir))
+    return input_dir, output_dir
+
+
+def test_outputs_packed_into_archives(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    _, inline_dir = run_sample(tmp_path, "inline", {})
+    inline_files = {
+        path.relative_to(inline_dir).as_posix(): path.read_bytes()
+        for path in inline_dir.joinpath("CheckedOMRs").glob("*.*")
+    }
+    assert inline_files
+
+    for archive_format, open_archive in [
+        ("tar", tarfile.open),
+        ("zip", zipfile.ZipFile),
+    ]:
+        _, output_dir = run_sample(
+            tmp_path, archive_format, {"archive": {"format": archive_format}}
+        )
+        assert not list(output_dir.joinpath("CheckedOMRs").glob("*.*"))
+        archive_dir = output_dir.joinpath("Archive")
+        entries = load_archive_index(archive_dir)
+        assert set(inline_files) <= set(entries)
+        for name, data in inline_files.items():
+            assert read_archived_file(archive_dir, entries[name]) == data
+            assert find_archived_file(output_dir.joinpath(name)) == data
+
+        # The shards are regular archives
+        with open_archive(
+            archive_dir.joinpath(f"outputs-00000.{archive_format}")
+        ) as archive:
+            names = (
+                archive.getnames() if archive_format == "tar" else archive.namelist()
+            )
+        assert sorted(names) == sorted(entries)
@@ -0,0 +1,77 @@
+import csv
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src.defaults import CONFIG_DEFAULTS
+from src.explanations import ExplanationLogs
+from src.tests.utils import run_entry_point, setup_mocker_patches
+
+
+def run_sample4(tmp_path, name, outputs_config, **extra_args):
+    input_dir = tmp_path.joinpath(name, "inputs")
+    shutil.copytree(Path("samples", "sample4"), input_dir)
+    config = json.loads(input_dir.joinpath("config.json").read_text())
+    config["outputs"] = {**config.get("outputs", {}), **outputs_config}
+    input_dir.joinpath("config.json").write_text(json.dumps(config))
+    output_dir = tmp_path.joinpath(name, "outputs")
+    run_entry_point(str(input_dir), str(output_dir), **extra_args)
+    return output_dir.joinpath("Evaluation")
+
+
+def read_rows(evaluation_dir):
+    with open(evaluation_dir.joinpath("Explanations.csv"), newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_explanation_log_from_workers(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    expected_rows = read_rows(run_sample4(tmp_path, "inline", {}))
+    # A small buffer flushes the rows of each sheet separately
+    evaluation_dir = run_sample4(
+        tmp_path,
+        "workers",
+        {"explanation_log": {"buffer_rows": 5}},
+        processes=2,
+    )
+
+    assert [path.name for path in evaluation_dir.iterdir()] == ["Explanations.csv"]
+    rows = read_rows(evaluation_dir)
+    # Sheets are logged in the order they are done
+    assert sorted(rows, key=lambda row: row["file"]) == expected_rows
+    assert len(rows) == 3 * 11
+    sheet_rows = [row for row in rows if row["file"] == "IMG_20201116_150750830.jpg"]
+    assert [float(row["score"]) for row in sheet_rows][-1] == -2.0
+
+
+def test_parquet_explanation_log(mocker, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    setup_mocker_patches(mocker)
+    expected_rows = read_rows(run_sample4(tmp_path, "csv", {}))
+    evaluation_dir = run_sample4(
+        tmp_path, "parquet", {"explanation_log": {"format": "parquet"}}
+    )
+
+    table = pq.read_table(evaluation_dir.joinpath("Explanations.parquet"))
+    assert table.column_names == list(expected_rows[0])
+    assert table.column("score").to_pylist() == [
+        float(row["score"]) for row in expected_rows
+    ]
+
+
+def test_explanation_rows_for_unopened_log(tmp_path):
+    log_options = CONFIG_DEFAULTS.outputs.explanation_log
+    worker_logs = ExplanationLogs()
+    # As in a forked worker, the rows are kept to hand over to the main process
+    worker_logs.pid = None
+    row = ("a.jpg", "q1", "A", "A", "correct", 1.0, 1.0, "")
+    worker_logs.append(tmp_path, [row], log_options)
+    assert list(tmp_path.iterdir()) == []
+
+    # The main process opens the log on the first rows of its directory
+    logs = ExplanationLogs()
+    logs.extend(worker_logs.drain())
+    logs.close()
+    assert [row["question"] for row in read_rows(tmp_path)] == ["q1"]
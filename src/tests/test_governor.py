@@ -0,0 +1,12 @@
+from src.governor import ResourceGovernor
+
+
+def test_shown_images_keep_one_worker(mocker):
+    read_sheet_job = mocker.Mock()
+    governor = ResourceGovernor(threads=4, interactive=True)
+    assert governor.get_workers() == 1
+
+    # Tuning cannot raise the workers again
+    governor.tune(list(range(8)), read_sheet_job)
+    assert governor.get_workers() == 1
+    assert read_sheet_job.call_count == 0
@@ -0,0 +1,67 @@
+import json
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+from dotmap import DotMap
+
+from src.defaults import CONFIG_DEFAULTS
+from src.image_writer import IMAGE_WRITER
+from src.tests.utils import run_entry_point, setup_mocker_patches
+
+
+def test_marked_images_in_configured_format(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    input_dir = tmp_path.joinpath("inputs")
+    shutil.copytree(Path("samples", "answer-key", "using-csv"), input_dir)
+    output_dir = tmp_path.joinpath("outputs")
+    input_dir.joinpath("config.json").write_text(
+        json.dumps(
+            {
+                "outputs": {
+                    "image_writer": {"threads": 2, "format": "webp", "scale": 0.5}
+                }
+            }
+        )
+    )
+    run_entry_point(str(input_dir), str(output_dir))
+
+    input_images = sorted(input_dir.glob("*.png"))
+    marked_images = sorted(output_dir.joinpath("CheckedOMRs").glob("*.webp"))
+    assert [image_path.name for image_path in marked_images] == [
+        image_path.with_suffix(".webp").name for image_path in input_images
+    ]
+    height, width = cv2.imread(str(marked_images[0])).shape[:2]
+    page_width, page_height = json.loads(
+        input_dir.joinpath("template.json").read_text()
+    )["pageDimensions"]
+    assert (width, height) == (page_width // 2, page_height // 2)
+
+    results = next(output_dir.joinpath("Results").glob("*.csv")).read_text()
+    assert all(str(image_path) in results for image_path in marked_images)
+    assert sum(size for _, size, _ in IMAGE_WRITER.totals.values()) == sum(
+        image_path.stat().st_size for image_path in marked_images
+    )
+
+
+def test_queued_writes_are_all_written(tmp_path):
+    image_options = DotMap(
+        {**CONFIG_DEFAULTS.outputs.image_writer.toDict(), "queue_size": 1},
+        _dynamic=False,
+    )
+    image = np.full((50, 80), 200, np.uint8)
+    IMAGE_WRITER.reset()
+    image_paths = [
+        IMAGE_WRITER.write(
+            str(tmp_path.joinpath(f"{index}.png")), image, image_options, sheet=index
+        )
+        for index in range(20)
+    ]
+    IMAGE_WRITER.flush()
+
+    assert all(
+        (cv2.imread(path, cv2.IMREAD_GRAYSCALE) == 200).all() for path in image_paths
+    )
+    assert IMAGE_WRITER.totals["marked"][0] == 20
+    assert IMAGE_WRITER.get_summary()[-1][0] == "Image writes per sheet"
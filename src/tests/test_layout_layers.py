@@ -0,0 +1,68 @@
+import random
+from pathlib import Path
+
+import numpy as np
+
+from src import constants
+from src.core import ImageInstanceOps
+from src.defaults import CONFIG_DEFAULTS
+from src.template import Template
+
+
+def test_layout_layers_draw_like_each_bubble(monkeypatch):
+    rng = random.Random(0)
+    for sample in ["sample1", "community/UmarFarootAPS"]:
+        template = Template(Path("samples", sample, "template.json"), CONFIG_DEFAULTS)
+        width, height = template.page_dimensions
+        img = np.random.default_rng(0).integers(0, 256, (height, width), np.uint8)
+        for border in [-1, 3]:
+            # Large shifts move blocks past the edges of the page
+            for max_shift in [0, 20, width]:
+                shifts = {
+                    field_block.name: rng.randint(-max_shift, max_shift)
+                    for field_block in template.field_blocks
+                }
+                monkeypatch.setattr(constants, "LAYOUT_LAYER_MIN_BUBBLES", 10**9)
+                expected = ImageInstanceOps.draw_template_layout(
+                    img, template, border=border, shifts=shifts
+                )
+                monkeypatch.setattr(constants, "LAYOUT_LAYER_MIN_BUBBLES", 0)
+                actual = ImageInstanceOps.draw_template_layout(
+                    img, template, border=border, shifts=shifts
+                )
+                assert (actual == expected).all()
+        assert len(template.layout_layers) == 2 * len(template.field_blocks)
+
+
+def test_unmarked_bubble_layers_draw_like_each_bubble(monkeypatch):
+    rng = random.Random(0)
+    image_instance_ops = ImageInstanceOps(CONFIG_DEFAULTS)
+    for sample in ["sample1", "community/UmarFarootAPS"]:
+        template = Template(Path("samples", sample, "template.json"), CONFIG_DEFAULTS)
+        width, height = template.page_dimensions
+        img = np.random.default_rng(0).integers(0, 256, (height, width), np.uint8)
+        for max_shift in [0, 20, width]:
+            shifts = {
+                field_block.name: rng.randint(-max_shift, max_shift)
+                for field_block in template.field_blocks
+            }
+            marked_bubbles = {
+                field_block_bubbles[0].field_label: sorted(
+                    rng.sample(
+                        range(len(field_block_bubbles)),
+                        rng.randint(0, len(field_block_bubbles)),
+                    )
+                )
+                for field_block in template.field_blocks
+                for field_block_bubbles in field_block.traverse_bubbles
+            }
+            monkeypatch.setattr(constants, "LAYOUT_LAYER_MIN_BUBBLES", 10**9)
+            expected = image_instance_ops.render_marked_image(
+                img, template, shifts, marked_bubbles
+            )
+            monkeypatch.setattr(constants, "LAYOUT_LAYER_MIN_BUBBLES", 0)
+            actual = image_instance_ops.render_marked_image(
+                img, template, shifts, marked_bubbles
+            )
+            assert (actual == expected).all()
+        assert len(template.layout_layers) == len(template.field_blocks)
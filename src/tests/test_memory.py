@@ -0,0 +1,27 @@
+from src.memory import MAX_GROWTH_PER_SHEET, MEMORY_PROFILER
+from src.tests.test_all_samples import run_sample
+from src.tracing import TRACER
+
+
+def test_memory_profile_records_stages(mocker):
+    sequential_outputs = run_sample(mocker, "answer-key")
+    profiled_outputs = run_sample(mocker, "answer-key", processes=2, memoryProfile=True)
+    assert profiled_outputs == sequential_outputs
+    assert {"decode", "sheet", "read_bubbles", "threshold"} <= set(
+        MEMORY_PROFILER.stages
+    )
+    sheet_count = len(MEMORY_PROFILER.stages["sheet"])
+    assert sheet_count > 0 and len(MEMORY_PROFILER.retained) == sheet_count
+    assert all(peak >= 0 for peak, _ in MEMORY_PROFILER.stages["sheet"])
+
+
+def test_memory_growth_across_sheets_is_flagged():
+    leaked = []
+    MEMORY_PROFILER.enable()
+    try:
+        for _ in range(8):
+            with TRACER.span("sheet"):
+                leaked.append(bytearray(4 * MAX_GROWTH_PER_SHEET))
+    finally:
+        MEMORY_PROFILER.disable()
+    assert MEMORY_PROFILER.get_growth_per_sheet() > MAX_GROWTH_PER_SHEET
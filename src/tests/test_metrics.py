@@ -0,0 +1,38 @@
+from src.metrics import MetricsRegistry
+
+
+def test_render_counters_and_histograms():
+    registry = MetricsRegistry()
+    errors = registry.counter("errors_total", "Errors", ["error_code"])
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    errors.inc(error_code="NO_MARKER_ERR")
+    errors.inc(2, error_code="NO_MARKER_ERR")
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+
+    assert registry.render().splitlines() == [
+        "# HELP errors_total Errors",
+        "# TYPE errors_total counter",
+        'errors_total{error_code="NO_MARKER_ERR"} 3',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]
+
+
+def test_merge_drained_values():
+    # Values drained from a worker process add up in the main process
+    main_registry, worker_registry = MetricsRegistry(), MetricsRegistry()
+    for registry in (main_registry, worker_registry):
+        registry.counter("sheets_total", "Sheets").inc()
+        registry.histogram("score", "Score", buckets=(0.5,)).observe(0.7)
+
+    main_registry.merge(worker_registry.drain())
+
+    assert "sheets_total 2" in main_registry.render()
+    assert "score_count 2" in main_registry.render()
+    assert "sheets_total 0" in worker_registry.render()
@@ -0,0 +1,57 @@
+import csv
+
+from src.tests.utils import setup_mocker_patches
+from src.utils.parity import (
+    PARITY_MODES,
+    ParityHarness,
+    ParityMode,
+    diff_readings,
+    get_mode_template,
+    read_sheet,
+)
+from src.utils.synthetic import SyntheticSheetGenerator
+
+
+def test_modes_read_like_the_reference(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    synthetic_dir = tmp_path.joinpath("synthetic")
+    SyntheticSheetGenerator(
+        "samples/sample1/template.json", seed=5, warp=0.02, noise=8
+    ).generate(synthetic_dir, 2)
+    modes = [mode for name, mode in PARITY_MODES.items() if name != "reference"]
+    harness = ParityHarness(modes, tmp_path.joinpath("parity"))
+
+    assert harness.run(["samples/sample1", synthetic_dir]) == 0
+    assert harness.sheet_count == 3
+
+
+def test_mismatches_are_reported_with_images(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    output_dir = tmp_path.joinpath("parity")
+    jumpy_mode = ParityMode("jumpy", {"threshold_params": {"MIN_JUMP": 100}})
+    harness = ParityHarness([jumpy_mode], output_dir)
+
+    assert harness.run(["samples/sample1"]) == 1
+
+    with open(output_dir.joinpath("parity_report.csv")) as f:
+        rows = list(csv.DictReader(f))
+    assert {row["mode"] for row in rows} == {"jumpy"}
+    assert {"key": "q17", "reference": "A", "actual": "AC"}.items() <= next(
+        row for row in rows if row["kind"] == "response" and row["key"] == "q17"
+    ).items()
+    assert output_dir.joinpath("jumpy", "MobileCamera_sheet1.jpg").exists()
+
+
+def test_lean_read_matches_rendered_read(mocker):
+    setup_mocker_patches(mocker)
+    (directory_job,) = ParityHarness([], "outputs").collect_directory_jobs(
+        "samples/community/UmarFarootAPS"
+    )
+    template = get_mode_template(
+        directory_job.template, directory_job.tuning_config, PARITY_MODES["reference"]
+    )
+    for file_path in directory_job.omr_files:
+        lean_reading, lean_marked = read_sheet(file_path, template)
+        reading, marked = read_sheet(file_path, template, render_marked=True)
+        assert lean_marked is None and marked is not None
+        assert diff_readings(reading, lean_reading) == []
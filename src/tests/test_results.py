@@ -0,0 +1,124 @@
+import json
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.tests.utils import run_entry_point, setup_mocker_patches
+
+
+def run_sample4(tmp_path, outputs_config):
+    input_dir = tmp_path.joinpath("inputs")
+    if not input_dir.exists():
+        shutil.copytree(Path("samples", "sample4"), input_dir)
+    config = json.loads(input_dir.joinpath("config.json").read_text())
+    config["outputs"] = {**config.get("outputs", {}), **outputs_config}
+    input_dir.joinpath("config.json").write_text(json.dumps(config))
+    output_dir = tmp_path.joinpath("outputs")
+    run_entry_point(str(input_dir), str(output_dir))
+    return input_dir, output_dir.joinpath("Results")
+
+
+def test_columnar_results(mocker, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    setup_mocker_patches(mocker)
+    input_dir, results_dir = run_sample4(
+        tmp_path, {"columnar_results": {"format": "parquet", "buffer_rows": 2}}
+    )
+    results_csv = next(results_dir.glob("*.csv"))
+    expected = pd.read_csv(results_csv, dtype=str)
+    results = pd.read_parquet(results_csv.with_suffix(".parquet"))
+
+    assert results["score"].dtype == "float64"
+    assert results["score"].tolist() == expected["score"].astype(float).tolist()
+    assert (results["directory"] == str(input_dir)).all()
+    # All sheets of sample4 are multi-marked, and stay in the results CSV
+    assert (results["status"] == "multi_marked").all()
+    columns = list(expected.columns)
+    assert (
+        results[columns]
+        .drop(columns="score")
+        .equals(expected[columns].drop(columns="score").fillna(""))
+    )
+
+    run_sample4(tmp_path, {"columnar_results": {"format": "arrow"}})
+    with pa.ipc.open_file(results_csv.with_suffix(".arrow")) as f:
+        assert f.read_all().num_rows == len(results)
+    # Each run writes a new file
+    run_sample4(tmp_path, {"columnar_results": {"format": "parquet"}})
+    assert len(
+        pd.read_parquet(results_dir.joinpath(f"{results_csv.stem}_1.parquet"))
+    ) == len(results)
+
+
+def test_sqlite_results_across_runs(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    sqlite_config = {
+        "sqlite_results": {"enabled": True, "batch_size": 2, "index_columns": ["q1"]}
+    }
+    input_dir = tmp_path.joinpath("inputs")
+    shutil.copytree(Path("samples", "sample4"), input_dir)
+    run_sample4(tmp_path, sqlite_config)
+    run_entry_point(
+        str(input_dir), str(tmp_path.joinpath("outputs")), runId="second-run"
+    )
+    results_csv = next(tmp_path.joinpath("outputs", "Results").glob("*.csv"))
+    expected = pd.read_csv(results_csv, dtype=str)
+
+    connection = sqlite3.connect(tmp_path.joinpath("outputs", "results.sqlite"))
+    assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    run_ids = [run_id for run_id, in connection.execute("SELECT run_id FROM runs")]
+    assert len(run_ids) == 2 and run_ids[1] == "second-run"
+    rows = connection.execute(
+        "SELECT run_id, file_id, score, q1, responses FROM sheets ORDER BY rowid"
+    ).fetchall()
+    assert [(run_id, file_id) for run_id, file_id, *_ in rows] == list(
+        zip([run_ids[0]] * 3 + [run_ids[1]] * 3, expected["file_id"])
+    )
+    assert [score for _, _, score, _, _ in rows] == expected["score"].astype(
+        float
+    ).tolist()
+    assert all(q1 == json.loads(responses)["q1"] for *_, q1, responses in rows)
+
+    query_plan = connection.execute(
+        "EXPLAIN QUERY PLAN SELECT score FROM sheets WHERE q1 = 'B'"
+    ).fetchall()
+    assert "sheets_by_q1" in str(query_plan)
+    connection.close()
+
+
+def test_sqlite_results_of_nested_directories(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    input_dir = tmp_path.joinpath("inputs")
+    sqlite_config = {
+        "sqlite_results": {"enabled": True, "index_columns": ["q2", "Q2", "Score"]}
+    }
+    for directory in ["a", "b"]:
+        shutil.copytree(Path("samples", "sample4"), input_dir.joinpath(directory))
+        config_path = input_dir.joinpath(directory, "config.json")
+        config = json.loads(config_path.read_text())
+        config["outputs"].update(sqlite_config)
+        config_path.write_text(json.dumps(config))
+    # Columns named like the built-in and the indexed columns, in another case
+    template_path = input_dir.joinpath("b", "template.json")
+    template = json.loads(template_path.read_text())
+    template["customLabels"] = {"Score": ["q1"], "Q2": ["q2"]}
+    template_path.write_text(json.dumps(template))
+    input_dir.joinpath("b", "evaluation.json").unlink()
+    output_dir = tmp_path.joinpath("outputs")
+    run_entry_point(str(input_dir), str(output_dir))
+
+    assert [path.relative_to(output_dir) for path in output_dir.rglob("*.sqlite")] == [
+        Path("results.sqlite")
+    ]
+    connection = sqlite3.connect(output_dir.joinpath("results.sqlite"))
+    rows = connection.execute("SELECT directory, q2, responses FROM sheets").fetchall()
+    assert (
+        sorted(Path(directory).name for directory, *_ in rows) == ["a"] * 3 + ["b"] * 3
+    )
+    for directory, q2, responses in rows:
+        label = "q2" if Path(directory).name == "a" else "Q2"
+        assert q2 == json.loads(responses)[label]
+    connection.close()
@@ -0,0 +1,43 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.tests.utils import run_entry_point, setup_mocker_patches
+from src.utils.shared_memory import ATTACHED_BLOCKS, SharedImageRing
+
+
+def test_regrown_slot_replaces_the_attached_block():
+    with SharedImageRing(slots=1, slot_size=16) as ring:
+        slot, descriptor = ring.put(np.full((4, 4), 1, np.uint8))
+        assert (SharedImageRing.view(descriptor) == 1).all()
+        _, old_block = ATTACHED_BLOCKS[slot]
+        ring.release(slot)
+
+        slot, descriptor = ring.put(np.full((8, 8), 2, np.uint8))
+        assert (SharedImageRing.view(descriptor) == 2).all()
+        name, block = ATTACHED_BLOCKS[slot]
+        assert block is not old_block and name == descriptor[1]
+        # The mapping of the old block is closed
+        assert old_block.buf is None
+    ATTACHED_BLOCKS.clear()
+
+
+def test_unreadable_images_go_to_errors(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    input_dir = tmp_path.joinpath("inputs")
+    shutil.copytree(Path("samples", "sample4"), input_dir)
+    input_dir.joinpath("broken.jpg").write_bytes(b"not an image")
+    # Shown images would keep the run on one worker
+    input_dir.joinpath("config.json").write_text(
+        json.dumps({"threshold_params": {"MIN_JUMP": 30}})
+    )
+    output_dir = tmp_path.joinpath("outputs")
+    run_entry_point(str(input_dir), str(output_dir), processes=2)
+
+    errors = pd.read_csv(output_dir.joinpath("Manual", "ErrorFiles.csv"))
+    assert errors["file_id"].tolist() == ["broken.jpg"]
+    results = pd.read_csv(next(output_dir.joinpath("Results").glob("*.csv")))
+    assert len(results) == 3
@@ -0,0 +1,109 @@
+import json
+import os
+from multiprocessing import resource_tracker
+
+import pytest
+
+import src.entry
+from src.governor import get_rss_bytes
+from src.scheduler import SheetJob, get_schedule
+from src.tests.utils import run_entry_point, setup_mocker_patches
+from src.utils.synthetic import SyntheticSheetGenerator
+
+SHEET_COUNT = 1000
+WARMUP_SHEETS = 100
+RSS_GROWTH_CAP_MB = 8
+SMALL_TEMPLATE = {
+    "pageDimensions": [300, 320],
+    "bubbleDimensions": [20, 20],
+    "fieldBlocks": {
+        "Roll": {
+            "fieldType": "QTYPE_INT",
+            "fieldLabels": ["roll1..4"],
+            "origin": [20, 20],
+            "bubblesGap": 25,
+            "labelsGap": 25,
+        },
+        "MCQ": {
+            "fieldType": "QTYPE_MCQ4",
+            "fieldLabels": ["q1..10"],
+            "origin": [150, 20],
+            "bubblesGap": 25,
+            "labelsGap": 25,
+        },
+    },
+}
+
+
+def generate_large_batch(tmp_path, count):
+    template_path = tmp_path.joinpath("template.json")
+    template_path.write_text(json.dumps(SMALL_TEMPLATE))
+    input_dir = tmp_path.joinpath("inputs")
+    sheet_paths = SyntheticSheetGenerator(template_path, scale=1).generate(input_dir, 4)
+    for sheet_path in sheet_paths:
+        sheet_path.with_suffix(".json").unlink()
+    # Links to a few rendered sheets make a large batch quickly
+    for index in range(count - len(sheet_paths)):
+        os.link(
+            sheet_paths[index % len(sheet_paths)],
+            input_dir.joinpath(f"copy_{index:06d}.jpg"),
+        )
+    return input_dir
+
+
+@pytest.mark.parametrize(
+    "workers",
+    [{}, {"threads": 2}, {"processes": 2}],
+    ids=["sequential", "threads", "processes"],
+)
+def test_large_batch_in_bounded_memory(mocker, tmp_path, workers):
+    setup_mocker_patches(mocker)
+    input_dir = generate_large_batch(tmp_path, SHEET_COUNT)
+    rss_samples = []
+    write_sheet_outputs = src.entry.write_sheet_outputs
+
+    def write_and_measure(*args):
+        write_sheet_outputs(*args)
+        rss_samples.append(get_rss_bytes([os.getpid()]))
+
+    mocker.patch("src.entry.write_sheet_outputs", side_effect=write_and_measure)
+    # The shared memory tracker of worker processes stays up for the whole session
+    resource_tracker.ensure_running()
+    open_files = len(os.listdir("/proc/self/fd"))
+    output_dir = tmp_path.joinpath("outputs")
+    run_entry_point(str(input_dir), str(output_dir), **workers)
+
+    assert len(rss_samples) == SHEET_COUNT
+    # Memory left over from earlier tests may still be released during the warmup
+    rss_growth_mb = (max(rss_samples[WARMUP_SHEETS:]) - rss_samples[WARMUP_SHEETS]) / (
+        1024 * 1024
+    )
+    assert rss_growth_mb < RSS_GROWTH_CAP_MB
+    # The output files are closed at the end of the run
+    assert len(os.listdir("/proc/self/fd")) == open_files
+    results_csv = next(output_dir.joinpath("Results").glob("*.csv"))
+    assert len(results_csv.read_text().splitlines()) == SHEET_COUNT + 1
+
+
+def test_schedule_within_lookahead(tmp_path):
+    sheet_jobs = []
+    for index, size in enumerate([1, 5, 2, 8, 3, 9, 4, 7, 6]):
+        file_path = tmp_path.joinpath(f"{index}.jpg")
+        file_path.write_bytes(bytes(size))
+        sheet_jobs.append(SheetJob(None, index + 1, file_path))
+
+    schedule = get_schedule(sheet_jobs, window=4)
+    assert [sheet_job.file_size for sheet_job in schedule] == [
+        8,
+        5,
+        2,
+        1,
+        9,
+        7,
+        4,
+        3,
+        6,
+    ]
+    assert [sheet_job.file_size for sheet_job in get_schedule(sheet_jobs)] == sorted(
+        [sheet_job.file_size for sheet_job in sheet_jobs], reverse=True
+    )
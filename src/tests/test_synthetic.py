@@ -0,0 +1,45 @@
+import csv
+import json
+from glob import glob
+
+from src.tests.utils import run_entry_point, setup_mocker_patches
+from src.utils.synthetic import SyntheticSheetGenerator
+
+TEMPLATE_PATH = "samples/sample1/template.json"
+
+
+def test_generated_sheets_read_as_ground_truth(mocker, tmp_path):
+    setup_mocker_patches(mocker)
+    input_dir, output_dir = tmp_path.joinpath("inputs"), tmp_path.joinpath("outputs")
+    generator = SyntheticSheetGenerator(
+        TEMPLATE_PATH, seed=7, warp=0.02, noise=8, blur=1
+    )
+    image_paths = generator.generate(input_dir, 4)
+
+    run_entry_point(input_dir, output_dir)
+
+    (results_path,) = glob(str(output_dir.joinpath("Results", "*.csv")))
+    with open(results_path) as f:
+        results = {row["file_id"]: row for row in csv.DictReader(f)}
+    for image_path in image_paths:
+        with open(image_path.with_suffix(".json")) as f:
+            expected = json.load(f)["expected"]
+        row = results[image_path.name]
+        assert {column: row[column] for column in expected} == expected
+
+
+def test_generated_sheets_are_reproducible():
+    generator = SyntheticSheetGenerator(TEMPLATE_PATH, seed=3, warp=0.02, noise=5)
+    first_sheet, first_response = generator.generate_sheet(11)
+    second_sheet, second_response = generator.generate_sheet(11)
+    assert first_response == second_response
+    assert (first_sheet == second_sheet).all()
+
+
+def test_generate_specified_response():
+    generator = SyntheticSheetGenerator(TEMPLATE_PATH)
+    _, response = generator.generate_sheet(0, {"q1": "B", "q5_1": ["3"]})
+    expected = generator.get_ground_truth(response)
+    assert expected["q1"] == "B"
+    assert expected["q5"] == "3"
+    assert expected["q2"] == ""
@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from src.defaults import CONFIG_DEFAULTS
+from src.schemas import SCHEMA_VALIDATORS
+from src.template import Template
+from src.utils.template_detection import detect_template
+
+SAMPLES_PATH = Path("samples")
+
+
+def detect_sample(relative_path):
+    image = cv2.imread(str(SAMPLES_PATH.joinpath(relative_path)))
+    template, blocks, detected_info = detect_template(image)
+    assert list(SCHEMA_VALIDATORS["template"].iter_errors(template)) == []
+    return template, blocks, detected_info
+
+
+def test_detect_single_block():
+    template, _blocks, detected_info = detect_sample(
+        "community/Antibodyy/simple_omr_sheet.jpg"
+    )
+    assert detected_info["field_blocks"] == 1
+    assert detected_info["valid_questions"] == 6
+    assert detected_info["options_per_question"] == 5
+    assert template["fieldBlocks"]["MCQBlock1"]["fieldType"] == "QTYPE_MCQ5"
+    assert detected_info["detection_time_ms"] >= 0
+
+
+def test_detected_template_builds(tmp_path):
+    template, _blocks, detected_info = detect_sample(
+        "sample2/AdrianSample/adrian_omr.png"
+    )
+    assert detected_info["valid_questions"] == 5
+
+    template_path = tmp_path.joinpath("template.json")
+    template_path.write_text(json.dumps(template))
+    built = Template(template_path, CONFIG_DEFAULTS)
+    assert len(built.field_blocks) == detected_info["field_blocks"]
+
+
+@pytest.mark.parametrize(
+    "relative_path,expected_blocks",
+    [
+        ("community/UmarFarootAPS/scans/scan-type-1.jpg", [(50, 4)] * 4),
+        ("community/UmarFarootAPS/scans/scan-type-2.jpg", [(50, 4)] * 4),
+        # Rotated photo, MCQ blocks next to the roll number and subject code blocks
+        (
+            "community/UPSC-mock/scan-angles/angle-1.jpg",
+            [(40, 4), (40, 4), (10, 2), (40, 4), (10, 10), (40, 4)],
+        ),
+        # Neighbouring blocks linked through their question numbers
+        (
+            "sample3/colored-thick-sheet/rgb-100-gsm.jpg",
+            [(40, 4), (40, 4), (40, 4), (39, 4)],
+        ),
+        # The marking example next to the instructions is a block as well
+        ("sample4/IMG_20201116_143512.jpg", [(11, 6), (5, 6)]),
+    ],
+)
+def test_detect_multiple_blocks(relative_path, expected_blocks):
+    _template, blocks, detected_info = detect_sample(relative_path)
+    assert [(block["rows"], block["columns"]) for block in blocks] == expected_blocks
+    assert detected_info["valid_questions"] == sum(rows for rows, _ in expected_blocks)
+
+
+def test_detect_blocks_with_question_numbers():
+    _template, _blocks, detected_info = detect_sample(
+        "community/dxuian/omrcollegesheet.jpg"
+    )
+    assert detected_info["field_blocks"] == 5
+    assert detected_info["valid_questions"] == 100
+
+
+@pytest.mark.parametrize("value", [255, 0])
+def test_detect_blank_page(value):
+    template, blocks, detected_info = detect_template(
+        np.full((800, 600), value, np.uint8)
+    )
+    assert list(SCHEMA_VALIDATORS["template"].iter_errors(template)) == []
+    assert blocks == [] and template["fieldBlocks"] == {}
+    assert detected_info["valid_questions"] == 0
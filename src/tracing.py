@@ -0,0 +1,118 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+import numpy as np
+from rich.table import Table
+
+from src.logger import console
+from src.memory import MEMORY_PROFILER
+from src.metrics import STAGE_SECONDS
+
+STAGE_PERCENTILES = (50, 95, 99)
+
+
+class Tracer:
+    """
+    Records how long each processing stage takes, per sheet.
+
+    Every span is counted in the stage duration metric. Once enabled, spans are
+    also kept as Chrome trace events ("X" phase, microseconds), which can be
+    opened in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+
+    def enable(self):
+        self.enabled = True
+        self.events = []
+
+    def disable(self):
+        self.enabled = False
+
+    def now(self):
+        """Returns the start of a span, to be passed to record() when it ends"""
+        start = perf_counter_ns()
+        if MEMORY_PROFILER.enabled:
+            MEMORY_PROFILER.start_span(start)
+        return start
+
+    def record(self, name, start, **args):
+        """Records a span from start (as returned by now()) till now"""
+        end = perf_counter_ns()
+        STAGE_SECONDS.observe((end - start) / 1e9, stage=name)
+        if MEMORY_PROFILER.enabled:
+            MEMORY_PROFILER.end_span(name, start)
+        if not self.enabled:
+            return
+        self.events.append(
+            {
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name, **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record(name, start, **args)
+
+    def drain(self):
+        """Returns the events recorded so far and forgets them (used to send them from worker processes)"""
+        events, self.events = self.events, []
+        return events
+
+    def extend(self, events):
+        self.events.extend(events)
+
+    def write_chrome_trace(self, trace_path):
+        with open(trace_path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+    def get_stage_durations(self):
+        durations = defaultdict(list)
+        for event in self.events:
+            durations[event["name"]].append(event["dur"] / 1000)
+        return durations
+
+    def print_stage_table(self):
+        table = Table(title="Stage Timings (ms)", show_lines=False)
+        table.add_column("Stage", style="cyan", no_wrap=True)
+        table.add_column("Count", justify="right")
+        for percentile in STAGE_PERCENTILES:
+            table.add_column(f"p{percentile}", justify="right", style="magenta")
+        table.add_column("Total", justify="right")
+        for name, durations in sorted(self.get_stage_durations().items()):
+            percentiles = np.percentile(durations, STAGE_PERCENTILES)
+            table.add_row(
+                name,
+                str(len(durations)),
+                *(f"{value:.2f}" for value in percentiles),
+                f"{sum(durations):.1f}",
+            )
+        console.print(table, justify="center")
+
+
+TRACER = Tracer()
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+# format -> extension of the files written
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception(
+            "Writing parquet or arrow files needs pyarrow, install it with: pip install pyarrow"
+        )
+    return pyarrow
+
+
+class ColumnarWriter:
+    """
+    Streams rows to a parquet file or an Arrow IPC file, as one row group (or record batch)
+    per call to write_rows. Columns are typed "string" or "float", with None as a missing value.
+    """
+
+    def __init__(self, path, columns, columnar_format):
+        pa = self.pa = import_pyarrow()
+        self.path = Path(path)
+        types = {"string": pa.string(), "float": pa.float64()}
+        self.schema = pa.schema(
+            [(column, types[column_type]) for column, column_type in columns]
+        )
+        if columnar_format == "parquet":
+            self.writer = pa.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            self.sink = pa.OSFile(str(self.path), "wb")
+            self.writer = pa.ipc.new_file(self.sink, self.schema)
+        self.format = columnar_format
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        columns = zip(*rows)
+        batch = self.pa.RecordBatch.from_arrays(
+            [
+                self.pa.array(values, type=field.type)
+                for values, field in zip(columns, self.schema)
+            ],
+            schema=self.schema,
+        )
+        if self.format == "parquet":
+            self.writer.write_table(self.pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+
+    def close(self):
+        self.writer.close()
+        if self.format != "parquet":
+            self.sink.close()
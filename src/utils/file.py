@@ -1,11 +1,11 @@
 import argparse
+import csv
 import json
 import os
 from csv import QUOTE_NONNUMERIC
 from time import localtime, strftime
 
-import pandas as pd
-
+from src.constants import ANNOTATIONS_FILENAME
 from src.logger import logger
 
 
@@ -23,6 +23,7 @@ class Paths:
     def __init__(self, output_dir):
         self.output_dir = output_dir
         self.save_marked_dir = output_dir.joinpath("CheckedOMRs")
+        self.annotations_path = self.save_marked_dir.joinpath(ANNOTATIONS_FILENAME)
         self.results_dir = output_dir.joinpath("Results")
         self.manual_dir = output_dir.joinpath("Manual")
         self.evaluation_dir = output_dir.joinpath("Evaluation")
@@ -60,14 +61,17 @@ def setup_outputs_for_template(paths, template):
     ns.paths = paths
 
     ns.empty_resp = [""] * len(template.output_columns)
+    ns.output_columns = template.output_columns
     ns.sheetCols = [
         "file_id",
         "input_path",
         "output_path",
         "score",
     ] + template.output_columns
-    ns.OUTPUT_SET = []
     ns.files_obj = {}
+    # Rows are streamed to the files as sheets are done, nothing is kept per sheet
+    ns.open_files = {}
+    ns.csv_writers = {}
     TIME_NOW_HRS = strftime("%I%p", localtime())
     ns.filesMap = {
         "Results": os.path.join(paths.results_dir, f"Results_{TIME_NOW_HRS}.csv"),
@@ -76,20 +80,34 @@ def setup_outputs_for_template(paths, template):
     }
 
     for file_key, file_name in ns.filesMap.items():
+        ns.files_obj[file_key] = file_name
         if not os.path.exists(file_name):
             logger.info(f"Created new file: '{file_name}'")
-            # moved handling of files to pandas csv writer
-            ns.files_obj[file_key] = file_name
             # Create Header Columns
-            pd.DataFrame([ns.sheetCols], dtype=str).to_csv(
-                ns.files_obj[file_key],
-                mode="a",
-                quoting=QUOTE_NONNUMERIC,
-                header=False,
-                index=False,
-            )
+            with open(file_name, "a", newline="") as f:
+                get_csv_writer(f).writerow(ns.sheetCols)
         else:
             logger.info(f"Present : appending to '{file_name}'")
-            ns.files_obj[file_key] = open(file_name, "a")
 
     return ns
+
+
+def get_csv_writer(f):
+    return csv.writer(f, quoting=QUOTE_NONNUMERIC, lineterminator="\n")
+
+
+def write_output_row(ns, file_key, row):
+    """Appends a row to one of the output CSVs, opening it on the first row"""
+    writer = ns.csv_writers.get(file_key)
+    if writer is None:
+        # Line buffered, so that each row is in the file once written
+        f = open(ns.files_obj[file_key], "a", newline="", buffering=1)
+        ns.open_files[file_key] = f
+        writer = ns.csv_writers[file_key] = get_csv_writer(f)
+    writer.writerow(["" if value is None else str(value) for value in row])
+
+
+def close_output_files(ns):
+    for f in ns.open_files.values():
+        f.close()
+    ns.open_files, ns.csv_writers = {}, {}
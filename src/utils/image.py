@@ -13,7 +13,6 @@ import numpy as np
 from src.logger import logger
 
 plt.rcParams["figure.figsize"] = (10.0, 8.0)
-CLAHE_HELPER = cv2.createCLAHE(clipLimit=5.0, tileGridSize=(8, 8))
 
 
 class ImageUtils:
@@ -25,11 +24,11 @@ class ImageUtils:
         cv2.imwrite(path, final_marked)
 
     @staticmethod
-    def resize_util(img, u_width, u_height=None):
+    def resize_util(img, u_width, u_height=None, dst=None):
         if u_height is None:
             h, w = img.shape[:2]
             u_height = int(h * u_width / w)
-        return cv2.resize(img, (int(u_width), int(u_height)))
+        return cv2.resize(img, (int(u_width), int(u_height)), dst=dst)
 
     @staticmethod
     def resize_util_h(img, u_height, u_width=None):
@@ -69,8 +68,8 @@ class ImageUtils:
         return cnts
 
     @staticmethod
-    def normalize_util(img, alpha=0, beta=255):
-        return cv2.normalize(img, alpha, beta, norm_type=cv2.NORM_MINMAX)
+    def normalize_util(img, alpha=0, beta=255, dst=None):
+        return cv2.normalize(img, dst, alpha, beta, norm_type=cv2.NORM_MINMAX)
 
     @staticmethod
     def auto_canny(image, sigma=0.93):
@@ -86,7 +85,7 @@ class ImageUtils:
         return edged
 
     @staticmethod
-    def adjust_gamma(image, gamma=1.0):
+    def adjust_gamma(image, gamma=1.0, dst=None):
         # build a lookup table mapping the pixel values [0, 255] to
         # their adjusted gamma values
         inv_gamma = 1.0 / gamma
@@ -95,7 +94,7 @@ class ImageUtils:
         ).astype("uint8")
 
         # apply gamma correction using the lookup table
-        return cv2.LUT(image, table)
+        return cv2.LUT(image, table, dst=dst)
 
     @staticmethod
     def four_point_transform(image, pts):
@@ -0,0 +1,42 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+# Thread pools for work within a single sheet, by (process id, size).
+# Forked worker processes do not inherit the threads of a pool, so each process gets its own.
+INTRA_SHEET_POOLS = {}
+INTRA_SHEET_POOLS_LOCK = Lock()
+
+
+def get_intra_sheet_pool(threads):
+    key = (os.getpid(), threads)
+    with INTRA_SHEET_POOLS_LOCK:
+        pool = INTRA_SHEET_POOLS.get(key)
+        if pool is None:
+            pool = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix="intra-sheet"
+            )
+            INTRA_SHEET_POOLS[key] = pool
+    return pool
+
+
+def parallel_map(function, items, threads=1):
+    """
+    Returns [function(item) for item in items], computed on a shared thread pool when threads > 1.
+
+    Meant for independent OpenCV calls within one sheet (which release the GIL),
+    the results are in the order of items either way. The function must not
+    call parallel_map itself, as a full pool would then wait on itself.
+    """
+    items = list(items)
+    if threads <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    return list(get_intra_sheet_pool(threads).map(function, items))
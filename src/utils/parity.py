@@ -0,0 +1,341 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+from dotmap import DotMap
+from rich.table import Table
+
+from src.core import SheetContext
+from src.entry import collect_directory_jobs
+from src.logger import console, logger
+from src.template import Template
+from src.utils.image import ImageUtils
+from src.utils.parsing import OVERRIDE_MERGER, get_concatenated_response
+
+# Parity runs are unattended and only need the marked images of the mismatches
+PARITY_CONFIG_OVERRIDES = {"outputs": {"show_image_level": 0, "save_image_level": 0}}
+MISMATCH_COLOR = (0, 0, 255)
+
+
+class ParityMode:
+    """A way of reading the sheets: config overrides on top of each directory's config,
+    and the number of sheets read at a time"""
+
+    def __init__(self, name, config_overrides=None, threads=1):
+        self.name = name
+        self.config_overrides = config_overrides or {}
+        self.threads = threads
+
+    def __str__(self):
+        return self.name
+
+
+# Alternative engines and modes are registered here to be checked against the reference
+PARITY_MODES = {
+    mode.name: mode
+    for mode in [
+        ParityMode("reference"),
+        ParityMode(
+            "intra_sheet_threads", {"processing_params": {"intra_sheet_threads": 4}}
+        ),
+        ParityMode("threads", threads=4),
+    ]
+}
+
+
+class SheetReading:
+    """What a mode read from one sheet, small enough to keep for every sheet of a batch"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.error = False
+        self.response = {}
+        self.global_threshold = None
+        self.global_std_threshold = None
+        self.field_thresholds = {}
+        self.warped_corners = {}
+
+
+class Mismatch:
+    def __init__(self, kind, key, expected, actual):
+        self.kind, self.key = kind, key
+        self.expected, self.actual = expected, actual
+
+    def __str__(self):
+        return f"{self.kind} '{self.key}': {self.expected} != {self.actual}"
+
+
+def get_mode_template(template, tuning_config, mode):
+    """Returns a copy of the template set up with the config of the mode"""
+    config = OVERRIDE_MERGER.merge(
+        OVERRIDE_MERGER.merge(
+            deepcopy(tuning_config.toDict()), PARITY_CONFIG_OVERRIDES
+        ),
+        deepcopy(mode.config_overrides),
+    )
+    return Template(template.path, DotMap(config, _dynamic=False))
+
+
+def read_sheet(file_path, template, render_marked=False):
+    """Reads one sheet the way read_omr_sheet does, without evaluating or writing outputs.
+    Returns the reading and the marked image (None unless rendered and the sheet could be cropped).
+    """
+    context = SheetContext(file_path)
+    reading = SheetReading(file_path)
+    image_instance_ops = template.image_instance_ops
+    in_omr = cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE)
+    in_omr = image_instance_ops.apply_preprocessors(
+        file_path, in_omr, template, context
+    )
+    reading.warped_corners = {
+        name: [[float(x), float(y)] for x, y in corners]
+        for name, corners in context.warped_corners.items()
+    }
+    if in_omr is None:
+        reading.error = True
+        return reading, None
+
+    response_dict, final_marked, _, _ = image_instance_ops.read_omr_response(
+        template,
+        image=in_omr,
+        name=file_path.name,
+        context=context,
+        render_marked=render_marked,
+    )
+    reading.response = get_concatenated_response(response_dict, template)
+    reading.global_threshold = context.global_threshold
+    reading.global_std_threshold = context.global_std_threshold
+    reading.field_thresholds = dict(context.field_thresholds)
+    return reading, final_marked
+
+
+def diff_values(kind, expected, actual, tolerance, mismatches):
+    for key in sorted(set(expected) | set(actual)):
+        if key not in expected or key not in actual:
+            mismatches.append(Mismatch(kind, key, expected.get(key), actual.get(key)))
+        elif tolerance is None:
+            if expected[key] != actual[key]:
+                mismatches.append(Mismatch(kind, key, expected[key], actual[key]))
+        elif np.max(np.abs(np.subtract(expected[key], actual[key]))) > tolerance:
+            mismatches.append(Mismatch(kind, key, expected[key], actual[key]))
+
+
+def diff_readings(reference, reading, corner_tolerance=0.5, threshold_tolerance=1e-6):
+    """Returns the differences of a reading from the reference reading of the same sheet"""
+    mismatches = []
+    if reference.error != reading.error:
+        mismatches.append(Mismatch("error", "cropping", reference.error, reading.error))
+    diff_values(
+        "corners",
+        reference.warped_corners,
+        reading.warped_corners,
+        corner_tolerance,
+        mismatches,
+    )
+    if reference.error or reading.error:
+        return mismatches
+    diff_values("response", reference.response, reading.response, None, mismatches)
+    diff_values(
+        "global_threshold",
+        {
+            "global_thr": reference.global_threshold,
+            "global_std_thr": reference.global_std_threshold,
+        },
+        {
+            "global_thr": reading.global_threshold,
+            "global_std_thr": reading.global_std_threshold,
+        },
+        threshold_tolerance,
+        mismatches,
+    )
+    diff_values(
+        "field_threshold",
+        reference.field_thresholds,
+        reading.field_thresholds,
+        threshold_tolerance,
+        mismatches,
+    )
+    return mismatches
+
+
+class ParityHarness:
+    """
+    Reads the same sheets with the reference mode and each alternative mode, and
+    diffs their responses, thresholds and the corners the sheets were warped from.
+
+    Only the readings are kept per sheet. The sheets with mismatches are read again
+    to save the marked images of both modes side by side, with the mismatched
+    fields outlined, along with a csv of every mismatch.
+    """
+
+    def __init__(
+        self,
+        modes,
+        output_dir,
+        reference_mode=PARITY_MODES["reference"],
+        corner_tolerance=0.5,
+        threshold_tolerance=1e-6,
+    ):
+        self.modes = modes
+        self.reference_mode = reference_mode
+        self.output_dir = Path(output_dir)
+        self.corner_tolerance = corner_tolerance
+        self.threshold_tolerance = threshold_tolerance
+        # mode name -> {file_path: mismatches}
+        self.mismatches = {mode.name: {} for mode in modes}
+        self.sheet_count = 0
+
+    def collect_directory_jobs(self, input_dir):
+        input_dir = Path(input_dir)
+        directory_jobs = []
+        collect_directory_jobs(
+            input_dir,
+            input_dir,
+            {
+                "output_dir": self.output_dir.joinpath("outputs", input_dir.name),
+                "setLayout": False,
+            },
+            directory_jobs,
+        )
+        return directory_jobs
+
+    def read_sheets(self, directory_job, mode):
+        template = get_mode_template(
+            directory_job.template, directory_job.tuning_config, mode
+        )
+
+        def read(file_path):
+            return read_sheet(file_path, template)[0]
+
+        if mode.threads > 1:
+            with ThreadPoolExecutor(max_workers=mode.threads) as executor:
+                return list(executor.map(read, directory_job.omr_files))
+        return list(map(read, directory_job.omr_files))
+
+    def run(self, input_dirs):
+        """Checks every mode on the sheets under input_dirs, returns the number of mismatched sheets"""
+        for input_dir in input_dirs:
+            for directory_job in self.collect_directory_jobs(input_dir):
+                self.sheet_count += len(directory_job.omr_files)
+                references = self.read_sheets(directory_job, self.reference_mode)
+                for mode in self.modes:
+                    readings = self.read_sheets(directory_job, mode)
+                    for reference, reading in zip(references, readings):
+                        mismatches = diff_readings(
+                            reference,
+                            reading,
+                            self.corner_tolerance,
+                            self.threshold_tolerance,
+                        )
+                        if mismatches:
+                            self.mismatches[mode.name][reading.file_path] = mismatches
+                            self.save_mismatch_image(
+                                directory_job, mode, reading.file_path, mismatches
+                            )
+        self.save_report()
+        self.print_summary()
+        return sum(len(sheets) for sheets in self.mismatches.values())
+
+    def save_mismatch_image(self, directory_job, mode, file_path, mismatches):
+        marked_images = []
+        for image_mode in [self.reference_mode, mode]:
+            template = get_mode_template(
+                directory_job.template, directory_job.tuning_config, image_mode
+            )
+            _, marked_image = read_sheet(file_path, template, render_marked=True)
+            if marked_image is None:
+                page_width, page_height = template.page_dimensions
+                marked_image = np.full((page_height, page_width), 255, np.uint8)
+            marked_image = cv2.cvtColor(marked_image, cv2.COLOR_GRAY2BGR)
+            self.outline_fields(marked_image, template, mismatches)
+            cv2.putText(
+                marked_image,
+                image_mode.name,
+                (10, marked_image.shape[0] // 20),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                marked_image.shape[1] / 600,
+                MISMATCH_COLOR,
+                3,
+            )
+            marked_images.append(marked_image)
+
+        image_dir = self.output_dir.joinpath(mode.name)
+        image_dir.mkdir(parents=True, exist_ok=True)
+        ImageUtils.save_img(
+            str(image_dir.joinpath(f"{file_path.parent.name}_{file_path.name}")),
+            np.hstack(marked_images),
+        )
+
+    @staticmethod
+    def outline_fields(marked_image, template, mismatches):
+        field_labels = set()
+        for mismatch in mismatches:
+            field_labels.add(mismatch.key)
+            field_labels.update(template.custom_labels.get(mismatch.key, []))
+        for field_block in template.field_blocks:
+            box_w, box_h = field_block.bubble_dimensions
+            for field_block_bubbles in field_block.traverse_bubbles:
+                if field_block_bubbles[0].field_label not in field_labels:
+                    continue
+                xs = [bubble.x for bubble in field_block_bubbles]
+                ys = [bubble.y for bubble in field_block_bubbles]
+                cv2.rectangle(
+                    marked_image,
+                    (min(xs), min(ys)),
+                    (max(xs) + box_w, max(ys) + box_h),
+                    MISMATCH_COLOR,
+                    2,
+                )
+
+    def save_report(self):
+        rows = [
+            [
+                mode_name,
+                str(file_path),
+                mismatch.kind,
+                mismatch.key,
+                mismatch.expected,
+                mismatch.actual,
+            ]
+            for mode_name, sheets in self.mismatches.items()
+            for file_path, mismatches in sheets.items()
+            for mismatch in mismatches
+        ]
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        report_path = self.output_dir.joinpath("parity_report.csv")
+        pd.DataFrame(
+            rows,
+            columns=["mode", "file_path", "kind", "key", "reference", "actual"],
+        ).to_csv(report_path, index=False)
+        logger.info(f"Saved {len(rows)} mismatch(es) to '{report_path}'")
+
+    def print_summary(self):
+        table = Table(title=f"Parity with '{self.reference_mode}'")
+        table.add_column("Mode", style="cyan", no_wrap=True)
+        table.add_column("Sheets", justify="right")
+        table.add_column("Mismatched Sheets", justify="right")
+        table.add_column("Mismatches", justify="left")
+        for mode_name, sheets in self.mismatches.items():
+            kind_counts = {}
+            for mismatches in sheets.values():
+                for mismatch in mismatches:
+                    kind_counts[mismatch.kind] = kind_counts.get(mismatch.kind, 0) + 1
+            table.add_row(
+                mode_name,
+                str(self.sheet_count),
+                f"[{'red' if sheets else 'green'}]{len(sheets)}",
+                ", ".join(f"{kind}: {count}" for kind, count in kind_counts.items())
+                or "-",
+            )
+        console.print(table, justify="center")
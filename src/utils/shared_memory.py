@@ -0,0 +1,86 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+from contextlib import suppress
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# A4 page at 300 DPI, grayscale
+DEFAULT_SLOT_SIZE = 2480 * 3508
+
+# Shared memory blocks attached to in this (worker) process, as (name, block) by slot
+ATTACHED_BLOCKS = {}
+
+
+class SharedImageRing:
+    """
+    A fixed set of shared memory slots to hand decoded images to worker processes.
+
+    The producer copies an image into a free slot and sends only its descriptor
+    (slot, block name, shape and dtype) to a worker, which maps the same memory
+    without copying or pickling the pixels. A slot is reused once released, so
+    the memory in flight stays at slots x slot_size however large the batch is.
+    """
+
+    def __init__(self, slots, slot_size=DEFAULT_SLOT_SIZE):
+        self.blocks = [
+            shared_memory.SharedMemory(create=True, size=slot_size)
+            for _ in range(slots)
+        ]
+        self.free_slots = list(range(slots))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def has_free_slot(self):
+        return len(self.free_slots) > 0
+
+    def put(self, image):
+        if not self.free_slots:
+            raise Exception("No free slot in the shared image ring")
+        slot = self.free_slots.pop()
+        block = self.blocks[slot]
+        if image.nbytes > block.size:
+            # Grow the slot for unusually large images
+            block.close()
+            block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            self.blocks[slot] = block
+        np.ndarray(image.shape, dtype=image.dtype, buffer=block.buf)[:] = image
+        return slot, (slot, block.name, image.shape, image.dtype.str)
+
+    def release(self, slot):
+        self.free_slots.append(slot)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks, self.free_slots = [], []
+
+    @staticmethod
+    def view(descriptor):
+        """Returns the image of a descriptor as an array backed by the shared memory"""
+        slot, name, shape, dtype = descriptor
+        attached_name, block = ATTACHED_BLOCKS.get(slot, (None, None))
+        if attached_name != name:
+            if block is not None:
+                # The slot was regrown into a new block. An image still using the old one
+                # keeps it mapped until the image is freed.
+                with suppress(BufferError):
+                    block.close()
+            block = shared_memory.SharedMemory(name=name)
+            ATTACHED_BLOCKS[slot] = (name, block)
+        image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        # The slot is reused for the next image, never modify it in place
+        image.flags.writeable = False
+        return image
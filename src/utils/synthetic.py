@@ -0,0 +1,336 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src import constants
+from src.defaults import CONFIG_DEFAULTS
+from src.template import Template
+from src.utils.file import load_json
+from src.utils.parsing import get_concatenated_response, open_config_with_defaults
+
+# Intensities of the rendered sheet
+BUBBLE_OUTLINE_COLOR = 110
+BUBBLE_TEXT_COLOR = 170
+MARKED_BUBBLE_COLORS = (15, 70)
+# Border around the page for templates that crop the page out of its background
+PAGE_BORDER_RATIO = 0.06
+PAGE_BACKGROUND_COLOR = 40
+
+
+class SyntheticSheetGenerator:
+    """
+    Renders filled OMR sheets from the field blocks of a template, along with the
+    response expected from reading each of them.
+
+    Sheets are drawn at the processing aspect ratio (times scale). For templates
+    cropped on markers, the marker is drawn centred on each page corner at the size
+    CropOnMarkers looks for, and on a dark border for templates using CropPage.
+    Each sheet gets its own random generator seeded from (seed, index), so a batch
+    can be regenerated or extended exactly.
+    """
+
+    def __init__(
+        self,
+        template_path,
+        seed=0,
+        scale=2,
+        fill_probability=0.9,
+        multi_mark_probability=0.0,
+        warp=0.0,
+        noise=0.0,
+        blur=0,
+    ):
+        self.template_path = Path(template_path)
+        config_path = self.template_path.parent.joinpath(constants.CONFIG_FILENAME)
+        self.config_path = config_path if os.path.exists(config_path) else None
+        self.tuning_config = (
+            open_config_with_defaults(config_path)
+            if self.config_path
+            else CONFIG_DEFAULTS
+        )
+        self.template = Template(self.template_path, self.tuning_config)
+        self.seed = seed
+        self.fill_probability = fill_probability
+        self.multi_mark_probability = multi_mark_probability
+        self.warp, self.noise, self.blur = warp, noise, blur
+
+        dimensions = self.tuning_config.dimensions
+        self.sheet_size = (
+            int(dimensions.processing_width * scale),
+            int(dimensions.processing_height * scale),
+        )
+        pre_processors = {
+            pre_processor.__class__.__name__: pre_processor
+            for pre_processor in self.template.pre_processors
+        }
+        self.crop_on_markers = pre_processors.get("CropOnMarkers")
+        self.background_color = (
+            PAGE_BACKGROUND_COLOR if "CropPage" in pre_processors else 255
+        )
+        self.marker = self.get_marker()
+        self.blank_page = self.render_blank_page()
+
+    def get_fields(self):
+        """Returns (field_label, bubbles) for each field of the template, in reading order"""
+        return [
+            (field_block_bubbles[0].field_label, field_block_bubbles)
+            for field_block in self.template.field_blocks
+            for field_block_bubbles in field_block.traverse_bubbles
+        ]
+
+    def get_rng(self, index):
+        return np.random.default_rng([self.seed, index])
+
+    def random_response(self, rng):
+        """Picks the marked values of each field: one value, several (multi-marked) or none"""
+        response = {}
+        for field_label, bubbles in self.get_fields():
+            values = [bubble.field_value for bubble in bubbles]
+            if rng.random() >= self.fill_probability:
+                response[field_label] = []
+            elif len(values) > 1 and rng.random() < self.multi_mark_probability:
+                count = int(rng.integers(2, len(values) + 1))
+                response[field_label] = list(rng.choice(values, count, replace=False))
+            else:
+                response[field_label] = [values[int(rng.integers(len(values)))]]
+        return response
+
+    def get_ground_truth(self, response):
+        """Returns the response the reader should give for the marked values, by output column"""
+        omr_response = {}
+        for field_block in self.template.field_blocks:
+            for field_block_bubbles in field_block.traverse_bubbles:
+                field_label = field_block_bubbles[0].field_label
+                marked = response.get(field_label, [])
+                # Multi-marked values are concatenated in the order of the bubbles
+                omr_response[field_label] = (
+                    "".join(
+                        bubble.field_value
+                        for bubble in field_block_bubbles
+                        if bubble.field_value in marked
+                    )
+                    or field_block.empty_val
+                )
+        concatenated_response = get_concatenated_response(omr_response, self.template)
+        return {
+            column: concatenated_response[column]
+            for column in self.template.output_columns
+        }
+
+    def render_blank_page(self):
+        page_width, page_height = self.template.page_dimensions
+        page = np.full((page_height, page_width), 255, dtype=np.uint8)
+        for field_block in self.template.field_blocks:
+            box_w, box_h = field_block.bubble_dimensions
+            font_scale = box_h / 60
+            for field_block_bubbles in field_block.traverse_bubbles:
+                for bubble in field_block_bubbles:
+                    cv2.ellipse(
+                        page,
+                        (bubble.x + box_w // 2, bubble.y + box_h // 2),
+                        (max(1, box_w // 2 - 2), max(1, box_h // 2 - 2)),
+                        0,
+                        0,
+                        360,
+                        BUBBLE_OUTLINE_COLOR,
+                        max(1, box_h // 20),
+                    )
+                    (text_w, text_h), _ = cv2.getTextSize(
+                        str(bubble.field_value), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1
+                    )
+                    cv2.putText(
+                        page,
+                        str(bubble.field_value),
+                        (
+                            bubble.x + (box_w - text_w) // 2,
+                            bubble.y + (box_h + text_h) // 2,
+                        ),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        font_scale,
+                        BUBBLE_TEXT_COLOR,
+                        1,
+                    )
+        return page
+
+    def render_page(self, response, rng):
+        page = self.blank_page.copy()
+        for field_block in self.template.field_blocks:
+            box_w, box_h = field_block.bubble_dimensions
+            for field_block_bubbles in field_block.traverse_bubbles:
+                marked = response.get(field_block_bubbles[0].field_label, [])
+                for bubble in field_block_bubbles:
+                    if bubble.field_value not in marked:
+                        continue
+                    # Pencil marks vary in darkness and do not fill the bubble exactly
+                    cv2.ellipse(
+                        page,
+                        (bubble.x + box_w // 2, bubble.y + box_h // 2),
+                        (
+                            max(1, int(box_w * rng.uniform(0.38, 0.46))),
+                            max(1, int(box_h * rng.uniform(0.38, 0.46))),
+                        ),
+                        0,
+                        0,
+                        360,
+                        int(rng.integers(*MARKED_BUBBLE_COLORS)),
+                        -1,
+                    )
+        return page
+
+    def get_marker(self):
+        """Returns the marker as it should appear on the sheet, or None"""
+        if self.crop_on_markers is None:
+            return None
+        marker = cv2.imread(self.crop_on_markers.marker_path, cv2.IMREAD_GRAYSCALE)
+        sheet_width, processing_width = (
+            self.sheet_size[0],
+            self.tuning_config.dimensions.processing_width,
+        )
+        ratio = self.crop_on_markers.options.get("sheetToMarkerWidthRatio")
+        marker_width = (
+            sheet_width / int(ratio)
+            if ratio
+            else marker.shape[1] * sheet_width / processing_width
+        )
+        marker_height = marker.shape[0] * marker_width / marker.shape[1]
+        return cv2.resize(marker, (int(marker_width), int(marker_height)))
+
+    def compose_sheet(self, page):
+        sheet_width, sheet_height = self.sheet_size
+        sheet = np.full((sheet_height, sheet_width), self.background_color, np.uint8)
+        border_x, border_y = (
+            (
+                int(sheet_width * PAGE_BORDER_RATIO),
+                int(sheet_height * PAGE_BORDER_RATIO),
+            )
+            if self.background_color != 255
+            else (0, 0)
+        )
+        paper = sheet[
+            border_y : sheet_height - border_y, border_x : sheet_width - border_x
+        ]
+        paper[:] = 255
+        paper_height, paper_width = paper.shape
+
+        # The page spans the marker centres, which is the region CropOnMarkers warps to
+        margin_y, margin_x = (
+            self.marker.shape[:2] if self.marker is not None else (0, 0)
+        )
+        page_size = (paper_width - 2 * margin_x, paper_height - 2 * margin_y)
+        paper[
+            margin_y : margin_y + page_size[1], margin_x : margin_x + page_size[0]
+        ] = cv2.resize(page, page_size, interpolation=cv2.INTER_AREA)
+
+        if self.marker is not None:
+            marker_h, marker_w = self.marker.shape[:2]
+            for corner_x, corner_y in [
+                (margin_x, margin_y),
+                (margin_x + page_size[0], margin_y),
+                (margin_x, margin_y + page_size[1]),
+                (margin_x + page_size[0], margin_y + page_size[1]),
+            ]:
+                x, y = corner_x - marker_w // 2, corner_y - marker_h // 2
+                paper[y : y + marker_h, x : x + marker_w] = self.marker
+        return sheet
+
+    def distort(self, sheet, rng):
+        sheet_height, sheet_width = sheet.shape[:2]
+        if self.warp > 0:
+            # Pull each corner inwards, as in a photo taken at a slight angle
+            corners = np.float32(
+                [
+                    [0, 0],
+                    [sheet_width, 0],
+                    [sheet_width, sheet_height],
+                    [0, sheet_height],
+                ]
+            )
+            directions = np.float32([[1, 1], [-1, 1], [-1, -1], [1, -1]])
+            offsets = rng.uniform(0, self.warp, (4, 2)) * [sheet_width, sheet_height]
+            matrix = cv2.getPerspectiveTransform(
+                corners, np.float32(corners + directions * offsets)
+            )
+            sheet = cv2.warpPerspective(
+                sheet,
+                matrix,
+                (sheet_width, sheet_height),
+                borderValue=self.background_color,
+            )
+        if self.blur > 0:
+            kernel_size = 2 * int(self.blur) + 1
+            sheet = cv2.GaussianBlur(sheet, (kernel_size, kernel_size), 0)
+        if self.noise > 0:
+            noise = rng.normal(0, self.noise, sheet.shape)
+            sheet = np.clip(sheet + noise, 0, 255).astype(np.uint8)
+        return sheet
+
+    def generate_sheet(self, index, response=None):
+        """Returns the image and the marked values of one sheet"""
+        rng = self.get_rng(index)
+        if response is None:
+            response = self.random_response(rng)
+        else:
+            response = {
+                field_label: [values] if isinstance(values, str) else list(values)
+                for field_label, values in response.items()
+            }
+        sheet = self.compose_sheet(self.render_page(response, rng))
+        return self.distort(sheet, rng), response
+
+    def copy_template_files(self, output_dir):
+        """Copies the template (and its config and marker) so that output_dir can be read directly"""
+        shutil.copy(
+            self.template_path, output_dir.joinpath(constants.TEMPLATE_FILENAME)
+        )
+        if self.crop_on_markers is not None:
+            marker_path = Path(self.crop_on_markers.marker_path)
+            relative_marker_path = marker_path.relative_to(self.template_path.parent)
+            output_dir.joinpath(relative_marker_path).parent.mkdir(
+                parents=True, exist_ok=True
+            )
+            shutil.copy(marker_path, output_dir.joinpath(relative_marker_path))
+        if self.config_path:
+            config = load_json(self.config_path)
+            # Generated batches are meant to run unattended
+            config.setdefault("outputs", {})["show_image_level"] = 0
+            with open(output_dir.joinpath(constants.CONFIG_FILENAME), "w") as f:
+                json.dump(config, f, indent=2)
+
+    def generate(self, output_dir, count, responses=None, start=0, ext=".jpg"):
+        """
+        Writes count sheets to output_dir, each with a ground truth json next to it.
+        The marked values are picked at random unless given in responses (field label -> value(s)).
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.copy_template_files(output_dir)
+        image_paths = []
+        for index in range(start, start + count):
+            response = responses[index - start] if responses else None
+            sheet, response = self.generate_sheet(index, response)
+            image_path = output_dir.joinpath(f"sheet_{index:06d}{ext}")
+            cv2.imwrite(str(image_path), sheet)
+            with open(image_path.with_suffix(".json"), "w") as f:
+                json.dump(
+                    {
+                        "file_id": image_path.name,
+                        "marked": response,
+                        "expected": self.get_ground_truth(response),
+                    },
+                    f,
+                    indent=2,
+                )
+            image_paths.append(image_path)
+        return image_paths
@@ -0,0 +1,455 @@
+"""
+
+ OMRChecker
+
+ Author: Udayraj Deshmukh
+ Github: https://github.com/Udayraj123
+
+"""
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from src.constants import FIELD_TYPES
+from src.schemas import SCHEMA_VALIDATORS
+
+# Bubbles are searched on a downscaled copy of the page, coordinates are scaled back
+DETECTION_WIDTH = 1000
+# Expected bubble diameter as a fraction of the page width
+MIN_BUBBLE_WIDTH_RATIO, MAX_BUBBLE_WIDTH_RATIO = 0.008, 0.12
+MIN_CIRCULARITY = 0.6
+# Allow elliptical bubbles
+MAX_ASPECT_RATIO = 1.6
+# Allowed deviation of a bubble's size from the median bubble size
+BUBBLE_SIZE_TOLERANCE = 0.35
+# Gaps larger than this multiple of the usual gap between neighbouring bubbles start a new block
+GAP_SPLIT_FACTOR = 1.6
+# Bubbles in a block are placed within these multiples of the bubble size
+MAX_GAP_FACTOR = 4
+# Fraction of the grid positions of a block that must contain a detected bubble
+MIN_BLOCK_FILL_RATIO = 0.75
+MIN_BUBBLES_PER_FIELD = 2
+MIN_FIELDS_PER_BLOCK = 2
+
+
+def detect_template(image):
+    """Detects MCQ field blocks on a blank or filled OMR sheet image.
+
+    Returns a template dict that conforms to TEMPLATE_SCHEMA, the detected
+    blocks (for drawing) and a summary of the detection.
+    """
+    start_time = perf_counter()
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    page_height, page_width = gray.shape[:2]
+
+    scale = min(1.0, DETECTION_WIDTH / page_width)
+    small = (
+        gray
+        if scale == 1.0
+        else cv2.resize(
+            gray,
+            (int(page_width * scale), int(page_height * scale)),
+            interpolation=cv2.INTER_AREA,
+        )
+    )
+
+    # Keep the bubble size that forms the most complete blocks
+    boxes, blocks = max(
+        (
+            (boxes, cluster_into_blocks(boxes))
+            for boxes in get_bubble_size_groups(find_bubble_boxes(small))
+        ),
+        key=lambda detected: sum(len(block["boxes"]) for block in detected[1]),
+        default=(np.zeros((0, 4)), []),
+    )
+
+    # Back to original image coordinates
+    for block in blocks:
+        for key in ["boxes", "origin", "bubbles_gap", "labels_gap"]:
+            block[key] = block[key] / scale
+
+    template = build_template(blocks, page_width, page_height)
+    errors = list(SCHEMA_VALIDATORS["template"].iter_errors(template))
+    if len(errors) > 0:
+        raise Exception(f"Detected template is invalid: {errors[0].message}")
+
+    detected_info = {
+        "total_bubbles": int(len(boxes)),
+        "field_blocks": len(blocks),
+        "valid_questions": sum(block["rows"] for block in blocks),
+        "options_per_question": max((block["columns"] for block in blocks), default=0),
+        "bubble_spacing_horizontal": int(
+            np.median([block["bubbles_gap"] for block in blocks]) if blocks else 0
+        ),
+        "bubble_spacing_vertical": int(
+            np.median([block["labels_gap"] for block in blocks]) if blocks else 0
+        ),
+        "detection_time_ms": round((perf_counter() - start_time) * 1000, 2),
+    }
+    return template, blocks, detected_info
+
+
+def find_bubble_boxes(gray):
+    """Returns an (N, 4) array of [x, y, w, h] boxes of bubble-like contours"""
+    height, width = gray.shape[:2]
+    # Odd block size proportional to the expected bubble size
+    block_size = max(11, int(width * MAX_BUBBLE_WIDTH_RATIO / 2) | 1)
+    thresh = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, block_size, 2
+    )
+    min_w, max_w = width * MIN_BUBBLE_WIDTH_RATIO, width * MAX_BUBBLE_WIDTH_RATIO
+    # Only trace the outlines of the components sized like a bubble, most of the
+    # thresholded components are specks of noise and text
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+    component_w, component_h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+    sized = (
+        (component_w >= min_w)
+        & (component_w <= max_w)
+        & (component_w * MAX_ASPECT_RATIO > component_h)
+        & (component_h * MAX_ASPECT_RATIO > component_w)
+    )
+    # The first component is the background
+    sized[0] = False
+    # Note: bubbles are often nested inside printed boxes, so RETR_EXTERNAL would miss
+    # them. RETR_CCOMP puts the outer boundary of every component at the top level.
+    contours, hierarchy = cv2.findContours(
+        sized[labels].astype(np.uint8), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE
+    )
+    if len(contours) == 0:
+        return np.zeros((0, 4), dtype=np.float64)
+    contours = [
+        contour
+        for contour, is_outer in zip(contours, hierarchy[0][:, 3] == -1)
+        if is_outer
+    ]
+
+    boxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.float64)
+    w, h = boxes[:, 2], boxes[:, 3]
+    candidates = (
+        (w >= min_w)
+        & (w <= max_w)
+        & (w / h > 1 / MAX_ASPECT_RATIO)
+        & (w / h < MAX_ASPECT_RATIO)
+    ).nonzero()[0]
+    if len(candidates) == 0:
+        return np.zeros((0, 4), dtype=np.float64)
+
+    areas = np.array([cv2.contourArea(contours[i]) for i in candidates])
+    perimeters = np.array([cv2.arcLength(contours[i], True) for i in candidates])
+    circularity = 4 * np.pi * areas / np.maximum(perimeters, 1e-6) ** 2
+    return boxes[candidates[circularity > MIN_CIRCULARITY]]
+
+
+def get_bubble_size_groups(boxes):
+    """Yields the boxes around each typical bubble size, dropping the outliers in size
+    (text glyphs, noise, large circles). The typical sizes are the ones covering the most
+    area (few large bubbles) and the most common one (many small bubbles, e.g. inside boxes).
+    """
+    if len(boxes) == 0:
+        return
+    areas = boxes[:, 2] * boxes[:, 3]
+    typical_sizes = []
+    for weights in [areas, None]:
+        typical_size = [
+            np.argmax(np.bincount(boxes[:, axis].astype(np.int64), weights=weights))
+            for axis in [2, 3]
+        ]
+        if typical_size not in typical_sizes:
+            typical_sizes.append(typical_size)
+    for typical_w, typical_h in typical_sizes:
+        consistent = (
+            np.abs(boxes[:, 2] - typical_w) <= BUBBLE_SIZE_TOLERANCE * typical_w
+        ) & (np.abs(boxes[:, 3] - typical_h) <= BUBBLE_SIZE_TOLERANCE * typical_h)
+        yield boxes[consistent]
+
+
+def cluster_positions(values, split_gap):
+    """Clusters 1D positions on gaps larger than split_gap.
+
+    Returns the cluster id of each value and the mean position of each cluster
+    """
+    order = np.argsort(values, kind="stable")
+    sorted_ids = np.concatenate(([0], np.cumsum(np.diff(values[order]) > split_gap)))
+    ids = np.empty(len(values), dtype=np.int64)
+    ids[order] = sorted_ids
+    positions = np.bincount(ids, weights=values) / np.bincount(ids)
+    return ids, positions
+
+
+def get_close_pairs(centers, radius):
+    """Returns the (i, j) index arrays of the pairs of distinct centers within radius of each other along both axes.
+
+    Only the centers within radius in y of each other are paired, rather than all N x N pairs.
+    """
+    order = np.argsort(centers[:, 1], kind="stable")
+    sorted_y = centers[order, 1]
+    starts = np.searchsorted(sorted_y, sorted_y - radius, side="left")
+    counts = np.searchsorted(sorted_y, sorted_y + radius, side="right") - starts
+    first = np.repeat(np.arange(len(centers)), counts)
+    # Consecutive indices from each start
+    second = np.arange(counts.sum()) + np.repeat(
+        starts - np.cumsum(counts) + counts, counts
+    )
+    first, second = order[first], order[second]
+    close = (first != second) & (
+        np.abs(centers[second, 0] - centers[first, 0]) <= radius
+    )
+    return first[close], second[close]
+
+
+def get_nearest_pairs(first, distances):
+    """Returns the indices of the pairs with the smallest distance from each first index"""
+    order = np.lexsort((distances, first))
+    return order[np.diff(first[order], prepend=-1) != 0]
+
+
+def get_neighbour_links(centers, pairs, bubble_size, row_angle):
+    """Links each bubble to its nearest neighbours to the right and below, along the rows of the page
+
+    Returns the (i, j) pairs of linked bubbles for the right and the below neighbours
+    """
+    first, second = pairs
+    cos, sin = np.cos(row_angle), np.sin(row_angle)
+    # Offsets between the paired bubbles, rotated to level rows
+    offsets = centers[second] - centers[first]
+    dx = offsets[:, 0] * cos + offsets[:, 1] * sin
+    dy = offsets[:, 1] * cos - offsets[:, 0] * sin
+    width, height = bubble_size
+
+    links = []
+    for along, across, size, across_size in [
+        (dx, dy, width, height),
+        (dy, dx, height, width),
+    ]:
+        candidates = np.flatnonzero(
+            (along > size / 2)
+            & (np.abs(across) < across_size / 2)
+            & (along <= MAX_GAP_FACTOR * size)
+        )
+        nearest = candidates[get_nearest_pairs(first[candidates], along[candidates])]
+        if len(nearest) == 0:
+            links.append(np.zeros((0, 2), dtype=np.int64))
+            continue
+        # Bubbles further apart than the usual gap belong to different blocks
+        gaps = along[nearest]
+        linked = nearest[gaps <= GAP_SPLIT_FACTOR * np.median(gaps)]
+        links.append(np.stack([first[linked], second[linked]], axis=1))
+    return links
+
+
+def get_row_angle(centers, pairs):
+    """Estimates the rotation of the rows of bubbles from the directions to the nearest bubbles"""
+    first, second = pairs
+    if len(first) == 0:
+        return 0.0
+    offsets = centers[second] - centers[first]
+    nearest = get_nearest_pairs(first, np.linalg.norm(offsets, axis=1))
+    # Rows and columns are a right angle apart, fold the directions onto [-45, 45) degrees
+    angles = np.arctan2(offsets[nearest, 1], offsets[nearest, 0])
+    folded = (angles + np.pi / 4) % (np.pi / 2) - np.pi / 4
+    return float(np.median(folded))
+
+
+def get_components(count, links):
+    """Returns the connected component id of each of count nodes, given the linked pairs"""
+    parents = np.arange(count)
+
+    def find(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    for i, j in links:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+    return np.array([find(node) for node in range(count)])
+
+
+def get_block_axes(centers, right_links, below_links):
+    """Returns the unit directions of the rows and the columns of a block, from its links"""
+    axes = []
+    for links, default in [(right_links, [1.0, 0.0]), (below_links, [0.0, 1.0])]:
+        if len(links) == 0:
+            axes.append(np.array(default))
+            continue
+        direction = np.median(centers[links[:, 1]] - centers[links[:, 0]], axis=0)
+        axes.append(direction / np.linalg.norm(direction))
+    return axes
+
+
+def cluster_into_blocks(boxes):
+    """Clusters bubble boxes into grid blocks of rows(fields) x columns(values)
+
+    Each bubble is linked to its nearest neighbours to the right and below, when they
+    are about as far as the usual gap between bubbles. The connected groups of linked
+    bubbles are the blocks, so blocks can be rotated, slightly skewed (e.g. in photos)
+    and apart by a few gaps. The bubbles of a block are then snapped to its rows and
+    columns, measured along its own axes. Missing bubbles (e.g. not detected due to a
+    heavy marking) do not break a block as long as their neighbours link around them.
+    """
+    if len(boxes) < MIN_BUBBLES_PER_FIELD:
+        return []
+    centers = boxes[:, :2] + boxes[:, 2:] / 2
+    bubble_size = np.median(boxes[:, 2:], axis=0)
+    pairs = get_close_pairs(centers, MAX_GAP_FACTOR * max(bubble_size))
+    right_links, below_links = get_neighbour_links(
+        centers, pairs, bubble_size, get_row_angle(centers, pairs)
+    )
+    component_ids = get_components(
+        len(centers), np.concatenate([right_links, below_links])
+    )
+
+    blocks = []
+    for component_id in np.unique(component_ids):
+        members = np.flatnonzero(component_ids == component_id)
+        if len(members) < MIN_BUBBLES_PER_FIELD * MIN_FIELDS_PER_BLOCK:
+            continue
+        # Links within the group, indexed into its members
+        group_links = [
+            np.searchsorted(members, links[np.isin(links[:, 0], members)])
+            for links in [right_links, below_links]
+        ]
+        blocks += get_grid_blocks(
+            boxes[members], centers[members], bubble_size, *group_links
+        )
+
+    # Question numbering runs down each column of blocks, left to right
+    blocks.sort(
+        key=lambda block: (
+            round(block["origin"][0] / bubble_size[0]),
+            block["origin"][1],
+        )
+    )
+    return blocks
+
+
+def get_grid_blocks(boxes, centers, bubble_size, right_links, below_links):
+    """Snaps the bubbles of a linked group to rows and columns, returns the grid blocks among them"""
+    row_axis, column_axis = get_block_axes(centers, right_links, below_links)
+    # Coordinates along the rows and along the columns of the block
+    along_row, along_column = np.linalg.solve(
+        np.stack([row_axis, column_axis], axis=1), (centers - centers.mean(axis=0)).T
+    )
+    width, height = bubble_size
+    col_ids, col_positions = cluster_positions(along_row, width / 2)
+    row_ids, row_positions = cluster_positions(along_column, height / 2)
+    occupancy = np.zeros((len(row_positions), len(col_positions)), dtype=bool)
+    occupancy[row_ids, col_ids] = True
+
+    # Drop sparse columns and rows (e.g. question numbers or stray marks next to the block)
+    columns = np.flatnonzero(occupancy.mean(axis=0) >= MIN_BLOCK_FILL_RATIO / 2)
+    rows = np.flatnonzero(
+        occupancy[:, columns].mean(axis=1) >= MIN_BLOCK_FILL_RATIO / 2
+    )
+    if len(columns) < MIN_BUBBLES_PER_FIELD or len(rows) < MIN_FIELDS_PER_BLOCK:
+        return []
+    blocks = []
+    # Such labels can link neighbouring blocks, split them again on the wider gaps
+    for block_columns in split_on_gaps(columns, col_positions):
+        for block_rows in split_on_gaps(rows, row_positions):
+            grid_columns = drop_label_columns(occupancy, block_rows, block_columns)
+            if (
+                len(grid_columns) < MIN_BUBBLES_PER_FIELD
+                or len(block_rows) < MIN_FIELDS_PER_BLOCK
+            ):
+                continue
+            in_grid = np.isin(row_ids, block_rows) & np.isin(col_ids, grid_columns)
+            # Reject sparse groups (e.g. round letters in text)
+            if in_grid.sum() < MIN_BLOCK_FILL_RATIO * len(block_rows) * len(
+                grid_columns
+            ):
+                continue
+            blocks.append(
+                {
+                    "rows": len(block_rows),
+                    "columns": len(grid_columns),
+                    "origin": boxes[in_grid, :2].min(axis=0),
+                    "bubbles_gap": float(
+                        np.median(np.diff(col_positions[grid_columns]))
+                    ),
+                    "labels_gap": float(np.median(np.diff(row_positions[block_rows]))),
+                    "boxes": boxes[in_grid],
+                }
+            )
+    return blocks
+
+
+def split_on_gaps(indices, positions):
+    """Splits sorted grid lines at gaps wider than GAP_SPLIT_FACTOR times the usual gap"""
+    if len(indices) < 2:
+        return [indices]
+    gaps = np.diff(positions[indices])
+    return np.split(
+        indices, np.flatnonzero(gaps > GAP_SPLIT_FACTOR * np.median(gaps)) + 1
+    )
+
+
+def drop_label_columns(occupancy, rows, columns):
+    """Drops the columns found less often than the others, e.g. question numbers next to the bubbles"""
+    column_fills = occupancy[np.ix_(rows, columns)].mean(axis=0)
+    return columns[column_fills >= MIN_BLOCK_FILL_RATIO * np.median(column_fills)]
+
+
+def build_template(blocks, page_width, page_height):
+    if len(blocks) > 0:
+        all_boxes = np.concatenate([block["boxes"] for block in blocks])
+        bubble_width = int(np.median(all_boxes[:, 2]))
+        bubble_height = int(np.median(all_boxes[:, 3]))
+    else:
+        bubble_width = bubble_height = 32
+
+    field_blocks = {}
+    question_number = 1
+    for block_index, block in enumerate(blocks):
+        rows, columns = block["rows"], block["columns"]
+        origin_x, origin_y = (int(max(0, v)) for v in block["origin"])
+        # Keep the block within the page as required by the template validations
+        bubbles_gap = min(
+            block["bubbles_gap"],
+            (page_width - 1 - origin_x - bubble_width) / max(columns - 1, 1),
+        )
+        labels_gap = min(
+            block["labels_gap"],
+            (page_height - 1 - origin_y - bubble_height) / max(rows - 1, 1),
+        )
+
+        last_question = question_number + rows - 1
+        field_block = {
+            "origin": [origin_x, origin_y],
+            "fieldLabels": [
+                f"q{question_number}..{last_question}"
+                if rows > 1
+                else f"q{question_number}"
+            ],
+            "bubblesGap": round(max(bubbles_gap, 0), 2),
+            "labelsGap": round(max(labels_gap, 0), 2),
+        }
+        field_type = f"QTYPE_MCQ{columns}"
+        if field_type in FIELD_TYPES:
+            field_block["fieldType"] = field_type
+        else:
+            field_block["bubbleValues"] = [chr(65 + i) for i in range(columns)]
+            field_block["direction"] = "horizontal"
+        field_blocks[f"MCQBlock{block_index + 1}"] = field_block
+        question_number = last_question + 1
+
+    return {
+        "pageDimensions": [int(page_width), int(page_height)],
+        "bubbleDimensions": [bubble_width, bubble_height],
+        "preProcessors": [],
+        "fieldBlocks": field_blocks,
+    }
+
+
+def draw_detected_blocks(image, blocks):
+    marked_image = image.copy()
+    for block in blocks:
+        for x, y, w, h in block["boxes"].astype(int):
+            cv2.rectangle(marked_image, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        x, y = block["boxes"][:, :2].min(axis=0).astype(int)
+        x_end, y_end = (block["boxes"][:, :2] + block["boxes"][:, 2:]).max(axis=0)
+        cv2.rectangle(marked_image, (x, y), (int(x_end), int(y_end)), (255, 0, 0), 2)
+    return marked_image
@@ -9,17 +9,16 @@
 import re
 
 import jsonschema
-from jsonschema import validate
 from rich.table import Table
 
 from src.logger import console, logger
-from src.schemas import SCHEMA_JSONS, SCHEMA_VALIDATORS
+from src.schemas import SCHEMA_VALIDATORS
 
 
 def validate_evaluation_json(json_data, evaluation_path):
     logger.info(f"Loading evaluation.json: {evaluation_path}")
     try:
-        validate(instance=json_data, schema=SCHEMA_JSONS["evaluation"])
+        SCHEMA_VALIDATORS["evaluation"].validate(json_data)
     except jsonschema.exceptions.ValidationError as _err:  # NOQA
         table = Table(show_lines=True)
         table.add_column("Key", style="cyan", no_wrap=True)
@@ -48,7 +47,7 @@ def validate_evaluation_json(json_data, evaluation_path):
 def validate_template_json(json_data, template_path):
     logger.info(f"Loading template.json: {template_path}")
     try:
-        validate(instance=json_data, schema=SCHEMA_JSONS["template"])
+        SCHEMA_VALIDATORS["template"].validate(json_data)
     except jsonschema.exceptions.ValidationError as _err:  # NOQA
         table = Table(show_lines=True)
         table.add_column("Key", style="cyan", no_wrap=True)
@@ -83,7 +82,7 @@ def validate_template_json(json_data, template_path):
 def validate_config_json(json_data, config_path):
     logger.info(f"Loading config.json: {config_path}")
     try:
-        validate(instance=json_data, schema=SCHEMA_JSONS["config"])
+        SCHEMA_VALIDATORS["config"].validate(json_data)
     except jsonschema.exceptions.ValidationError as _err:  # NOQA
         table = Table(show_lines=True)
         table.add_column("Key", style="cyan", no_wrap=True)